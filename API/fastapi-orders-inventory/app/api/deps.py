@@ -1,15 +1,58 @@
 # Small dependency module so routers don't import DB internals directly.
-from typing import Iterator
+from typing import AsyncIterator, Iterator
 from sqlmodel import Session
 from fastapi import Depends
 
-from app.db.session import get_session
+from app.core.config import settings
+from app.db.session import (
+    DbSession,
+    get_async_read_session,
+    get_async_session,
+    get_read_session,
+    get_session,
+    run_db,
+)
+from app.db.writer import commit, rollback, run_write
 
+# Sync Session by default; AsyncSession when DB_ASYNC is on. Routers don't
+# care which one they get: they hand their queries to run_db().
+if settings.DB_ASYNC:
 
-def get_db() -> Iterator[Session]:
-    """
-    FastAPI dependency that yields a DB session for each request.
-    - Keeps routers clean (they don't know how sessions are created).
-    - Makes testing easier (we can override this in tests).
-    """
-    return next(get_session())  # get_session() is a generator; yield once
+    async def get_db() -> AsyncIterator[DbSession]:
+        """
+        FastAPI dependency that yields a DB session for each request.
+        - Keeps routers clean (they don't know how sessions are created).
+        - Makes testing easier (we can override this in tests).
+        """
+        async for session in get_async_session():
+            yield session
+
+    async def get_read_db() -> AsyncIterator[DbSession]:
+        """
+        Same as get_db(), but for read-only endpoints: the session comes from the
+        read pool, so GETs don't wait on connections held by order writes.
+        """
+        async for session in get_async_read_session():
+            yield session
+
+else:
+
+    def get_db() -> Iterator[Session]:
+        """
+        FastAPI dependency that yields a DB session for each request.
+        - Keeps routers clean (they don't know how sessions are created).
+        - Makes testing easier (we can override this in tests).
+        """
+        # Unit of work: rollback on error, close (→ connection back to the pool)
+        # as soon as the request is done.
+        yield from get_session()
+
+    def get_read_db() -> Iterator[Session]:
+        """
+        Same as get_db(), but for read-only endpoints: the session comes from the
+        read pool, so GETs don't wait on connections held by order writes.
+        """
+        yield from get_read_session()
+
+
+__all__ = ["get_db", "get_read_db", "run_db", "run_write", "commit", "rollback", "DbSession"]
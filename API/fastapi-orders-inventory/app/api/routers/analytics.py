@@ -0,0 +1,107 @@
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.api.deps import DbSession, get_read_db, run_db
+from app.core.timeutil import utc_naive
+from app.models.order import OrderStatus
+from app.models.sales_rollup import SalesRollupHourly as R
+from app.schemas.analytics import SalesBucket, StatusTotals
+
+router = APIRouter()
+
+_BUCKET_FORMAT = "%Y-%m-%d %H:%M:%S"  # same text form the rollup stores, so ranges compare as strings
+
+
+def _bucket_text(value: datetime) -> str:
+    # Buckets are UTC, like every stored timestamp
+    return utc_naive(value).strftime(_BUCKET_FORMAT)
+
+
+def _range_conditions(
+    product_id: Optional[int], bucket_from: Optional[datetime], bucket_to: Optional[datetime]
+) -> list:
+    conditions = []
+    if product_id is not None:
+        conditions.append(R.product_id == product_id)
+    if bucket_from is not None:
+        conditions.append(R.bucket >= _bucket_text(bucket_from))
+    if bucket_to is not None:
+        conditions.append(R.bucket < _bucket_text(bucket_to))
+    return conditions
+
+
+@router.get(
+    "/sales/hourly",
+    response_model=List[SalesBucket],
+    summary="Units sold per product per hour (pre-aggregated)",
+)
+async def sales_hourly(
+    db: DbSession = Depends(get_read_db),
+    product_id: Optional[int] = Query(None),
+    status_: Optional[OrderStatus] = Query(None, alias="status"),
+    bucket_from: Optional[datetime] = Query(None, description="Inclusive, UTC"),
+    bucket_to: Optional[datetime] = Query(None, description="Exclusive, UTC"),
+    limit: int = Query(168, ge=1, le=5000),
+) -> List[SalesBucket]:
+    """
+    Reads sales_rollup_hourly, which triggers keep in step with every order
+    write, so the cost depends on the number of hours asked for, never on the
+    size of the order history.
+    """
+    return await run_db(db, _sales_hourly, product_id, status_, bucket_from, bucket_to, limit)
+
+
+def _sales_hourly(
+    db: Session,
+    product_id: Optional[int],
+    status: Optional[OrderStatus],
+    bucket_from: Optional[datetime],
+    bucket_to: Optional[datetime],
+    limit: int,
+) -> List[SalesBucket]:
+    stmt = (
+        select(R.product_id, R.bucket, R.status, R.orders, R.units, R.revenue)
+        .where(*_range_conditions(product_id, bucket_from, bucket_to))
+        .order_by(R.bucket, R.product_id, R.status)
+        .limit(limit)
+    )
+    if status is not None:
+        stmt = stmt.where(R.status == status)
+    return [
+        SalesBucket(product_id=pid, bucket=bucket, status=st, orders=orders, units=units, revenue=round(revenue, 2))
+        for pid, bucket, st, orders, units, revenue in db.exec(stmt)
+    ]
+
+
+@router.get(
+    "/sales/by-status",
+    response_model=List[StatusTotals],
+    summary="Orders, units and revenue by status (pre-aggregated)",
+)
+async def sales_by_status(
+    db: DbSession = Depends(get_read_db),
+    product_id: Optional[int] = Query(None),
+    bucket_from: Optional[datetime] = Query(None, description="Inclusive, UTC"),
+    bucket_to: Optional[datetime] = Query(None, description="Exclusive, UTC"),
+) -> List[StatusTotals]:
+    """Sums the hourly rollup rows in range; no scan of the order table."""
+    return await run_db(db, _sales_by_status, product_id, bucket_from, bucket_to)
+
+
+def _sales_by_status(
+    db: Session, product_id: Optional[int], bucket_from: Optional[datetime], bucket_to: Optional[datetime]
+) -> List[StatusTotals]:
+    stmt = (
+        select(R.status, func.sum(R.orders), func.sum(R.units), func.sum(R.revenue))
+        .where(*_range_conditions(product_id, bucket_from, bucket_to))
+        .group_by(R.status)
+        .order_by(R.status)
+    )
+    return [
+        StatusTotals(status=st, orders=orders, units=units, revenue=round(revenue or 0.0, 2))
+        for st, orders, units, revenue in db.exec(stmt)
+    ]
@@ -1,17 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import update
+from sqlalchemy import insert, tuple_, update
 from sqlmodel import Session, select
 
-from app.api.deps import get_db
+from app.api.deps import DbSession, commit, get_db, get_read_db, rollback, run_db, run_write
+from app.core.config import settings
+from app.core.etag import if_match_versions, make_etag, none_match
+from app.core.export import ExportFormat, export_response
+from app.core.metrics import insufficient_stock, invalid_transitions
+from app.core.pagination import cursor_id, decode_cursor, encode_cursor
+from app.core.serialization import row_json, rows_json
+from app.core.timeutil import utc_naive
 from app.models.order import Order, OrderStatus
 from app.models.product import Product
-from app.schemas.order import OrderCreate, OrderRead, OrderUpdate
+from app.repositories.order_repo import iter_order_rows
+from app.schemas.order import (
+    ORDER_READ_FIELDS,
+    OrderBatchCreate,
+    OrderBulkStatusOutcome,
+    OrderBulkStatusResult,
+    OrderBulkStatusUpdate,
+    OrderCreate,
+    OrderFilter,
+    OrderRead,
+    OrderUpdate,
+)
+from app.services.inventory_service import decrement_stock, reservations
+from app.services.product_cache import product_cache
 
 router = APIRouter()
 
+# OrderRead's columns, in field order (see app.core.serialization)
+_READ_COLUMNS = [getattr(Order, f) for f in ORDER_READ_FIELDS]
+
 
 # ---- Helpers ----
+_ALLOWED_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.PAID, OrderStatus.CANCELED},
+    OrderStatus.PAID: {OrderStatus.SHIPPED, OrderStatus.CANCELED},
+    OrderStatus.SHIPPED: set(),
+    OrderStatus.CANCELED: set(),
+}
+
+
 def _validate_status_transition(current: OrderStatus, new: OrderStatus) -> None:
     """
     Allowed transitions:
@@ -23,19 +59,33 @@ def _validate_status_transition(current: OrderStatus, new: OrderStatus) -> None:
     if current == new:
         return
 
-    allowed = {
-        OrderStatus.PENDING: {OrderStatus.PAID, OrderStatus.CANCELED},
-        OrderStatus.PAID: {OrderStatus.SHIPPED, OrderStatus.CANCELED},
-        OrderStatus.SHIPPED: set(),
-        OrderStatus.CANCELED: set(),
-    }
-    if new not in allowed[current]:
+    if new not in _ALLOWED_TRANSITIONS[current]:
+        invalid_transitions.inc()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"Invalid status transition: {current} -> {new}",
         )
 
 
+def _statuses_that_can_become(new: OrderStatus) -> Set[OrderStatus]:
+    """Reverse of _ALLOWED_TRANSITIONS: every status from which `new` is reachable."""
+    return {current for current, allowed in _ALLOWED_TRANSITIONS.items() if new in allowed}
+
+
+def _filter_conditions(f: OrderFilter) -> list:
+    """WHERE clauses for an OrderFilter (created_from inclusive, created_to exclusive)."""
+    conditions = []
+    if f.status is not None:
+        conditions.append(Order.status == f.status)
+    if f.product_id is not None:
+        conditions.append(Order.product_id == f.product_id)
+    if f.created_from is not None:
+        conditions.append(Order.created_at >= utc_naive(f.created_from))
+    if f.created_to is not None:
+        conditions.append(Order.created_at < utc_naive(f.created_to))
+    return conditions
+
+
 # ---- Routes ----
 @router.post(
     "/",
@@ -82,57 +132,358 @@ def _validate_status_transition(current: OrderStatus, new: OrderStatus) -> None:
     },
 )
 
-def create_order(payload: OrderCreate, db: Session = Depends(get_db)) -> OrderRead:
+async def create_order(payload: OrderCreate, db: DbSession = Depends(get_db)) -> OrderRead:
     """
-    Steps:
-    1) Ensure product exists.
-    2) Atomically decrement stock using a single conditional UPDATE:
+    Steps (one transaction, two statements on success):
+    1) Atomically decrement stock using a single conditional UPDATE:
          UPDATE product SET stock = stock - :qty
          WHERE id = :pid AND stock >= :qty
-       If no rows are affected, stock was insufficient → 409 Conflict.
-    3) Insert order with status=PENDING.
+       If no rows are affected, one SELECT tells a missing product (404)
+       from insufficient stock (409).
+    2) Insert the order with status=PENDING ... RETURNING its columns, then commit.
+    Hot SKUs (HOT_SKU_IDS) skip 1: stock comes from the in-memory reservation engine.
     """
-    product = db.get(Product, payload.product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
+    # Hot-SKU grants live in memory and refills commit on their own, so they
+    # stay out of the group writer's shared transaction.
+    write = run_db if reservations.is_hot(payload.product_id) else run_write
+    order = await write(db, _create_order, payload)
+    product_cache.invalidate(payload.product_id)  # stock changed
+    return order
+
+
+def _create_order(db: Session, payload: OrderCreate) -> OrderRead:
+    if reservations.is_hot(payload.product_id):
+        return _create_hot_sku_order(db, payload)
 
-    # Conditional atomic decrement (best-effort on SQLite; robust on most RDBMS).
+    # Conditional atomic decrement. The stock check and the write are one
+    # statement, so it can't oversell even across processes (SQLite serializes
+    # writers; scripts/stress.py checks the invariant under multi-process load).
     stmt = (
         update(Product)
         .where(Product.id == payload.product_id)
         .where(Product.stock >= payload.quantity)
-        .values(stock=Product.stock - payload.quantity)
+        .values(stock=Product.stock - payload.quantity, version=Product.version + 1)
     )
     result = db.exec(stmt)
     if result.rowcount == 0:
-        # No row updated -> insufficient stock
-        db.rollback()
+        # No row updated: only now find out whether the product exists at all
+        rollback(db)
+        if db.exec(select(Product.id).where(Product.id == payload.product_id)).first() is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        insufficient_stock.inc()
         raise HTTPException(status_code=409, detail="Insufficient stock")
 
-    # Create the order now that stock is decremented
-    order = Order(product_id=payload.product_id, quantity=payload.quantity)
-    db.add(order)
     try:
-        db.commit()
-        db.refresh(order)
+        order = _insert_order(db, payload)
+        commit(db)
     except IntegrityError:
-        db.rollback()
+        rollback(db)
         # Extremely rare here, but keep the shape consistent
         raise HTTPException(status_code=409, detail="Order could not be created")
     return order
 
 
+def _create_hot_sku_order(db: Session, payload: OrderCreate) -> OrderRead:
+    # Units are granted in memory (404/409 raised there); only the order row hits the DB.
+    reservations.reserve(db, payload.product_id, payload.quantity)
+    try:
+        order = _insert_order(db, payload)
+        db.commit()
+    except Exception:
+        db.rollback()
+        reservations.release(payload.product_id, payload.quantity)
+        raise
+    return order
+
+
+def _insert_order(db: Session, payload: OrderCreate) -> OrderRead:
+    """
+    INSERT ... RETURNING the OrderRead columns (SQLite >= 3.35, Postgres), so the
+    new row comes back with the write instead of a flush + refresh SELECT.
+    A Core insert skips the model's Python-side defaults, hence status/created_at here.
+    """
+    row = db.exec(
+        insert(Order)
+        .values(
+            product_id=payload.product_id,
+            quantity=payload.quantity,
+            status=OrderStatus.PENDING,
+            created_at=datetime.utcnow(),
+        )
+        .returning(*_READ_COLUMNS)
+    ).one()
+    return OrderRead.model_validate(dict(zip(ORDER_READ_FIELDS, row)))
+
+
+@router.post(
+    "/batch",
+    response_model=List[OrderRead],
+    status_code=status.HTTP_201_CREATED,
+    summary="Create several orders in one transaction (all-or-nothing)",
+    responses={
+        201: {"description": "Orders created, in request order"},
+        404: {
+            "description": "A product was not found; nothing was created",
+            "content": {
+                "application/json": {"example": {"detail": "Product 3 not found"}}
+            },
+        },
+        409: {
+            "description": "A product had insufficient stock; nothing was created",
+            "content": {
+                "application/json": {"example": {"detail": "Insufficient stock for product 3"}}
+            },
+        },
+        422: {"description": "Validation error"},
+    },
+)
+async def create_orders_batch(payload: OrderBatchCreate, db: DbSession = Depends(get_db)) -> List[OrderRead]:
+    """
+    Steps (single transaction, single commit):
+    1) Sum quantities per product, so repeated lines for one product are checked together.
+    2) Hot SKUs (HOT_SKU_IDS) are granted by the reservation engine, like single orders.
+    3) decrement_stock(): conditional UPDATE per other product in product-id order; any
+       miss → 404/409, the whole batch is rolled back and hot-SKU grants are handed back.
+    4) Insert every order line in one flush (multi-row INSERT), build the response, commit.
+    """
+    created = await run_db(db, _create_orders_batch, payload)
+    product_cache.invalidate(*{item.product_id for item in payload.items})
+    return created
+
+
+def _create_orders_batch(db: Session, payload: OrderBatchCreate) -> List[OrderRead]:
+    quantities: Dict[int, int] = defaultdict(int)
+    for item in payload.items:
+        quantities[item.product_id] += item.quantity
+    # Before any of the batch's own writes: a lease refill commits on `db`.
+    granted = reservations.reserve_many(db, quantities)
+    try:
+        decrement_stock(db, {pid: qty for pid, qty in quantities.items() if pid not in granted})
+
+        orders = [Order(product_id=i.product_id, quantity=i.quantity) for i in payload.items]
+        db.add_all(orders)
+        try:
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Orders could not be created")
+
+        # Serialize before commit: commit expires the objects and would force a re-SELECT per row.
+        created = [OrderRead.model_validate(o, from_attributes=True) for o in orders]
+        db.commit()
+    except Exception:
+        for product_id, qty in granted.items():
+            reservations.release(product_id, qty)
+        raise
+    return created
+
+
+@router.post(
+    "/bulk-status",
+    response_model=OrderBulkStatusResult,
+    summary="Move many orders to one status with a single set-based UPDATE",
+    responses={
+        200: {"description": "Per-order outcomes"},
+        422: {"description": "Validation error (give exactly one of ids / a non-empty filter)"},
+    },
+)
+async def bulk_update_order_status(
+    payload: OrderBulkStatusUpdate, db: DbSession = Depends(get_db)
+) -> OrderBulkStatusResult:
+    """
+    Same transition table as PUT /orders/{id}, applied in SQL:
+        UPDATE "order" SET status = :new, version = version + 1
+        WHERE <ids or filter> AND status IN (<statuses that may move to :new>)
+        RETURNING id
+    - ids mode: every requested id gets an outcome (updated / unchanged / not_found /
+      invalid_transition); one extra SELECT classifies the ids that didn't move.
+    - filter mode: only the orders that moved are listed, at most `limit` per call
+      (lowest ids first); `has_more` = call again for the rest. The filter must
+      set at least one field.
+    """
+    return await run_db(db, _bulk_update_order_status, payload)
+
+
+def _bulk_update_order_status(db: Session, payload: OrderBulkStatusUpdate) -> OrderBulkStatusResult:
+    new = payload.status
+    stmt = (
+        update(Order)
+        .where(Order.status.in_(_statuses_that_can_become(new)))
+        .values(status=new, version=Order.version + 1)
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    )
+    ids: List[int] = []
+    if payload.ids is not None:
+        ids = list(dict.fromkeys(payload.ids))  # de-dupe, keep request order
+        stmt = stmt.where(Order.id.in_(ids))
+    else:
+        # Bounded: pick the first `limit` movable matches, then move exactly those.
+        movable = (
+            select(Order.id)
+            .where(Order.status.in_(_statuses_that_can_become(new)), *_filter_conditions(payload.filter))
+            .order_by(Order.id)
+            .limit(payload.limit)
+        )
+        stmt = stmt.where(Order.id.in_(movable.scalar_subquery()))
+
+    moved = set(db.exec(stmt).scalars())
+    if payload.ids is None:
+        has_more = len(moved) == payload.limit and db.exec(movable.limit(1)).first() is not None
+        db.commit()
+        return OrderBulkStatusResult(
+            updated=len(moved),
+            results=[
+                OrderBulkStatusOutcome(id=oid, result="updated", status=new) for oid in sorted(moved)
+            ],
+            has_more=has_more,
+        )
+
+    leftover = [oid for oid in ids if oid not in moved]
+    current = dict(db.exec(select(Order.id, Order.status).where(Order.id.in_(leftover))).all()) if leftover else {}
+    db.commit()
+
+    results = []
+    for oid in ids:
+        if oid in moved:
+            results.append(OrderBulkStatusOutcome(id=oid, result="updated", status=new))
+        elif oid not in current:
+            results.append(OrderBulkStatusOutcome(id=oid, result="not_found"))
+        elif current[oid] == new:
+            results.append(OrderBulkStatusOutcome(id=oid, result="unchanged", status=new))
+        else:
+            results.append(OrderBulkStatusOutcome(id=oid, result="invalid_transition", status=current[oid]))
+    if rejected := sum(1 for r in results if r.result == "invalid_transition"):
+        invalid_transitions.inc(amount=rejected)
+    return OrderBulkStatusResult(updated=len(moved), results=results)
+
+
+@router.get(
+    "/",
+    response_model=List[OrderRead],
+    summary="List orders (filtered, keyset-paginated by created_at, id)",
+    responses={
+        200: {
+            "description": "Orders, oldest first",
+            "headers": {
+                "X-Next-Cursor": {
+                    "description": "Opaque cursor for the next page; absent on the last page",
+                    "schema": {"type": "string"},
+                }
+            },
+        },
+        400: {"description": "Invalid cursor"},
+    },
+)
+async def list_orders(
+    db: DbSession = Depends(get_read_db),
+    status_: Optional[OrderStatus] = Query(None, alias="status"),
+    product_id: Optional[int] = Query(None),
+    created_from: Optional[datetime] = Query(None, description="Inclusive, UTC"),
+    created_to: Optional[datetime] = Query(None, description="Exclusive, UTC"),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+):
+    """
+    Ordered by (created_at, id). Each page continues with
+        WHERE (created_at, id) > (:last_created_at, :last_id)
+    so every page is one range scan on a composite index, at any depth:
+      - status given     → ix_order_status_created_at (covers the whole row)
+      - product_id given → ix_order_product_created_at
+    """
+    f = OrderFilter(status=status_, product_id=product_id, created_from=created_from, created_to=created_to)
+    after = None
+    if cursor:
+        values = decode_cursor(cursor)
+        try:
+            created_at = datetime.fromisoformat(values["c"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        after = (created_at, cursor_id(values))
+
+    rows = await run_db(db, _list_orders, f, after, limit)
+    headers = None
+    if len(rows) == limit:
+        last = rows[-1]
+        headers = {"X-Next-Cursor": encode_cursor({"c": last.created_at.isoformat(), "id": last.id})}
+    return Response(content=rows_json(ORDER_READ_FIELDS, rows), media_type="application/json", headers=headers)
+
+
+def _list_orders(db: Session, f: OrderFilter, after: Optional[tuple], limit: int) -> list:
+    stmt = (
+        select(*_READ_COLUMNS)
+        .where(*_filter_conditions(f))
+        .order_by(Order.created_at, Order.id)
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(Order.created_at, Order.id) > tuple_(*after))
+    return db.exec(stmt).all()
+
+
+# Registered before /{order_id}, which would otherwise claim "export".
+@router.get(
+    "/export",
+    summary="Export orders as streamed NDJSON or CSV",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Matching orders in id order (CSV starts with a header row)",
+            "content": {"application/x-ndjson": {}, "text/csv": {}},
+        },
+    },
+)
+async def export_orders(
+    status_: Optional[OrderStatus] = Query(None, alias="status"),
+    product_id: Optional[int] = Query(None),
+    created_from: Optional[datetime] = Query(None, description="Inclusive, UTC"),
+    created_to: Optional[datetime] = Query(None, description="Exclusive, UTC"),
+    format: ExportFormat = Query("ndjson"),
+    gzip: bool = Query(False, description="Send the body gzip-encoded (Content-Encoding: gzip)"),
+):
+    """
+    For reconciliation / full copies: same filters as GET /orders, no page size.
+    Rows are read in keyset batches on the primary key (WHERE id > :last AND
+    <filters> ORDER BY id) and written out as they come, so memory stays flat
+    from a thousand rows to tens of millions.
+    """
+    f = OrderFilter(status=status_, product_id=product_id, created_from=created_from, created_to=created_to)
+    rows = iter_order_rows(_filter_conditions(f), batch_size=settings.EXPORT_BATCH_SIZE)
+    return export_response("orders", ORDER_READ_FIELDS, rows, format, gzip)
+
+
 @router.get(
     "/{order_id}",
     response_model=OrderRead,
     summary="Get an order by ID",
-    responses={404: {"description": "Order not found"}},
+    responses={
+        200: {"description": "Order (with an ETag header)"},
+        304: {"description": "Not modified (If-None-Match matched the current ETag)"},
+        404: {"description": "Order not found"},
+    },
 )
-def get_order(order_id: int, db: Session = Depends(get_db)) -> OrderRead:
-    order = db.get(Order, order_id)
-    if not order:
+async def get_order(
+    order_id: int,
+    db: DbSession = Depends(get_read_db),
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
+) -> OrderRead:
+    """
+    ETag is the order's row version; a matching If-None-Match gets 304 and no body.
+    """
+    # Read as a column tuple and encoded directly; the body matches OrderRead.
+    *row, version = await run_db(db, _get_order, order_id)
+    etag = make_etag("o", order_id, version)
+    if none_match(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=row_json(ORDER_READ_FIELDS, row), media_type="application/json", headers={"ETag": etag})
+
+
+def _get_order(db: Session, order_id: int) -> tuple:
+    """OrderRead columns + version, as one tuple."""
+    row = db.exec(select(*_READ_COLUMNS, Order.version).where(Order.id == order_id)).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Order not found")
-    return order
+    return tuple(row)
 
 
 @router.put(
@@ -142,28 +493,61 @@ def get_order(order_id: int, db: Session = Depends(get_db)) -> OrderRead:
     responses={
         200: {"description": "Order updated"},
         404: {"description": "Order not found"},
-        409: {"description": "Invalid status transition"},
+        409: {"description": "Invalid status transition / concurrent modification"},
+        412: {"description": "If-Match did not match the current ETag"},
         422: {"description": "Validation error"},
     },
 )
-def update_order(order_id: int, payload: OrderUpdate, db: Session = Depends(get_db)) -> OrderRead:
+async def update_order(
+    order_id: int,
+    payload: OrderUpdate,
+    response: Response,
+    db: DbSession = Depends(get_db),
+    if_match: Optional[str] = Header(default=None, alias="If-Match"),
+) -> OrderRead:
     """
     - Only 'status' can change via API (quantity/product_id are immutable here).
     - Enforce valid transitions with _validate_status_transition().
+    - Optional If-Match (ETag from a GET) → 412 if the order changed since.
     """
+    versions = if_match_versions(if_match, "o", order_id)
+    order = await run_write(db, _update_order, order_id, payload, versions)
+    response.headers["ETag"] = make_etag("o", order.id, order.version)
+    return order
+
+
+def _update_order(
+    db: Session, order_id: int, payload: OrderUpdate, versions: Optional[List[int]]
+) -> Order:
     order = db.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
+    if versions is not None and order.version not in versions:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Order has been modified"
+        )
 
     data = payload.model_dump(exclude_unset=True)
 
     if "status" in data and data["status"] is not None:
         _validate_status_transition(order.status, data["status"])
-        order.status = data["status"]
-
-    db.add(order)
-    db.commit()
-    db.refresh(order)
+        if data["status"] != order.status:
+            # Write only if the row is still at the version we validated against,
+            # so a concurrent transition can't be silently overwritten.
+            stmt = (
+                update(Order)
+                .where(Order.id == order_id)
+                .where(Order.version == order.version)
+                .values(status=data["status"], version=Order.version + 1)
+            )
+            if db.exec(stmt).rowcount == 0:
+                rollback(db)
+                raise HTTPException(
+                    status_code=412 if versions is not None else 409,
+                    detail="Order has been modified",
+                )
+            commit(db)
+            db.refresh(order)
     return order
 
 
@@ -177,12 +561,17 @@ def update_order(order_id: int, payload: OrderUpdate, db: Session = Depends(get_
         409: {"description": "Deletion not allowed in this state"},
     },
 )
-def delete_order(order_id: int, db: Session = Depends(get_db)) -> None:
+async def delete_order(order_id: int, db: DbSession = Depends(get_db)) -> None:
     """
     Deletion policy:
       - Allowed only when the order is PENDING (no external effects yet).
       - Otherwise return 409 and suggest 'cancel' semantics via status=CANCELED.
     """
+    await run_db(db, _delete_order, order_id)
+    return None
+
+
+def _delete_order(db: Session, order_id: int) -> None:
     order = db.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -195,4 +584,3 @@ def delete_order(order_id: int, db: Session = Depends(get_db)) -> None:
 
     db.delete(order)
     db.commit()
-    return None
@@ -1,15 +1,35 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import update
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
-from app.api.deps import get_db
+from app.api.deps import DbSession, commit, get_db, get_read_db, rollback, run_db, run_write
+from app.core.config import settings
+from app.core.etag import if_match_versions, make_etag, none_match
+from app.core.export import ExportFormat, export_response
+from app.core.pagination import cursor_id, decode_cursor, encode_cursor
+from app.core.serialization import row_json, rows_json
 from app.models.product import Product
-from app.schemas.product import ProductCreate, ProductRead, ProductUpdate
+from app.repositories.product_repo import iter_product_rows
+from app.schemas.product import (
+    PRODUCT_READ_FIELDS,
+    BulkImportResult,
+    ProductCreate,
+    ProductRead,
+    ProductUpdate,
+)
+from app.services.catalog_import import import_format, import_products
+from app.services.inventory_service import reservations
+from app.services.product_cache import product_cache
 
 router = APIRouter()
 
+# ProductRead's columns, in field order: rows come back as tuples ready for rows_json()
+_READ_COLUMNS = [getattr(Product, f) for f in PRODUCT_READ_FIELDS]
+
 
 @router.post(
     "/",
@@ -51,61 +71,214 @@ router = APIRouter()
     },
 )
 
-def create_product(payload: ProductCreate, db: Session = Depends(get_db)) -> ProductRead:
+async def create_product(payload: ProductCreate, db: DbSession = Depends(get_db)) -> ProductRead:
     """
     Flow:
     1) FastAPI validates the body against ProductCreate (Pydantic) → 422 on bad data.
     2) We build a Product DB object and try to insert.
     3) If SKU already exists, DB raises IntegrityError → we return 409 Conflict.
     """
+    product = await run_write(db, _create_product, payload)
+    product_cache.invalidate(product.id)
+    return product
+
+
+def _create_product(db: Session, payload: ProductCreate) -> Product:
     product = Product(**payload.model_dump())
     db.add(product)
     try:
-        db.commit()
+        commit(db)
         db.refresh(product)
     except IntegrityError:
-        db.rollback()
+        rollback(db)
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="SKU already exists"
         )
     return product
 
 
+@router.post(
+    "/bulk",
+    response_model=BulkImportResult,
+    summary="Bulk import products from a streamed CSV or NDJSON body",
+    responses={
+        200: {"description": "Import finished; per-row conflicts/validation errors are listed in `issues`"},
+        415: {"description": "Unsupported Content-Type"},
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "text/csv": {
+                    "schema": {"type": "string"},
+                    "example": "sku,name,price,stock\nSKU-1,Widget,9.99,25\nSKU-2,Gadget,4.50,10\n",
+                },
+                "application/x-ndjson": {
+                    "schema": {"type": "string"},
+                    "example": '{"sku": "SKU-1", "name": "Widget", "price": 9.99, "stock": 25}\n',
+                },
+            },
+        }
+    },
+)
+async def bulk_import_products(request: Request, db: DbSession = Depends(get_db)) -> BulkImportResult:
+    """
+    - Body is read as a stream and validated row by row against ProductCreate.
+    - Valid rows are inserted BULK_IMPORT_BATCH_SIZE at a time (one multi-row INSERT + one commit each).
+    - Existing / repeated SKUs are skipped and reported, never fatal; earlier batches stay committed.
+    """
+    fmt = import_format(request.headers.get("content-type"))
+    try:
+        return await import_products(db, request.stream(), fmt)
+    finally:
+        product_cache.invalidate()  # batches may have committed even if the upload failed later
+
+
 @router.get(
     "/",
     response_model=List[ProductRead],
     summary="List products",
-    responses={200: {"description": "List of products"}},
+    responses={
+        200: {
+            "description": "List of products (or an NDJSON stream when stream=true)",
+            "headers": {
+                "X-Next-Cursor": {
+                    "description": "Opaque cursor for the next page; absent on the last page",
+                    "schema": {"type": "string"},
+                }
+            },
+            "content": {"application/x-ndjson": {}},
+        },
+        400: {"description": "Invalid cursor"},
+    },
 )
-def list_products(
-    db: Session = Depends(get_db),
-    # Simple, optional pagination. The assignment says pagination can be skipped;
-    # we'll include light support: limit/offset with bounds to keep it safe.
+async def list_products(
+    db: DbSession = Depends(get_read_db),
+    # Bounded page size keeps a single response cheap.
     limit: int = Query(100, ge=1, le=500),
+    # Legacy offset paging; still supported but gets slower the deeper you go.
     offset: int = Query(0, ge=0),
-) -> List[ProductRead]:
+    cursor: Optional[str] = Query(
+        None, description="Opaque cursor from X-Next-Cursor; takes precedence over offset"
+    ),
+    stream: bool = Query(
+        False,
+        description="Stream every product after the cursor as NDJSON, fetching `limit` rows per batch",
+    ),
+):
+    """
+    Two paging modes, both ordered by id:
+      - offset: LIMIT/OFFSET as before (the DB scans and discards `offset` rows).
+      - cursor: WHERE id > :last_id, an index seek → flat latency at any depth.
+    Every full page sets X-Next-Cursor, so offset clients can switch to cursors mid-way.
+    With stream=true the rows are written out as NDJSON while they're read in batches.
+    Pages are served from the product cache when possible (streams never are).
+    """
+    # Rows are selected as column tuples and encoded straight to JSON (no ORM
+    # objects, no per-row model validation); the body matches List[ProductRead].
+    after_id = 0
+    if cursor:
+        after_id = cursor_id(decode_cursor(cursor))
+
+    if stream:
+        lines = (
+            row_json(PRODUCT_READ_FIELDS, row) + b"\n"
+            for row in iter_product_rows(after_id=after_id, batch_size=limit)
+        )
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    key = (limit, offset, after_id) if cursor else (limit, offset, None)
+    page = product_cache.get_page(key)
+    if page is None:
+        generation = product_cache.generation
+        rows = await run_db(db, _list_products, *key)
+        next_cursor = encode_cursor({"id": rows[-1][0]}) if len(rows) == limit else None
+        page = (rows_json(PRODUCT_READ_FIELDS, rows), next_cursor)
+        product_cache.put_page(key, page, generation)
+
+    body, next_cursor = page
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _list_products(db: Session, limit: int, offset: int, after_id: Optional[int]) -> List[tuple]:
+    stmt = select(*_READ_COLUMNS).order_by(Product.id).limit(limit)
+    if after_id is not None:
+        stmt = stmt.where(Product.id > after_id)
+    else:
+        stmt = stmt.offset(offset)
+    return db.exec(stmt).all()
+
+
+# Registered before /{product_id}, which would otherwise claim "export".
+@router.get(
+    "/export",
+    summary="Export every product as streamed NDJSON or CSV",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "All products in id order (CSV starts with a header row)",
+            "content": {"application/x-ndjson": {}, "text/csv": {}},
+        },
+    },
+)
+async def export_products(
+    format: ExportFormat = Query("ndjson"),
+    gzip: bool = Query(False, description="Send the body gzip-encoded (Content-Encoding: gzip)"),
+):
     """
-    Returns products with optional limit/offset.
-    Keep it tiny for the assignment; we don't need cursor-based pagination here.
+    For reconciliation / full copies. Rows are read in keyset batches
+    (WHERE id > :last ORDER BY id) and written out as they come, so memory
+    stays flat and there is no OFFSET re-scan however big the catalog is.
+    Bypasses the product cache.
     """
-    stmt = select(Product).offset(offset).limit(limit)
-    return list(db.exec(stmt))
+    rows = iter_product_rows(batch_size=settings.EXPORT_BATCH_SIZE)
+    return export_response("products", PRODUCT_READ_FIELDS, rows, format, gzip)
 
 
 @router.get(
     "/{product_id}",
     response_model=ProductRead,
     summary="Get a single product by ID",
-    responses={404: {"description": "Product not found"}},
+    responses={
+        200: {"description": "Product (with an ETag header)"},
+        304: {"description": "Not modified (If-None-Match matched the current ETag)"},
+        404: {"description": "Product not found"},
+    },
 )
-def get_product(product_id: int, db: Session = Depends(get_db)) -> ProductRead:
+async def get_product(
+    product_id: int,
+    db: DbSession = Depends(get_read_db),
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
+) -> ProductRead:
     """
     404 if the product does not exist.
+    - Served from the product cache when possible.
+    - ETag is the row version; a matching If-None-Match gets 304 and no body
+      (and on a cache hit, no DB access either).
     """
-    product = db.get(Product, product_id)
-    if not product:
+    item = product_cache.get_item(product_id)
+    if item is None:
+        generation = product_cache.generation
+        *row, version = await run_db(db, _get_product, product_id)
+        etag = make_etag("p", product_id, version)
+        if none_match(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        item = (row_json(PRODUCT_READ_FIELDS, row), etag)
+        product_cache.put_item(product_id, item, generation)
+
+    body, etag = item
+    if none_match(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def _get_product(db: Session, product_id: int) -> tuple:
+    """ProductRead columns + version, as one tuple."""
+    row = db.exec(select(*_READ_COLUMNS, Product.version).where(Product.id == product_id)).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    return tuple(row)
 
 
 @router.put(
@@ -116,37 +289,87 @@ def get_product(product_id: int, db: Session = Depends(get_db)) -> ProductRead:
         200: {"description": "Product updated"},
         404: {"description": "Product not found"},
         409: {"description": "Duplicate SKU"},
+        412: {"description": "If-Match did not match the current ETag"},
         422: {"description": "Validation error"},
     },
 )
-def update_product(
+async def update_product(
     product_id: int,
     payload: ProductUpdate,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: DbSession = Depends(get_db),
+    if_match: Optional[str] = Header(default=None, alias="If-Match"),
 ) -> ProductRead:
     """
     - We support *partial* updates using exclude_unset=True.
     - If SKU is changed to an existing one, DB throws IntegrityError → 409.
+    - Optional If-Match (ETag from a GET) → the update only applies if nobody
+      changed the product since; otherwise 412 Precondition Failed.
     """
-    product = db.get(Product, product_id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
+    versions = if_match_versions(if_match, "p", product_id)
+    try:
+        product = await run_db(db, _update_product, product_id, payload, versions)
+    finally:
+        # Failures too: a 412 means the cached copy is the stale one
+        product_cache.invalidate(product_id)
+    response.headers["ETag"] = make_etag("p", product.id, product.version)
+    return product
 
+
+def _update_product(
+    db: Session, product_id: int, payload: ProductUpdate, versions: Optional[List[int]]
+) -> Product:
     update_data = payload.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(product, field, value)
+    if not update_data:
+        # Nothing to change: no write and no version bump, so outstanding ETags stay valid.
+        product = db.get(Product, product_id)
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if versions is not None and product.version not in versions:
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Product has been modified"
+            )
+        return product
+
+    values = dict(update_data)
+    unsold = 0
+    if reservations.is_hot(product_id):
+        # Leased-but-unsold units go back onto the row in this same UPDATE (one
+        # version bump, still under If-Match). A new absolute `stock` replaces
+        # them instead, so they aren't double counted.
+        unsold = reservations.withdraw(product_id)
+        if unsold and "stock" not in values:
+            values["stock"] = Product.stock + unsold
+
+    stmt = (
+        update(Product)
+        .where(Product.id == product_id)
+        .values(**values, version=Product.version + 1)
+    )
+    if versions is not None:
+        # Optimistic concurrency: check and write in one statement, so there's no race window.
+        stmt = stmt.where(Product.version.in_(versions))
 
     try:
-        db.add(product)
-        db.commit()
-        db.refresh(product)
+        updated = db.exec(stmt).rowcount
     except IntegrityError:
         db.rollback()
+        reservations.release(product_id, unsold)
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="SKU already exists"
         )
 
-    return product
+    if updated == 0:
+        db.rollback()
+        reservations.release(product_id, unsold)
+        if db.get(Product, product_id) is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Product has been modified"
+        )
+
+    db.commit()
+    return db.get(Product, product_id)
 
 
 @router.delete(
@@ -155,14 +378,21 @@ def update_product(
     summary="Delete a product",
     responses={204: {"description": "Product deleted"}, 404: {"description": "Not found"}},
 )
-def delete_product(product_id: int, db: Session = Depends(get_db)) -> None:
+async def delete_product(product_id: int, db: DbSession = Depends(get_db)) -> None:
     """
     204 No Content on success (no response body).
     """
+    await run_db(db, _delete_product, product_id)
+    product_cache.invalidate(product_id)
+    return None  # FastAPI will send an empty body with 204
+
+
+def _delete_product(db: Session, product_id: int) -> None:
     product = db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
     db.delete(product)
     db.commit()
-    return None  # FastAPI will send an empty body with 204
+    if reservations.is_hot(product_id):
+        reservations.discard(product_id)
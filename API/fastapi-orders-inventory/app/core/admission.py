@@ -0,0 +1,151 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.serialization import dumps
+
+admission_queue_time = registry.histogram(
+    "admission_queue_seconds", "Time admitted requests waited for a slot, by route class.", ("class",)
+)
+admission_shed = registry.counter(
+    "admission_shed_total", "Requests answered 503 by admission control, by route class and reason.",
+    ("class", "reason"),
+)
+
+_SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """reads / writes / webhooks; None = always admitted (/health*, /metrics, docs)."""
+    if path.startswith("/webhooks/"):
+        return "webhooks"
+    if path.startswith(("/orders", "/products", "/analytics")):
+        return "reads" if method in _SAFE_METHODS else "writes"
+    return None
+
+
+class Limiter:
+    """
+    At most `limit` concurrent holders; the rest wait in FIFO order for at most
+    `queue_timeout` seconds (and at most `max_queue` of them), then give up.
+    A release hands the slot straight to the oldest waiter. Event-loop only:
+    no locks, every method runs on the loop.
+    """
+
+    def __init__(self, name: str, limit: int, queue_timeout: float, max_queue: int) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """None once a slot is held; otherwise why not ("queue_full" / "queue_timeout")."""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return None  # a release handed us the slot just as the wait ran out: it's ours
+            self._discard(future)
+            return "queue_timeout"
+        except BaseException:  # client went away while queued
+            if future.done() and not future.cancelled():
+                self.release()  # the slot was already ours
+            else:
+                self._discard(future)
+            raise
+        return None
+
+    def release(self) -> None:
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)  # hand the slot over; in_flight stays the same
+                return
+        self.in_flight -= 1
+
+    def _discard(self, future: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+
+
+limiters: Dict[str, Limiter] = {
+    name: Limiter(name, limit, settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000, settings.ADMISSION_MAX_QUEUE)
+    for name, limit in (
+        ("reads", settings.ADMISSION_READ_LIMIT),
+        ("writes", settings.ADMISSION_WRITE_LIMIT),
+        ("webhooks", settings.ADMISSION_WEBHOOK_LIMIT),
+    )
+}
+
+
+def _shed_response() -> Tuple[List[Tuple[bytes, bytes]], bytes]:
+    body = dumps({"detail": "Server busy, retry shortly"})
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(settings.ADMISSION_RETRY_AFTER_SECONDS).encode()),
+    ]
+    return headers, body
+
+
+class AdmissionMiddleware:
+    """
+    Load shedding per route class. Without it every request under overload
+    queues (for the threadpool, the pools, the write lock) with no bound, until
+    even /health times out. Here a class gets a fixed number of slots; excess
+    requests wait briefly, then get 503 + Retry-After in microseconds instead of
+    timing out after seconds, so admitted requests keep their normal latency.
+    Queue time is reported as `Server-Timing: queue;dur=<ms>` and in /metrics.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        name = route_class(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = limiters[name]
+        started = time.perf_counter()
+        refused = await limiter.acquire()
+        waited = time.perf_counter() - started
+        if refused is not None:
+            admission_shed.inc(name, refused)
+            headers, body = _shed_response()
+            await send({"type": "http.response.start", "status": 503, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+        admission_queue_time.observe(waited, name)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                timing = f"queue;dur={waited * 1000:.2f};desc=\"{name}\"".encode("latin-1")
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", timing)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            limiter.release()
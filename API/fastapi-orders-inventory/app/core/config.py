@@ -1,3 +1,5 @@
+from typing import List, Literal, Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -5,9 +7,113 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./app.db"
     ECHO_SQL: bool = False  # turn True while debugging SQL
 
+    # Per-request SQL profiling: statement count, DB time and the slowest
+    # statements in a Server-Timing header, plus a warning when one request runs
+    # the same statement shape more than SQL_PROFILE_REPEAT_THRESHOLD times (N+1).
+    # On for a random SQL_PROFILE_SAMPLE_RATE share of all requests, or for a
+    # request that asks with an "X-Profile-SQL" header: "X-Profile-SQL: 1" only
+    # while debugging (SQL_PROFILE_HEADER_ENABLED), otherwise the header value
+    # must be SQL_PROFILE_HEADER_SECRET. The header carries timings and counts;
+    # statement text only with SQL_PROFILE_STATEMENT_TEXT.
+    SQL_PROFILE_HEADER_ENABLED: bool = False
+    SQL_PROFILE_HEADER_SECRET: Optional[str] = None
+    SQL_PROFILE_STATEMENT_TEXT: bool = False
+    SQL_PROFILE_SAMPLE_RATE: float = 0.0     # 0.0 … 1.0
+    SQL_PROFILE_REPEAT_THRESHOLD: int = 10
+    SQL_PROFILE_TOP_STATEMENTS: int = 3
+
+    # Engine profile.
+    #   default    → plain engine, SQLAlchemy defaults (fine for dev/tests)
+    #   production → SQLite pragmas below on every connection + separate
+    #                read-only and write pools, so GETs never queue behind writes
+    DB_PROFILE: Literal["default", "production"] = "default"
+    SQLITE_JOURNAL_MODE: str = "WAL"         # readers don't block the writer (and vice versa)
+    SQLITE_SYNCHRONOUS: str = "NORMAL"       # safe with WAL; fsync at checkpoints, not every commit
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KIB: int = 64 * 1024   # page cache per connection
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000       # wait for the write lock instead of "database is locked"
+    DB_WRITE_POOL_SIZE: int = 5
+    DB_READ_POOL_SIZE: int = 10
+    DB_POOL_MAX_OVERFLOW: int = 10
+    DB_CONNECTION_HOLD_WARN_SECONDS: float = 5.0  # log/flag connections held longer than this
+
+    # Async DB path: request handlers use an AsyncSession on an async driver
+    # (aiosqlite for SQLite) instead of a sync Session in the threadpool.
+    # File-backed databases only. ASYNC_DATABASE_URL defaults to DATABASE_URL
+    # with the async driver swapped in.
+    DB_ASYNC: bool = False
+    ASYNC_DATABASE_URL: Optional[str] = None
+
+    # Write path for order/product/payment mutations.
+    #   direct → every request commits its own transaction (one fsync each)
+    #   group  → requests hand their write to one writer thread per process,
+    #            which runs whatever arrived within DB_GROUP_COMMIT_WINDOW_MS as
+    #            one transaction (a savepoint per request, one COMMIT per group)
+    DB_WRITE_MODE: Literal["direct", "group"] = "direct"
+    DB_GROUP_COMMIT_WINDOW_MS: float = 2.0
+    DB_GROUP_COMMIT_MAX_JOBS: int = 256
+
     # Webhook security
     PAYMENT_WEBHOOK_SECRET: str = "change-me-in-.env"   # set in .env for real
     WEBHOOK_MAX_SKEW_SECONDS: int = 300                 # 5 minutes
+    # Deliveries already handled within the skew window are answered from memory
+    # (keyed by signature and, when present, the payload's event "id"). The cap
+    # bounds memory; later repeats just take the normal (idempotent) path.
+    WEBHOOK_REPLAY_CACHE_MAX_ENTRIES: int = 100_000
+    # Signed batch envelopes ({"events": [...]}): verified once, applied in one transaction.
+    WEBHOOK_MAX_BATCH_EVENTS: int = 50_000
+
+    # Payment webhook ingestion.
+    #   inline → verify, load the order and commit inside the request (200)
+    #   queue  → verify, append to a durable SQLite outbox and answer 202; a
+    #            background worker marks orders PAID in batches (one UPDATE each)
+    WEBHOOK_INGEST_MODE: Literal["inline", "queue"] = "inline"
+    WEBHOOK_OUTBOX_URL: str = "sqlite:///./webhook_outbox.db"  # its own file: never waits on app.db
+    WEBHOOK_WORKER_BATCH_SIZE: int = 500
+    WEBHOOK_WORKER_POLL_SECONDS: float = 0.05           # idle sleep between outbox polls
+
+    # Admission control (load shedding) per route class: at most LIMIT requests
+    # of a class run at once; the next ones wait up to ADMISSION_QUEUE_TIMEOUT_MS
+    # for a slot (at most ADMISSION_MAX_QUEUE waiting), then get 503 + Retry-After.
+    # /health*, /metrics and the docs are never queued. Keep the sum of the
+    # limits below the threadpool size (40) so sync endpoints such as /health
+    # always find a free thread.
+    ADMISSION_CONTROL_ENABLED: bool = True
+    ADMISSION_READ_LIMIT: int = 20                      # GET /products, /orders, /analytics
+    ADMISSION_WRITE_LIMIT: int = 10                     # POST/PUT/DELETE on /products, /orders
+    ADMISSION_WEBHOOK_LIMIT: int = 6                    # /webhooks/*
+    ADMISSION_QUEUE_TIMEOUT_MS: float = 500.0
+    ADMISSION_MAX_QUEUE: int = 200                      # per class
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+
+    # Idempotency-Key on POST /orders/ and POST /products/: the first response
+    # per key is kept this long and replayed to retries (in-process store).
+    IDEMPOTENCY_TTL_SECONDS: float = 24 * 3600
+    IDEMPOTENCY_MAX_ENTRIES: int = 100_000
+
+    # In-process product read cache (GET /products, GET /products/{id}).
+    # Invalidated on every product/stock write in this process; other workers'
+    # writes show up once entries expire.
+    PRODUCT_CACHE_ENABLED: bool = True
+    PRODUCT_CACHE_MAX_ENTRIES: int = 10_000             # cached product bodies
+    PRODUCT_CACHE_MAX_PAGES: int = 256                  # cached listing pages
+    PRODUCT_CACHE_TTL_SECONDS: float = 10.0
+
+    # Hot-SKU reservation engine (flash sales). Orders for these product ids are
+    # granted from in-memory, sharded stock leased from the product row in
+    # blocks of HOT_SKU_LEASE_SIZE, instead of one contended UPDATE per order.
+    HOT_SKU_IDS: List[int] = []                         # e.g. HOT_SKU_IDS='[42, 43]'
+    HOT_SKU_SHARDS: int = 8
+    HOT_SKU_LEASE_SIZE: int = 100
+
+    # Streaming exports (GET /orders/export, GET /products/export)
+    EXPORT_BATCH_SIZE: int = 1000                       # rows per keyset query
+    EXPORT_CHUNK_BYTES: int = 64 * 1024                 # body chunk size handed to the server
+    EXPORT_GZIP_LEVEL: int = 6
+
+    # Bulk product import (POST /products/bulk)
+    BULK_IMPORT_BATCH_SIZE: int = 1000                  # rows per multi-row INSERT + commit
+    BULK_IMPORT_MAX_REPORTED_ISSUES: int = 1000         # cap on per-row issues echoed back
     
     class Config:
         env_file = ".env"  # optional, for overrides in deployment
@@ -2,9 +2,15 @@ from typing import Any, Dict, List
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import IntegrityError, OperationalError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
+from app.core.metrics import registry
+
+database_locked = registry.counter(
+    "db_locked_errors_total", "Requests that gave up waiting for the SQLite write lock (answered 503)."
+)
+
 
 def http_exception_handler(_: Request, exc: StarletteHTTPException) -> JSONResponse:
     """
@@ -49,10 +55,29 @@ def integrity_error_handler(_: Request, __: IntegrityError) -> JSONResponse:
     )
 
 
+def operational_error_handler(_: Request, exc: OperationalError) -> JSONResponse:
+    """
+    SQLite "database is locked": the write lock stayed busy past
+    SQLITE_BUSY_TIMEOUT_MS. That's load, not a bug, so answer 503 + Retry-After
+    and let the client retry. Any other OperationalError stays a 500.
+    """
+    if "locked" not in str(exc.orig).lower():
+        raise exc
+    database_locked.inc()
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database busy, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
 def add_exception_handlers(app) -> None:
     """
-    Register all handlers at app startup.
+    Register all handlers. Call right after creating the app: Starlette
+    builds its middleware stack (exception handlers included) on the first
+    event it receives, which is lifespan startup.
     """
     app.add_exception_handler(StarletteHTTPException, http_exception_handler)
     app.add_exception_handler(RequestValidationError, validation_exception_handler)
     app.add_exception_handler(IntegrityError, integrity_error_handler)
+    app.add_exception_handler(OperationalError, operational_error_handler)
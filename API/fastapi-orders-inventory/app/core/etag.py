@@ -0,0 +1,43 @@
+from typing import List, Optional
+
+# Strong ETags built from the row version: "<kind><id>-v<version>", e.g. "p12-v3".
+# They change whenever the row changes, so a matching If-None-Match proves the
+# client's copy is current without rendering the body.
+
+
+def make_etag(kind: str, row_id: int, version: int) -> str:
+    return f'"{kind}{row_id}-v{version}"'
+
+
+def _tags(header: str) -> List[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def none_match(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    True if an If-None-Match header matches `etag` → answer 304.
+    Uses the weak comparison RFC 9110 asks for here (a W/ prefix is ignored).
+    """
+    if not if_none_match:
+        return False
+    for tag in _tags(if_none_match):
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def if_match_versions(if_match: Optional[str], kind: str, row_id: int) -> Optional[List[int]]:
+    """
+    Versions an If-Match header allows for this row.
+    - None → no precondition (header absent or "*").
+    - []   → nothing can match (weak / foreign / garbage tags) → 412.
+    Strong comparison only, as RFC 9110 requires for If-Match.
+    """
+    if not if_match or if_match.strip() == "*":
+        return None
+    prefix = f'"{kind}{row_id}-v'
+    versions = []
+    for tag in _tags(if_match):
+        if tag.startswith(prefix) and tag.endswith('"') and tag[len(prefix):-1].isdigit():
+            versions.append(int(tag[len(prefix):-1]))
+    return versions
@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.serialization import dumps
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = (b"idempotent-replayed", b"true")
+
+# Requests that create something: a retried POST must not create it twice.
+IDEMPOTENT_ROUTES = {("POST", "/orders/"), ("POST", "/products/")}
+
+idempotent_requests = registry.counter(
+    "idempotency_requests_total",
+    "Requests carrying an Idempotency-Key, by outcome (executed / replayed / coalesced / rejected).",
+    ("result",),
+)
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+# (method, path, key) → the first response. Bounded + TTL like the other caches;
+# per process, so with several workers a retry that lands on another worker
+# still runs (the stock UPDATE keeps that from overselling, not this store).
+idempotency_store: TTLCache[StoredResponse] = TTLCache(
+    settings.IDEMPOTENCY_MAX_ENTRIES, settings.IDEMPOTENCY_TTL_SECONDS
+)
+
+
+def _error(status: int, detail: str) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    body = dumps({"detail": detail})
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    return status, headers, body
+
+
+async def _send_response(send: Send, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """
+    Idempotency-Key for POST /orders/ and POST /products/.
+
+    - First request with a key runs normally; its response (status < 500) is
+      stored for IDEMPOTENCY_TTL_SECONDS together with a hash of the body.
+    - A repeat with the same key and body gets the stored response back,
+      with `Idempotent-Replayed: true`, without touching the database.
+    - A repeat that arrives while the first is still running waits for it and
+      gets the same response: N concurrent retries → one execution.
+    - Same key, different body → 422.
+    5xx answers (e.g. 503 database busy) aren't stored, so a retry runs again.
+    Requests without the header are passed straight through.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._in_flight: Dict[tuple, Tuple[str, "asyncio.Future[Optional[StoredResponse]]"]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in IDEMPOTENT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+        key = next((v for n, v in scope["headers"] if n == IDEMPOTENCY_HEADER), None)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not 0 < len(key) <= 255:
+            idempotent_requests.inc("rejected")
+            await _send_response(send, *_error(400, "Idempotency-Key must be 1-255 characters"))
+            return
+
+        body = await _read_body(receive)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        store_key = (scope["method"], scope["path"], key)
+
+        while True:
+            stored = idempotency_store.get(store_key)
+            if stored is not None:
+                await self._replay(send, stored, fingerprint, "replayed")
+                return
+            running = self._in_flight.get(store_key)
+            if running is None:
+                break
+            if running[0] != fingerprint:
+                await self._replay(send, None, fingerprint, "rejected")
+                return
+            # Same request already running: wait and reuse its answer. If it
+            # isn't reusable (5xx, crash), loop round and maybe run it ourselves.
+            stored = await asyncio.shield(running[1])
+            if stored is not None:
+                await self._replay(send, stored, fingerprint, "coalesced")
+                return
+
+        future: "asyncio.Future[Optional[StoredResponse]]" = asyncio.get_running_loop().create_future()
+        self._in_flight[store_key] = (fingerprint, future)
+        idempotent_requests.inc("executed")
+        result: Optional[StoredResponse] = None
+        try:
+            result = await self._run(scope, body, receive, send, fingerprint)
+            if result is not None:
+                idempotency_store.set(store_key, result)
+        finally:
+            del self._in_flight[store_key]
+            future.set_result(result)
+
+    @staticmethod
+    async def _replay(send: Send, stored: Optional[StoredResponse], fingerprint: str, outcome: str) -> None:
+        if stored is None or stored.fingerprint != fingerprint:
+            idempotent_requests.inc("rejected")
+            await _send_response(
+                send, *_error(422, "Idempotency-Key was already used with a different request body")
+            )
+            return
+        idempotent_requests.inc(outcome)
+        await _send_response(send, stored.status, stored.headers + [REPLAYED_HEADER], stored.body)
+
+    async def _run(
+        self, scope: Scope, body: bytes, receive: Receive, send: Send, fingerprint: str
+    ) -> Optional[StoredResponse]:
+        """Run the route on the buffered body, streaming its response out while keeping a copy."""
+        sent = False
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+
+        async def replay_body() -> Message:
+            nonlocal sent
+            if sent:
+                return await receive()  # body already consumed; only a disconnect can come now
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, replay_body, send_wrapper)
+        if start is None or start["status"] >= 500:
+            return None
+        return StoredResponse(fingerprint, start["status"], list(start.get("headers", [])), b"".join(chunks))
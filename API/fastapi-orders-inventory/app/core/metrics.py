@@ -0,0 +1,315 @@
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Minimal Prometheus text-format (0.0.4) metrics, per process.
+#
+# Hot-path cost is a dict lookup and an add under a per-metric lock, so it's
+# fine to leave on. Things that already keep their own counters (pools, caches,
+# reservations, the payment worker) are read at scrape time via callbacks
+# instead of being mirrored on every event.
+#
+# With several worker processes each scrape sees only the worker that answers
+# it; scrape per process or add a worker label upstream.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0.0)]
+        return self._header() + [
+            f"{self.name}{_fmt_labels(self.labelnames, labels)} {_fmt_value(v)}" for labels, v in items
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0.0)]
+        return self._header() + [
+            f"{self.name}{_fmt_labels(self.labelnames, labels)} {_fmt_value(v)}" for labels, v in items
+        ]
+
+
+class Histogram(_Metric):
+    """Fixed buckets; per label set we keep per-bucket counts, the sum and the count."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Labels, List[float]] = {}  # [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(row)) for labels, row in self._values.items()]
+        lines = self._header()
+        for labels, row in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le = f'le="{_fmt_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {_fmt_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {_fmt_value(row[-1])}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {_fmt_value(cumulative)}")
+        return lines
+
+
+class _Callback(_Metric):
+    """A metric family whose samples are produced at scrape time."""
+
+    def __init__(self, name: str, kind: str, help: str, fn: Callable[[], Iterable[Sample]]) -> None:
+        super().__init__(name, help)
+        self.kind = kind
+        self._fn = fn
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for labels, value in self._fn():
+            lines.append(f"{self.name}{_fmt_labels(list(labels), list(labels.values()))} {_fmt_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))  # type: ignore[return-value]
+
+    def callback(self, name: str, kind: str, help: str, fn: Callable[[], Iterable[Sample]]) -> None:
+        """Register a family read at scrape time; `fn` returns (labels, value) pairs."""
+        self.register(_Callback(name, kind, help, fn))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:  # one broken collector must not take /metrics down
+                continue
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ----- HTTP (fed by MetricsMiddleware below) -----
+http_requests = registry.counter(
+    "http_requests_total", "Requests handled, by route template and status.", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Request latency, by route template and status.", ("method", "route", "status")
+)
+http_in_flight = registry.gauge("http_requests_in_flight", "Requests currently being handled.")
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware overhead): counts requests,
+    times them and tracks in-flight requests for /metrics.
+    Labelled by route *template* ("/orders/{order_id}"), never the raw path,
+    so the number of series stays bounded.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec()
+            route = scope.get("route")  # set by the router once a route matched
+            labels = (scope["method"], getattr(route, "path", "<unmatched>"), str(status_code))
+            http_requests.inc(*labels)
+            http_request_duration.observe(elapsed, *labels)
+
+
+# ----- DB pools (fed by app.db.monitor) -----
+db_pool_wait = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", ("pool",)
+)
+
+# ----- domain outcomes -----
+insufficient_stock = registry.counter(
+    "orders_insufficient_stock_total", "Order requests rejected with 409 for lack of stock."
+)
+invalid_transitions = registry.counter(
+    "orders_invalid_transition_total", "Order status changes rejected as invalid transitions."
+)
+
+
+# ----- components with their own counters (read at scrape time) -----
+_POOL_FIELDS = {
+    "checkouts": ("db_pool_checkouts_total", "counter", "Connections checked out of the pool."),
+    "overflow_checkouts": ("db_pool_overflow_checkouts_total", "counter", "Checkouts that needed an overflow slot."),
+    "long_holds": ("db_pool_long_holds_total", "counter", "Connections held past DB_CONNECTION_HOLD_WARN_SECONDS."),
+    "checked_out": ("db_pool_checked_out", "gauge", "Connections currently checked out."),
+    "size": ("db_pool_size", "gauge", "Configured pool size."),
+}
+
+
+def register_component_metrics(
+    pool_stats: Callable[[], List[Dict[str, Any]]],
+    caches: Mapping[str, Any],
+    limiters: Mapping[str, Any],
+    reservations: Any,
+    group_writer: Any,
+    payment_worker: Any,
+) -> None:
+    """
+    Callback families for the components that already count things (pools,
+    caches, admission limiters, hot-SKU reservations, the group commit writer,
+    the payment worker). They're passed in rather than imported, since most of
+    them import this module for their own counters.
+    """
+    for field, (name, kind, help) in _POOL_FIELDS.items():
+        registry.callback(
+            name, kind, help,
+            lambda field=field: [({"pool": p["pool"]}, p[field]) for p in pool_stats() if p[field] is not None],
+        )
+
+    for field in ("hits", "misses", "evictions"):
+        registry.callback(
+            f"cache_{field}_total", "counter", f"Cache {field}.",
+            lambda field=field: [({"cache": name}, cache.stats()[field]) for name, cache in caches.items()],
+        )
+    registry.callback(
+        "cache_entries", "gauge", "Entries currently cached.",
+        lambda: [({"cache": name}, len(cache)) for name, cache in caches.items()],
+    )
+
+    registry.callback(
+        "admission_in_flight", "gauge", "Requests holding an admission slot, by route class.",
+        lambda: [({"class": name}, lim.in_flight) for name, lim in limiters.items()],
+    )
+    registry.callback(
+        "admission_queued", "gauge", "Requests waiting for an admission slot, by route class.",
+        lambda: [({"class": name}, lim.queued) for name, lim in limiters.items()],
+    )
+
+    registry.callback(
+        "hot_sku_reservations_total", "counter", "Hot-SKU reservation outcomes.",
+        lambda: [({"result": k}, v) for k, v in reservations.stats().items() if k in ("granted", "refused")],
+    )
+    registry.callback(
+        "db_group_commit_jobs_total", "counter", "Writes run by the group commit writer.",
+        lambda: [({"result": "ok"}, group_writer.jobs - group_writer.failed_jobs),
+                 ({"result": "error"}, group_writer.failed_jobs)],
+    )
+    registry.callback(
+        "db_group_commits_total", "counter", "Transactions committed (or failed) by the group commit writer.",
+        lambda: [({}, group_writer.groups)],
+    )
+    registry.callback(
+        "payment_outbox_events_total", "counter", "Payment events applied by the outbox worker.",
+        lambda: [({}, payment_worker.events)],
+    )
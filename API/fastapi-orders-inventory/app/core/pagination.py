@@ -0,0 +1,41 @@
+import base64
+import json
+from typing import Any, Dict
+
+from fastapi import HTTPException, status
+
+
+# Opaque keyset cursors.
+# Clients must treat them as black boxes; we only promise that passing a cursor
+# back returns the rows *after* the last row of the previous page.
+def encode_cursor(values: Dict[str, Any]) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Reverse of encode_cursor(). Anything we can't read back → 400 Invalid cursor.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, dict):
+            raise ValueError("cursor must decode to an object")
+        return values
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+_INT64 = 2**63  # SQLite INTEGER / Postgres BIGINT: larger values can't even be bound
+
+
+def cursor_id(values: Dict[str, Any], key: str = "id") -> int:
+    """`values[key]` as a row id; anything that can't be one → 400 Invalid cursor."""
+    try:
+        value = int(values[key])
+        if not -_INT64 <= value < _INT64:
+            raise OverflowError(value)
+        return value
+    except (KeyError, TypeError, ValueError, OverflowError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
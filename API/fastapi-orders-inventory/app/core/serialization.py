@@ -0,0 +1,43 @@
+from typing import Any, Iterable, Sequence
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+try:  # optional speed-up; pydantic-core's Rust encoder is the fallback
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Fast JSON output for hot read paths.
+#
+# Instead of ORM object → response_model validation → jsonable_encoder →
+# json.dumps, these routes select plain column tuples and encode them in one
+# native call. The routes keep their response_model, so the OpenAPI schema is
+# unchanged; the field lists below must match those models (same names, same
+# order), which is what makes the output byte-for-byte what the model would give.
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON; handles datetimes (ISO 8601) and enums (their value)."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return to_json(content)
+
+
+def row_json(fields: Sequence[str], row: Sequence[Any]) -> bytes:
+    return dumps(dict(zip(fields, row)))
+
+
+def rows_json(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> bytes:
+    return dumps([dict(zip(fields, row)) for row in rows])
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Drop-in JSONResponse (same media type and compact output) using dumps().
+    The app's default response class, so even routes that still return models
+    skip the stdlib encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,12 @@
+from datetime import datetime, timezone
+
+
+def utc_naive(value: datetime) -> datetime:
+    """
+    Timestamps are stored as naive UTC (datetime.utcnow), so an offset-aware
+    bound is shifted to UTC and stripped before it's compared with a column.
+    Naive values are taken as UTC already.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
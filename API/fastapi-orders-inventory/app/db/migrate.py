@@ -0,0 +1,36 @@
+import logging
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+from sqlmodel import SQLModel
+
+logger = logging.getLogger("app.db.migrate")
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """
+    Additive, idempotent schema upgrade for databases created by older versions.
+
+    create_all() only creates missing *tables*; this adds what it skips on
+    tables that already exist:
+      - missing columns (ALTER TABLE ... ADD COLUMN; they need a server default
+        or to be nullable, which every new column in our models is),
+      - missing indexes.
+    Nothing is ever dropped or altered.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        preparer = conn.dialect.identifier_preparer
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                spec = CreateColumn(column).compile(dialect=conn.dialect)
+                logger.info("Adding column %s.%s", table.name, column.name)
+                conn.exec_driver_sql(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {spec}")
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.metrics import db_pool_wait
+
+logger = logging.getLogger("app.db.pool")
+
+
+class PoolMonitor:
+    """
+    Counts what a connection pool does, via SQLAlchemy pool events:
+      - checkouts / checkins, and checkouts that had to use overflow slots;
+      - how long each connection stayed checked out. Anything held longer than
+        DB_CONNECTION_HOLD_WARN_SECONDS is logged on return and counted, and
+        connections *still* out past that threshold show up in snapshot(),
+        which is how a leaked session gets spotted;
+      - how long callers waited for a connection (pool exhausted → queueing),
+        also fed into the db_pool_checkout_wait_seconds histogram on /metrics.
+        Pool events only fire once a connection has been handed out, so the
+        wait is timed by MonitoredSession and reported through record_wait().
+    """
+
+    def __init__(self, name: str, engine: Engine) -> None:
+        self.name = name
+        self._pool = engine.pool
+        self._lock = threading.Lock()
+        self._held: Dict[int, float] = {}  # id(connection record) -> checkout time
+        self.checkouts = 0
+        self.checkins = 0
+        self.overflow_checkouts = 0
+        self.long_holds = 0
+        self.max_hold_seconds = 0.0
+        self.wait_seconds_total = 0.0
+        self.max_wait_seconds = 0.0
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def record_wait(self, waited: float) -> None:
+        db_pool_wait.observe(waited, self.name)
+        with self._lock:
+            self.wait_seconds_total += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def _on_checkout(self, _dbapi_conn, record, _proxy) -> None:
+        overflow = getattr(self._pool, "overflow", None)
+        with self._lock:
+            self._held[id(record)] = time.monotonic()
+            self.checkouts += 1
+            if overflow is not None and overflow() > 0:
+                self.overflow_checkouts += 1
+
+    def _on_checkin(self, _dbapi_conn, record) -> None:
+        with self._lock:
+            started = self._held.pop(id(record), None)
+            self.checkins += 1
+            if started is None:
+                return
+            held = time.monotonic() - started
+            self.max_hold_seconds = max(self.max_hold_seconds, held)
+            if held <= settings.DB_CONNECTION_HOLD_WARN_SECONDS:
+                return
+            self.long_holds += 1
+        logger.warning(
+            "%s pool: connection held for %.2fs (threshold %.2fs)",
+            self.name, held, settings.DB_CONNECTION_HOLD_WARN_SECONDS,
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            held_for = [now - started for started in self._held.values()]
+            stats = {
+                "pool": self.name,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "overflow_checkouts": self.overflow_checkouts,
+                "long_holds": self.long_holds,
+                "max_hold_seconds": round(self.max_hold_seconds, 4),
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "max_wait_seconds": round(self.max_wait_seconds, 6),
+            }
+        stats["checked_out"] = len(held_for)
+        stats["held_over_threshold"] = sum(
+            1 for h in held_for if h > settings.DB_CONNECTION_HOLD_WARN_SECONDS
+        )
+        for attr in ("size", "overflow"):
+            fn = getattr(self._pool, attr, None)
+            stats[attr] = fn() if callable(fn) else None
+        return stats
+
+
+monitors: List[PoolMonitor] = []
+_by_pool: Dict[Pool, PoolMonitor] = {}
+
+
+def monitor(name: str, engine: Engine) -> None:
+    """Attach a PoolMonitor to `engine` (sync engine; pass AsyncEngine.sync_engine for async)."""
+    monitors.append(PoolMonitor(name, engine))
+    _by_pool[engine.pool] = monitors[-1]
+
+
+_WAIT_STARTED = "pool_wait_started"
+
+
+class MonitoredSession(Session):
+    """
+    The app's Session: also times how long it waits for a pooled connection.
+    get_bind() runs right before the session asks its engine for a connection,
+    and after_begin fires once engine.connect() has returned one; the time in
+    between is the pool wait. (get_bind() also runs while a connection is
+    already held; after_begin doesn't, so those stamps are never reported.)
+    """
+
+    def get_bind(self, *args: Any, **kwargs: Any):
+        self.info[_WAIT_STARTED] = time.perf_counter()
+        return super().get_bind(*args, **kwargs)
+
+
+@event.listens_for(MonitoredSession, "after_begin")
+def _connection_acquired(session: Session, _transaction, connection) -> None:
+    started = session.info.pop(_WAIT_STARTED, None)
+    pool_monitor = _by_pool.get(connection.engine.pool)
+    if started is not None and pool_monitor is not None:
+        pool_monitor.record_wait(time.perf_counter() - started)
+
+
+def pool_stats() -> List[Dict[str, Any]]:
+    return [m.snapshot() for m in monitors]
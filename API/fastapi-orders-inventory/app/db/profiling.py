@@ -0,0 +1,164 @@
+import heapq
+import hmac
+import logging
+import random
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger("app.db.profile")
+
+PROFILE_HEADER = b"x-profile-sql"
+
+repeated_statements = registry.counter(
+    "sql_repeated_statement_warnings_total",
+    "Requests that ran one statement shape more than SQL_PROFILE_REPEAT_THRESHOLD times.",
+)
+
+# Collapse expanded IN (...) lists and literals so "the same query with other
+# parameters" counts as one shape.
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%\([^)]*\)s|:\w+|\$\d+)\s*,)+\s*(?:\?|%\([^)]*\)s|:\w+|\$\d+)\s*\)")
+_WS = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    return _IN_LIST.sub("(?...)", _WS.sub(" ", statement).strip())
+
+
+class SqlProfile:
+    """What one request did on the database."""
+
+    __slots__ = ("count", "total_seconds", "shapes", "slowest")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_seconds = 0.0
+        self.shapes: Dict[str, int] = {}
+        self.slowest: List[Tuple[float, str]] = []  # min-heap of (seconds, shape)
+
+    def record(self, statement: str, seconds: float) -> None:
+        shape = statement_shape(statement)
+        self.count += 1
+        self.total_seconds += seconds
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+        if len(self.slowest) < settings.SQL_PROFILE_TOP_STATEMENTS:
+            heapq.heappush(self.slowest, (seconds, shape))
+        elif self.slowest and seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, shape))
+
+    def repeated(self) -> List[Tuple[str, int]]:
+        limit = settings.SQL_PROFILE_REPEAT_THRESHOLD
+        return [(shape, n) for shape, n in self.shapes.items() if n > limit]
+
+    def server_timing(self, statement_text: bool = False) -> str:
+        """
+        e.g.  db;dur=3.2;desc="7 statements", db-1;dur=1.9, db-2;dur=0.4
+        Durations in milliseconds, per the Server-Timing spec. The slowest
+        statements are described (desc="UPDATE product SET …") only with
+        `statement_text`: SQL text says a lot about the schema.
+        """
+        parts = [f'db;dur={self.total_seconds * 1000:.2f};desc="{self.count} statements"']
+        for i, (seconds, shape) in enumerate(sorted(self.slowest, reverse=True), start=1):
+            part = f"db-{i};dur={seconds * 1000:.2f}"
+            if statement_text:
+                part += f';desc="{_header_text(shape)}"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+def _header_text(shape: str, limit: int = 80) -> str:
+    text = shape.replace('"', "'").replace("\\", "/")
+    text = text.encode("ascii", "replace").decode("ascii")
+    return text if len(text) <= limit else text[: limit - 3] + "..."
+
+
+# The active profile, if this request is being profiled. Context variables
+# follow the request into the threadpool (run_in_threadpool copies the context)
+# and into AsyncSession.run_sync, so the engine hooks below see it either way.
+_current: ContextVar[Optional[SqlProfile]] = ContextVar("sql_profile", default=None)
+
+
+def _before_cursor_execute(conn, _cursor, _statement, _params, _context, _executemany) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, _cursor, statement, _params, _context, _executemany) -> None:
+    profile = _current.get()
+    if profile is None:
+        return
+    started = conn.info.get("profile_started")
+    if started:
+        profile.record(statement, time.perf_counter() - started.pop())
+
+
+def instrument(engine: Engine) -> None:
+    """Hook an engine up to per-request profiling (sync engine; AsyncEngine.sync_engine for async)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _header_allows(value: bytes) -> bool:
+    value = value.strip()
+    secret = settings.SQL_PROFILE_HEADER_SECRET
+    if secret and hmac.compare_digest(value, secret.encode("utf-8")):
+        return True
+    return settings.SQL_PROFILE_HEADER_ENABLED and value.lower() not in (b"", b"0", b"false", b"no")
+
+
+def _wants_profile(scope: Scope) -> bool:
+    if settings.SQL_PROFILE_HEADER_ENABLED or settings.SQL_PROFILE_HEADER_SECRET:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER and _header_allows(value):
+                return True
+    rate = settings.SQL_PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+class SqlProfilingMiddleware:
+    """
+    Profiles the SQL of opted-in / sampled requests and reports it in a
+    Server-Timing header. Statements that run after the headers have gone out
+    (streamed bodies) still count towards the N+1 check but not the header.
+    Requests that aren't profiled cost one header scan.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = SqlProfile()
+        token = _current.set(profile)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                timing = profile.server_timing(settings.SQL_PROFILE_STATEMENT_TEXT)
+                headers.append((b"server-timing", timing.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            repeated = profile.repeated()
+            if repeated:
+                repeated_statements.inc()
+            for shape, n in repeated:
+                logger.warning(
+                    "%s %s ran the same statement %d times (possible N+1): %s",
+                    scope["method"], scope["path"], n, shape,
+                )
@@ -0,0 +1,118 @@
+import logging
+
+from sqlalchemy.engine import Connection, Engine
+
+from app.models.sales_rollup import SalesRollupHourly  # noqa: F401  (registers the table for create_all)
+
+logger = logging.getLogger("app.db.rollups")
+
+# Incremental maintenance of sales_rollup_hourly (app.models.sales_rollup).
+#
+# Row-level triggers on "order" add the new row's contribution and subtract the
+# old one: INSERT → +1, DELETE → -1, UPDATE of product/quantity/status/created_at
+# → -old +new (version-only updates don't fire). Each costs one upsert on a
+# primary-key row inside the same transaction as the order write, so the rollup
+# can never drift from the order table, whichever process or code path wrote.
+#
+# Revenue is quantity x the product's price *when the order is written*; later
+# price changes don't rewrite history. The insert trigger stamps that price on
+# the order (unit_price), so moving or deleting an order later takes off exactly
+# what it added.
+#
+# SQLite only (like the rest of the deployment). The hour bucket is computed
+# from created_at as SQLAlchemy stores it ('YYYY-MM-DD HH:MM:SS.ffffff', UTC).
+
+_BUCKET = "strftime('%Y-%m-%d %H:00:00', {row}.created_at)"
+
+_PRICE_NOW = "(SELECT price FROM product WHERE id = NEW.product_id)"
+
+_STAMP_PRICE = f"""
+    UPDATE "order" SET unit_price = {_PRICE_NOW} WHERE id = NEW.id;
+"""
+
+_ADD = """
+    INSERT INTO sales_rollup_hourly (product_id, bucket, status, orders, units, revenue)
+    VALUES (NEW.product_id, {bucket}, NEW.status, 1, NEW.quantity, NEW.quantity * COALESCE({price}, 0))
+    ON CONFLICT (product_id, bucket, status)
+    DO UPDATE SET orders = orders + 1, units = units + excluded.units, revenue = revenue + excluded.revenue;
+"""
+
+_SUBTRACT = """
+    UPDATE sales_rollup_hourly
+    SET orders = orders - 1, units = units - OLD.quantity,
+        revenue = revenue - OLD.quantity * COALESCE(OLD.unit_price, 0)
+    WHERE product_id = OLD.product_id AND bucket = {bucket} AND status = OLD.status;
+    DELETE FROM sales_rollup_hourly
+    WHERE product_id = OLD.product_id AND bucket = {bucket} AND status = OLD.status AND orders <= 0;
+""".format(bucket=_BUCKET.format(row="OLD"))
+
+_ADD_NEW_ORDER = _ADD.format(bucket=_BUCKET.format(row="NEW"), price=_PRICE_NOW)
+_ADD_UPDATED_ORDER = _ADD.format(bucket=_BUCKET.format(row="NEW"), price="NEW.unit_price")
+
+# Names carry a revision: install_rollup_triggers() drops any other
+# trg_order_rollup_* trigger (an older definition) and rebuilds the rollup.
+_TRIGGER_PREFIX = "trg_order_rollup_"
+
+TRIGGERS = {
+    "trg_order_rollup_insert_v2": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_order_rollup_insert_v2 AFTER INSERT ON "order"
+        BEGIN {_STAMP_PRICE} {_ADD_NEW_ORDER} END
+    """,
+    "trg_order_rollup_delete_v2": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_order_rollup_delete_v2 AFTER DELETE ON "order"
+        BEGIN {_SUBTRACT} END
+    """,
+    "trg_order_rollup_update_v2": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_order_rollup_update_v2
+        AFTER UPDATE OF product_id, quantity, status, created_at ON "order"
+        WHEN OLD.product_id IS NOT NEW.product_id OR OLD.quantity IS NOT NEW.quantity
+          OR OLD.status IS NOT NEW.status OR OLD.created_at IS NOT NEW.created_at
+        BEGIN {_SUBTRACT} {_ADD_UPDATED_ORDER} END
+    """,
+}
+
+
+def rebuild_sales_rollup(conn: Connection) -> None:
+    """
+    Recompute the whole rollup from "order" (one GROUP BY scan). Used for the
+    backfill. Orders placed before prices were stamped get today's price.
+    """
+    conn.exec_driver_sql("""
+        UPDATE "order" SET unit_price = (SELECT price FROM product WHERE product.id = "order".product_id)
+        WHERE unit_price IS NULL
+    """)
+    conn.exec_driver_sql("DELETE FROM sales_rollup_hourly")
+    conn.exec_driver_sql(f"""
+        INSERT INTO sales_rollup_hourly (product_id, bucket, status, orders, units, revenue)
+        SELECT product_id, {_BUCKET.format(row='"order"')}, status, COUNT(*), SUM(quantity),
+               SUM(quantity * COALESCE(unit_price, 0))
+        FROM "order"
+        GROUP BY 1, 2, 3
+    """)
+
+
+def install_rollup_triggers(engine: Engine) -> None:
+    """
+    Create the triggers if missing and drop outdated revisions. Whenever that
+    changes anything (existing database, or a new trigger), backfill from the
+    order history in the same transaction: the trigger DDL already holds the
+    write lock, so no order write can slip in between the backfill and the
+    triggers taking over.
+    """
+    if engine.dialect.name != "sqlite":
+        logger.warning("Sales rollup triggers are SQLite-only; %s is not maintained", engine.dialect.name)
+        return
+    with engine.begin() as conn:
+        existing = {
+            name for (name,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        }
+        missing = [name for name in TRIGGERS if name not in existing]
+        stale = sorted(name for name in existing if name.startswith(_TRIGGER_PREFIX) and name not in TRIGGERS)
+        if not missing and not stale:
+            return
+        for name in stale:
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        for name in missing:
+            conn.exec_driver_sql(TRIGGERS[name])
+        logger.info("Installed %s; backfilling sales_rollup_hourly", ", ".join(missing))
+        rebuild_sales_rollup(conn)
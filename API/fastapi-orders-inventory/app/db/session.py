@@ -1,23 +1,171 @@
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar, Union
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import SQLModel, create_engine, Session
+from starlette.concurrency import run_in_threadpool
+
 from app.core.config import settings
+from app.db.migrate import upgrade_schema
+from app.db.monitor import MonitoredSession, monitor
+from app.db.profiling import instrument
+from app.db.rollups import install_rollup_triggers
+
+T = TypeVar("T")
+
+IS_SQLITE = settings.DATABASE_URL.startswith("sqlite")
+IS_MEMORY = IS_SQLITE and (":memory:" in settings.DATABASE_URL or settings.DATABASE_URL in ("sqlite://", "sqlite:///"))
+PRODUCTION = settings.DB_PROFILE == "production"
+SPLIT_POOLS = PRODUCTION and not IS_MEMORY
 
 # SQLite-specific connect args
 connect_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
+if IS_SQLITE:
     connect_args = {"check_same_thread": False}
 
-# Engine creation
-engine = create_engine(
-    settings.DATABASE_URL,
-    echo=settings.ECHO_SQL,
-    connect_args=connect_args,
-)
+# Async driver per sync URL scheme (only used when DB_ASYNC is on)
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def _async_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    scheme, rest = settings.DATABASE_URL.split("://", 1)
+    return f"{_ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+
+def _apply_sqlite_pragmas(dbapi_conn, read_only: bool) -> None:
+    cursor = dbapi_conn.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KIB)}")  # negative = KiB
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")  # reader pool can never take the write lock
+    cursor.close()
+
+
+def _make_engine(read_only: bool = False, use_async: bool = False):
+    kwargs = {}
+    if PRODUCTION and not IS_MEMORY:
+        kwargs = {
+            "pool_size": settings.DB_READ_POOL_SIZE if read_only else settings.DB_WRITE_POOL_SIZE,
+            "max_overflow": settings.DB_POOL_MAX_OVERFLOW,
+            "pool_pre_ping": not IS_SQLITE,
+        }
+    if use_async:
+        eng = create_async_engine(_async_url(), echo=settings.ECHO_SQL, **kwargs)
+        sync_eng = eng.sync_engine  # events are registered on the sync facade
+    else:
+        eng = sync_eng = create_engine(
+            settings.DATABASE_URL,
+            echo=settings.ECHO_SQL,
+            connect_args=connect_args,
+            **kwargs,
+        )
+    if PRODUCTION and IS_SQLITE:
+        @event.listens_for(sync_eng, "connect")
+        def _on_connect(dbapi_conn, _record):
+            _apply_sqlite_pragmas(dbapi_conn, read_only)
+    return eng
+
+
+# Engine creation.
+# `engine` takes every write. `read_engine` serves GETs: with the production
+# profile it's a separate, read-only pool (WAL lets it read while a write is in
+# flight); otherwise it's simply the same engine. An in-memory SQLite database
+# can't be shared across pools, so it never gets split.
+engine = _make_engine()
+read_engine = _make_engine(read_only=True) if SPLIT_POOLS else engine
+
+# Async twins for request handlers when DB_ASYNC is on. The sync engines above
+# stay around for table creation and streaming responses.
+async_engine = async_read_engine = None
+if settings.DB_ASYNC:
+    async_engine = _make_engine(use_async=True)
+    async_read_engine = _make_engine(read_only=True, use_async=True) if SPLIT_POOLS else async_engine
+
+# Pool metrics / leak detection (app.db.monitor) and per-request SQL profiling
+# hooks (app.db.profiling) for every pool we own.
+monitor("write", engine)
+instrument(engine)
+if read_engine is not engine:
+    monitor("read", read_engine)
+    instrument(read_engine)
+if async_engine is not None:
+    monitor("async_write", async_engine.sync_engine)
+    instrument(async_engine.sync_engine)
+    if async_read_engine is not async_engine:
+        monitor("async_read", async_read_engine.sync_engine)
+        instrument(async_read_engine.sync_engine)
+
+DbSession = Union[Session, AsyncSession]
+
+def _unit_of_work(bind) -> Iterator[Session]:
+    """
+    One session per request:
+      - anything the handler didn't commit is rolled back (errors included);
+      - the session is always closed, so its connection goes straight back to
+        the pool when the request ends instead of whenever GC gets to it.
+    """
+    session = MonitoredSession(bind)
+    try:
+        yield session
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+async def _async_unit_of_work(bind) -> AsyncIterator[AsyncSession]:
+    """Async flavour of _unit_of_work()."""
+    session = AsyncSession(bind, sync_session_class=MonitoredSession)
+    try:
+        yield session
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
 
 def get_session():
     """Dependency: yield a session per request."""
-    with Session(engine) as session:
+    yield from _unit_of_work(engine)
+
+def get_read_session():
+    """Like get_session(), but bound to the read pool."""
+    yield from _unit_of_work(read_engine)
+
+async def get_async_session():
+    """Async flavour of get_session() (DB_ASYNC only)."""
+    async for session in _async_unit_of_work(async_engine):
         yield session
 
+async def get_async_read_session():
+    """Async flavour of get_read_session() (DB_ASYNC only)."""
+    async for session in _async_unit_of_work(async_read_engine):
+        yield session
+
+async def run_db(db: DbSession, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run `fn(session, *args, **kwargs)` - plain sync SQLModel code - without
+    blocking the event loop:
+      - AsyncSession → AsyncSession.run_sync(): fn runs on the loop, and every
+        DB call inside it awaits the async driver under the hood.
+      - Session      → the threadpool, exactly like a sync `def` endpoint.
+    This lets each query be written once and used on both paths.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
 def create_db_and_tables():
-    """Create tables based on SQLModel metadata."""
+    """Create tables based on SQLModel metadata, add any newer columns/indexes, then the rollup triggers."""
     SQLModel.metadata.create_all(engine)
+    upgrade_schema(engine)
+    install_rollup_triggers(engine)
@@ -0,0 +1,187 @@
+import asyncio
+import contextvars
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, TypeVar
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db.monitor import MonitoredSession
+from app.db.session import DbSession, engine, run_db
+
+logger = logging.getLogger("app.db.writer")
+
+T = TypeVar("T")
+
+# Marks the writer's session; commit()/rollback() below look for it.
+GROUP_COMMIT = "group_commit"
+
+
+def commit(db: Session) -> None:
+    """
+    End a write helper's unit of work. On the group writer's session this only
+    flushes (errors such as IntegrityError still surface here); the writer
+    commits the whole group once every job in it has run.
+    """
+    if db.info.get(GROUP_COMMIT):
+        db.flush()
+    else:
+        db.commit()
+
+
+def rollback(db: Session) -> None:
+    """
+    Undo a write helper's work before raising. On the group writer's session
+    this is a no-op: the job's exception rolls back its own savepoint, and a
+    full rollback would throw away the rest of the group.
+    """
+    if not db.info.get(GROUP_COMMIT):
+        db.rollback()
+
+
+class _Job(NamedTuple):
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: Dict[str, Any]
+    context: contextvars.Context  # the caller's, so per-request SQL profiling still sees the job
+    future: Future
+
+
+class GroupCommitWriter:
+    """
+    Single writer thread for DB_WRITE_MODE=group.
+
+    Requests submit `fn(session, *args)` - the same sync helpers run_db() runs -
+    and wait on a future. The writer takes whatever is queued (waiting up to
+    DB_GROUP_COMMIT_WINDOW_MS for more, at most DB_GROUP_COMMIT_MAX_JOBS) and
+    runs it as ONE transaction:
+
+        BEGIN IMMEDIATE
+          SAVEPOINT → job 1 → RELEASE         (or ROLLBACK TO → job 1 gets its 409/404)
+          SAVEPOINT → job 2 → RELEASE
+          ...
+        COMMIT                                 (one fsync, one write-lock hand-off)
+
+    A failing job only loses its savepoint; the others still commit. Results are
+    handed out after the COMMIT, so nobody sees 201 for a row that isn't durable;
+    if the COMMIT itself fails, every job in the group gets that error.
+    Each process has its own writer, so with several workers there are several
+    writers - far fewer than one per request.
+    """
+
+    def __init__(self, bind=engine) -> None:
+        self.bind = bind
+        self._queue: "queue.Queue[_Job]" = queue.Queue()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.groups = 0
+        self.jobs = 0
+        self.failed_jobs = 0
+        self.failed_groups = 0
+        self.largest_group = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-group-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop taking groups, after finishing whatever is already queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        future: Future = Future()
+        self._queue.put(_Job(fn, args, kwargs, contextvars.copy_context(), future))
+        return future
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            group = [first]
+            deadline = time.monotonic() + settings.DB_GROUP_COMMIT_WINDOW_MS / 1000
+            while len(group) < settings.DB_GROUP_COMMIT_MAX_JOBS:
+                try:
+                    group.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._apply(group)
+
+    def _apply(self, group: List[_Job]) -> None:
+        done: List[tuple] = []
+        try:
+            # expire_on_commit=False: results (ORM rows included) leave this
+            # thread fully loaded instead of lazy-loading on a closed session.
+            with MonitoredSession(self.bind, expire_on_commit=False) as db:
+                db.info[GROUP_COMMIT] = True
+                if self.bind.dialect.name == "sqlite":
+                    # pysqlite doesn't BEGIN before a SAVEPOINT, so releasing the
+                    # first one would commit on its own. Open the transaction
+                    # ourselves - and take the write lock once, up front.
+                    db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+                for job in group:
+                    try:
+                        with db.begin_nested():
+                            value = job.context.run(job.fn, db, *job.args, **job.kwargs)
+                    except BaseException as exc:
+                        self.failed_jobs += 1
+                        job.future.set_exception(exc)
+                    else:
+                        done.append((job, value))
+                db.commit()
+        except Exception as exc:
+            self.failed_groups += 1
+            logger.warning("group commit of %d job(s) failed: %s", len(group), exc)
+            for job in group:
+                if not job.future.done():
+                    job.future.set_exception(exc)
+            return
+        finally:
+            self.groups += 1
+            self.jobs += len(group)
+            self.largest_group = max(self.largest_group, len(group))
+        for job, value in done:
+            job.future.set_result(value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": settings.DB_WRITE_MODE,
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "groups": self.groups,
+            "jobs": self.jobs,
+            "failed_jobs": self.failed_jobs,
+            "failed_groups": self.failed_groups,
+            "avg_group_size": round(self.jobs / self.groups, 2) if self.groups else 0.0,
+            "largest_group": self.largest_group,
+        }
+
+
+group_writer = GroupCommitWriter()
+
+
+async def run_write(db: DbSession, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    run_db() for write helpers: with the group writer running, `fn` runs on the
+    writer's session inside a shared transaction (the request's own session is
+    never used, so it never checks out a connection); otherwise it's run_db().
+    Helpers must end with commit(db) / rollback(db) rather than db.commit().
+    """
+    if group_writer.running:
+        return await asyncio.wrap_future(group_writer.submit(fn, *args, **kwargs))
+    return await run_db(db, fn, *args, **kwargs)
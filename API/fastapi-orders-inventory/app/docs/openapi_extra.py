@@ -12,6 +12,10 @@ tags_metadata = [
         "name": "orders",
         "description": "Order lifecycle. Create pending orders, update status (PAID, SHIPPED, CANCELED).",
     },
+    {
+        "name": "analytics",
+        "description": "Sales rollups (per product, per hour, per status), kept current by DB triggers.",
+    },
     {
         "name": "meta",
         "description": "Service health and meta endpoints.",
@@ -1,18 +1,40 @@
 from fastapi import FastAPI
+from fastapi.responses import Response
+from app.core import metrics
+from app.core.metrics import MetricsMiddleware
+from app.core.admission import AdmissionMiddleware, limiters
+from app.core.idempotency import IdempotencyMiddleware, idempotency_store
 from app.db.session import create_db_and_tables
+from app.db.monitor import pool_stats
+from app.db.profiling import SqlProfilingMiddleware
+from app.db.writer import group_writer
+from app.services.inventory_service import reservations
+from app.services.payment_service import payment_worker, replay_cache
+from app.services.product_cache import product_cache
 from contextlib import asynccontextmanager
 from app.core.errors import add_exception_handlers
-from app.api.routers import products, orders
+from app.core.serialization import FastJSONResponse
+from app.api.routers import analytics, products, orders
 from app.docs.openapi_extra import tags_metadata
 from app.webhooks import payment as payment_webhook
+from app.core.config import settings
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Create DB tables at startup."""
+    """
+    Create DB tables and start the background writers the settings ask for (group
+    commit writer, payment outbox worker) at startup; drain them and hand leased
+    hot-SKU stock back at shutdown.
+    """
     create_db_and_tables()
-    add_exception_handlers(app)
+    if settings.DB_WRITE_MODE == "group":
+        group_writer.start()
+    if settings.WEBHOOK_INGEST_MODE == "queue":
+        payment_worker.start()
     yield
-    # No teardown needed for SQLite
+    payment_worker.stop()
+    group_writer.stop()
+    reservations.release_all()
 
 
 app = FastAPI(
@@ -25,8 +47,16 @@ app = FastAPI(
         "- Error contracts: deterministic JSON shapes"
     ),
     openapi_tags=tags_metadata,
+    default_response_class=FastJSONResponse,
     lifespan=lifespan,
 )
+add_exception_handlers(app)
+
+app.add_middleware(IdempotencyMiddleware)  # innermost: replays never reach the DB
+app.add_middleware(SqlProfilingMiddleware)
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionMiddleware)  # outside the profiler: shed requests cost nothing
+app.add_middleware(MetricsMiddleware)  # added last = outermost, so it times everything
 
 
 
@@ -34,8 +64,53 @@ app = FastAPI(
 def health():
     return {"status": "ok"}
 
-# Routers get plugged in during Part C.
+
+@app.get("/health/db", tags=["meta"])
+def health_db():
+    """
+    Connection pool counters (checkouts, checkins, overflow, hold times).
+    Between requests `checked_out` should be 0; `held_over_threshold` > 0 means
+    something is holding a connection far longer than a request should.
+    `writer` is the group commit writer (DB_WRITE_MODE=group): groups, jobs per group.
+    """
+    return {"pools": pool_stats(), "writer": group_writer.stats()}
+
+
+@app.get("/health/cache", tags=["meta"])
+def health_cache():
+    """Product read cache counters (hits, misses, evictions, size)."""
+    return product_cache.stats()
+
+
+@app.get("/health/webhooks", tags=["meta"])
+def health_webhooks():
+    """
+    Payment webhook internals: outbox worker (queued events, batches, lag) and
+    the replay cache (size, hit rate, approximate memory).
+    """
+    return {
+        "worker": payment_worker.stats(),
+        "replay_cache": {**replay_cache.stats(), "approx_bytes": replay_cache.nbytes()},
+    }
+
+@app.get("/metrics", tags=["meta"], include_in_schema=False)
+def metrics_endpoint():
+    """Prometheus text format; see app.core.metrics."""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# Components that already keep counters are read at scrape time.
+metrics.register_component_metrics(
+    pool_stats=pool_stats,
+    caches={"product_items": product_cache.items, "product_pages": product_cache.pages,
+            "webhook_replay": replay_cache, "idempotency": idempotency_store},
+    limiters=limiters,
+    reservations=reservations,
+    group_writer=group_writer,
+    payment_worker=payment_worker,
+)
 
 app.include_router(products.router, prefix="/products", tags=["products"])
 app.include_router(orders.router, prefix="/orders", tags=["orders"])
+app.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
 app.include_router(payment_webhook.router, prefix="/webhooks", tags=["webhooks"])
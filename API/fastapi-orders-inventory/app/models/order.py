@@ -1,6 +1,7 @@
 from typing import Optional
 from datetime import datetime
 from enum import Enum
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 
@@ -14,8 +15,7 @@ class OrderStatus(str, Enum):
 class OrderBase(SQLModel):
     product_id: int = Field(
         foreign_key="product.id",
-        index=True,
-        description="FK to Product.id",
+        description="FK to Product.id",  # indexed via ix_order_product_created_at
     )
     quantity: int = Field(ge=1, description="Must be >= 1")
     status: OrderStatus = Field(
@@ -30,4 +30,20 @@ class OrderBase(SQLModel):
 
 
 class Order(OrderBase, table=True):
+    # Composite indexes for GET /orders (filter + keyset on (created_at, id)):
+    #   status = :s AND created_at in range ORDER BY created_at, id
+    #     → one range scan, already in order. product_id and quantity ride along
+    #       so a page of OrderRead rows is served from the index alone.
+    #   product_id = :p AND created_at in range ORDER BY created_at, id
+    #     → same shape; also covers the product_id FK lookups.
+    __table_args__ = (
+        Index("ix_order_status_created_at", "status", "created_at", "id", "product_id", "quantity"),
+        Index("ix_order_product_created_at", "product_id", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
+    # Row version: bumped on every status change. Drives ETag / If-Match.
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    # Product price when the order was placed, stamped by the rollup insert
+    # trigger (app.db.rollups); not part of the API.
+    unit_price: Optional[float] = Field(default=None)
@@ -16,3 +16,5 @@ class ProductBase(SQLModel):
 
 class Product(ProductBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
+    # Row version: bumped on every change (incl. stock decrements). Drives ETag / If-Match.
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
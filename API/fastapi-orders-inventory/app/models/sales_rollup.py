@@ -0,0 +1,23 @@
+from sqlmodel import SQLModel, Field
+
+from app.models.order import OrderStatus
+
+
+class SalesRollupHourly(SQLModel, table=True):
+    """
+    Pre-aggregated order counts per product, hour and status.
+
+    Maintained by database triggers on "order" (see app.db.rollups), so every
+    write path - single, batch, bulk-status, webhooks, deletes - keeps it exact
+    without any application code. Revenue is quantity x the product's price at
+    the time each order was written.
+    """
+
+    __tablename__ = "sales_rollup_hourly"
+
+    product_id: int = Field(primary_key=True)
+    bucket: str = Field(primary_key=True, description="Hour, 'YYYY-MM-DD HH:00:00' UTC")
+    status: OrderStatus = Field(primary_key=True)
+    orders: int = Field(default=0)
+    units: int = Field(default=0)
+    revenue: float = Field(default=0.0, sa_column_kwargs={"server_default": "0"})
@@ -0,0 +1,38 @@
+from typing import Any, Iterator, Sequence, Tuple
+
+from sqlmodel import select
+
+from app.db.monitor import MonitoredSession
+from app.db.session import read_engine
+from app.models.order import Order
+from app.schemas.order import ORDER_READ_FIELDS
+
+
+def iter_order_rows(conditions: Sequence[Any] = (), batch_size: int = 1000) -> Iterator[Tuple[Any, ...]]:
+    """
+    Yield every order matching `conditions` (WHERE clauses), in id order, as
+    OrderRead column tuples (see ORDER_READ_FIELDS; id first).
+
+    Same keyset batching as iter_product_rows(): WHERE id > :last ... ORDER BY id
+    LIMIT :n, so the whole export is one pass over the primary key, at most one
+    batch is in memory, and no read transaction stays open between batches
+    (a long-lived one would hold back WAL checkpoints for the whole export).
+
+    Uses its own session: streaming responses outlive the request dependency.
+    """
+    columns = [getattr(Order, f) for f in ORDER_READ_FIELDS]
+    after_id = 0
+    with MonitoredSession(read_engine) as db:
+        while True:
+            stmt = (
+                select(*columns)
+                .where(Order.id > after_id, *conditions)
+                .order_by(Order.id)
+                .limit(batch_size)
+            )
+            batch = db.exec(stmt).all()
+            db.rollback()  # end the read transaction between batches
+            if not batch:
+                return
+            yield from batch
+            after_id = batch[-1][0]
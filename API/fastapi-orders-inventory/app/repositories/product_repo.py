@@ -0,0 +1,70 @@
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+
+from app.db.monitor import MonitoredSession
+from app.db.session import read_engine
+from app.models.product import Product
+from app.schemas.product import PRODUCT_READ_FIELDS
+
+
+def iter_product_rows(after_id: int = 0, batch_size: int = 500) -> Iterator[Tuple[Any, ...]]:
+    """
+    Yield every product with id > after_id, in id order, as ProductRead column
+    tuples (see PRODUCT_READ_FIELDS; id first).
+
+    Rows are pulled `batch_size` at a time with a keyset query
+    (WHERE id > :last ORDER BY id LIMIT :n), so each round-trip is an index
+    seek on the primary key no matter how deep into the table we are, at most
+    one batch is held in memory, and no read transaction stays open between
+    batches (a long-lived one would hold back WAL checkpoints for the whole
+    stream). Plain tuples: no ORM objects to build.
+
+    Uses its own session: streaming responses outlive the request dependency.
+    """
+    columns = [getattr(Product, f) for f in PRODUCT_READ_FIELDS]
+    with MonitoredSession(read_engine) as db:
+        while True:
+            stmt = (
+                select(*columns)
+                .where(Product.id > after_id)
+                .order_by(Product.id)
+                .limit(batch_size)
+            )
+            batch = db.exec(stmt).all()
+            db.rollback()  # end the read transaction between batches
+            if not batch:
+                return
+            yield from batch
+            after_id = batch[-1][0]
+
+
+def insert_products_skip_conflicts(db: Session, rows: List[Dict[str, Any]]) -> Set[str]:
+    """
+    Insert many products with ONE multi-row statement and commit:
+        INSERT INTO product (...) VALUES (...), (...), ...
+        ON CONFLICT (sku) DO NOTHING
+        RETURNING sku
+    Returns the SKUs that were actually inserted; anything missing from the
+    result hit the unique SKU index (already in the DB or repeated in `rows`).
+    """
+    if not rows:
+        return set()
+    insert = _dialect_insert(db)
+    stmt = (
+        insert(Product)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["sku"])
+        .returning(Product.sku)
+    )
+    inserted = set(db.exec(stmt).scalars())
+    db.commit()
+    return inserted
+
+
+def _dialect_insert(db: Session):
+    # ON CONFLICT DO NOTHING lives on the dialect-specific insert() constructs.
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
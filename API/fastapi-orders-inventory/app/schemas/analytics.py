@@ -0,0 +1,43 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.models.order import OrderStatus
+
+
+# One pre-aggregated row: a product's orders in one status during one hour
+class SalesBucket(BaseModel):
+    product_id: int
+    bucket: datetime                    # start of the hour, UTC
+    status: OrderStatus
+    orders: int
+    units: int
+    revenue: float                      # quantity x price at order time
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "product_id": 1,
+                "bucket": "2025-08-18T12:00:00",
+                "status": "PAID",
+                "orders": 14,
+                "units": 19,
+                "revenue": 189.81
+            }
+        }
+    }
+
+
+# Totals per status over a range of hours
+class StatusTotals(BaseModel):
+    status: OrderStatus
+    orders: int
+    units: int
+    revenue: float
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {"status": "PAID", "orders": 1200, "units": 1530, "revenue": 15284.7}
+        }
+    }
@@ -1,6 +1,6 @@
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import datetime
-from pydantic import BaseModel, conint
+from pydantic import BaseModel, Field, conint, model_validator
 from app.models.order import OrderStatus
 
 
@@ -18,6 +18,22 @@ class OrderCreate(BaseModel):
     }
 
 
+# Several order lines placed together (cart checkout): all succeed or none do.
+class OrderBatchCreate(BaseModel):
+    items: List[OrderCreate] = Field(min_length=1, max_length=500)
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "items": [
+                    {"product_id": 1, "quantity": 2},
+                    {"product_id": 3, "quantity": 1}
+                ]
+            }
+        }
+    }
+
+
 class OrderRead(BaseModel):
     id: int
     product_id: int
@@ -38,6 +54,10 @@ class OrderRead(BaseModel):
     }
 
 
+# Column order for the fast serialization path (app.core.serialization)
+ORDER_READ_FIELDS = tuple(OrderRead.model_fields)
+
+
 # For API-driven changes (e.g., status transitions). We'll enforce rules in the router.
 class OrderUpdate(BaseModel):
     status: Optional[OrderStatus] = None
@@ -48,3 +68,51 @@ class OrderUpdate(BaseModel):
             }
         }
     }
+
+
+# Which orders a bulk status change applies to (all given fields must match)
+class OrderFilter(BaseModel):
+    status: Optional[OrderStatus] = None
+    product_id: Optional[int] = None
+    created_from: Optional[datetime] = None   # inclusive, UTC
+    created_to: Optional[datetime] = None     # exclusive, UTC
+
+
+# Bulk status transition: either an explicit id list or a filter, not both.
+class OrderBulkStatusUpdate(BaseModel):
+    status: OrderStatus
+    ids: Optional[List[int]] = Field(default=None, min_length=1, max_length=10_000)
+    filter: Optional[OrderFilter] = None
+    # Filter mode only: at most this many orders move per call (lowest ids first);
+    # `has_more` in the result says whether to call again.
+    limit: int = Field(default=1000, ge=1, le=10_000)
+
+    @model_validator(mode="after")
+    def _ids_xor_filter(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Provide exactly one of 'ids' or 'filter'")
+        if self.filter is not None and not self.filter.model_dump(exclude_none=True):
+            # An empty filter would match every order in the table
+            raise ValueError("'filter' needs at least one criterion")
+        return self
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "status": "SHIPPED",
+                "ids": [7, 8, 9]
+            }
+        }
+    }
+
+
+class OrderBulkStatusOutcome(BaseModel):
+    id: int
+    result: Literal["updated", "unchanged", "not_found", "invalid_transition"]
+    status: Optional[OrderStatus] = None   # status after the call (None if not found)
+
+
+class OrderBulkStatusResult(BaseModel):
+    updated: int
+    results: List[OrderBulkStatusOutcome]
+    has_more: bool = False                 # filter mode: more matching orders may still move
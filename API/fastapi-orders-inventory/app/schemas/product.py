@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, constr, conint, confloat
 
 
@@ -42,6 +42,10 @@ class ProductRead(BaseModel):
     }
 
 
+# Column order for the fast serialization path (app.core.serialization)
+PRODUCT_READ_FIELDS = tuple(ProductRead.model_fields)
+
+
 # Partial update allowed (invalid/missing fields will be ignored)
 class ProductUpdate(BaseModel):
     sku: Optional[constr(min_length=1)] = None
@@ -58,3 +62,35 @@ class ProductUpdate(BaseModel):
         }
     }
 
+
+# One problem row from a bulk import (line = 1-based line number in the upload)
+class BulkImportIssue(BaseModel):
+    line: int
+    sku: Optional[str] = None
+    detail: str
+
+
+# Summary returned by POST /products/bulk
+class BulkImportResult(BaseModel):
+    rows: int                           # data rows read (excluding CSV header / blank lines)
+    inserted: int
+    conflicts: int                      # SKU already existed (in DB or earlier in the upload)
+    invalid: int                        # failed ProductCreate validation
+    issues: List[BulkImportIssue]       # per-row details, capped
+    issues_truncated: bool = False
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "rows": 3,
+                "inserted": 1,
+                "conflicts": 1,
+                "invalid": 1,
+                "issues": [
+                    {"line": 3, "sku": "SKU-123", "detail": "SKU already exists"},
+                    {"line": 4, "sku": "SKU-9", "detail": "price: Input should be greater than 0"}
+                ],
+                "issues_truncated": False
+            }
+        }
+    }
@@ -0,0 +1,137 @@
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db.session import DbSession, run_db
+from app.repositories.product_repo import insert_products_skip_conflicts
+from app.schemas.product import BulkImportIssue, BulkImportResult, ProductCreate
+
+CSV_TYPES = {"text/csv", "application/csv"}
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"}
+
+
+def import_format(content_type: Optional[str]) -> str:
+    """Map the request Content-Type to 'csv' / 'ndjson' (415 for anything else)."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in CSV_TYPES:
+        return "csv"
+    if media_type in NDJSON_TYPES:
+        return "ndjson"
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Use Content-Type text/csv or application/x-ndjson",
+    )
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Split a streamed body into (line_no, text) without buffering the whole upload.
+    utf-8-sig drops the BOM spreadsheet tools put in front of the header row.
+    """
+    line_no = 0
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line.decode("utf-8-sig", errors="replace").rstrip("\r")
+    if pending:
+        yield line_no + 1, pending.decode("utf-8-sig", errors="replace").rstrip("\r")
+
+
+async def _iter_records(
+    chunks: AsyncIterator[bytes], fmt: str
+) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]]]]:
+    """
+    Yield (line_no, record) for each non-blank line; record is None if the line
+    can't be parsed at all. CSV needs a header row and one record per line
+    (quoted fields must not contain newlines).
+    """
+    header: Optional[List[str]] = None
+    async for line_no, line in _iter_lines(chunks):
+        if not line.strip():
+            continue
+        if fmt == "ndjson":
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_no, record if isinstance(record, dict) else None
+            continue
+
+        fields = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in fields]
+            continue
+        yield line_no, dict(zip(header, fields)) if len(fields) == len(header) else None
+
+
+class _Report:
+    """Running totals; only the first N issues are kept so memory stays flat."""
+
+    def __init__(self) -> None:
+        self.result = BulkImportResult(rows=0, inserted=0, conflicts=0, invalid=0, issues=[])
+
+    def issue(self, line: int, sku: Optional[str], detail: str) -> None:
+        if len(self.result.issues) < settings.BULK_IMPORT_MAX_REPORTED_ISSUES:
+            self.result.issues.append(BulkImportIssue(line=line, sku=sku, detail=detail))
+        else:
+            self.result.issues_truncated = True
+
+
+def _validation_detail(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'row'}: {e['msg']}" for e in exc.errors()
+    )
+
+
+def _flush(db: Session, batch: List[Tuple[int, ProductCreate]], report: _Report) -> None:
+    inserted = insert_products_skip_conflicts(db, [item.model_dump() for _, item in batch])
+    for line_no, item in batch:
+        if item.sku in inserted:
+            inserted.discard(item.sku)  # a repeat later in the batch is a conflict
+            report.result.inserted += 1
+        else:
+            report.result.conflicts += 1
+            report.issue(line_no, item.sku, "SKU already exists")
+
+
+async def import_products(db: DbSession, chunks: AsyncIterator[bytes], fmt: str) -> BulkImportResult:
+    """
+    Stream → parse → validate → insert, one batch at a time:
+      - each row is validated against ProductCreate (invalid rows are reported, not fatal);
+      - every BULK_IMPORT_BATCH_SIZE valid rows become one multi-row INSERT and one commit,
+        run via run_db() so the event loop keeps serving other requests;
+      - duplicate SKUs are skipped by the DB and reported per row.
+    """
+    report = _Report()
+    batch: List[Tuple[int, ProductCreate]] = []
+
+    async for line_no, record in _iter_records(chunks, fmt):
+        report.result.rows += 1
+        if record is None:
+            report.result.invalid += 1
+            report.issue(line_no, None, f"Malformed {fmt} row")
+            continue
+        try:
+            item = ProductCreate.model_validate(record)
+        except ValidationError as exc:
+            report.result.invalid += 1
+            sku = record.get("sku")
+            report.issue(line_no, sku if isinstance(sku, str) else None, _validation_detail(exc))
+            continue
+
+        batch.append((line_no, item))
+        if len(batch) >= settings.BULK_IMPORT_BATCH_SIZE:
+            await run_db(db, _flush, batch, report)
+            batch = []
+
+    if batch:
+        await run_db(db, _flush, batch, report)
+    return report.result
@@ -0,0 +1,260 @@
+import itertools
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.metrics import insufficient_stock
+from app.db.monitor import MonitoredSession
+from app.db.session import engine
+from app.models.product import Product
+
+
+def decrement_stock(db: Session, quantities: Dict[int, int]) -> None:
+    """
+    Take stock for several products inside the caller's transaction.
+
+    - One conditional UPDATE per product (stock = stock - :qty WHERE stock >= :qty),
+      issued in ascending product id order so concurrent multi-product checkouts
+      always lock rows in the same order and can't deadlock each other.
+    - All-or-nothing: on the first product that can't be served we roll back
+      everything taken so far and raise 404 (unknown product) or 409 (short).
+    - The caller commits.
+    """
+    for product_id in sorted(quantities):
+        qty = quantities[product_id]
+        stmt = (
+            update(Product)
+            .where(Product.id == product_id)
+            .where(Product.stock >= qty)
+            .values(stock=Product.stock - qty, version=Product.version + 1)
+        )
+        if db.exec(stmt).rowcount == 1:
+            continue
+
+        # Slow path only: find out *why* the row wasn't updated.
+        exists = db.exec(select(Product.id).where(Product.id == product_id)).first()
+        db.rollback()
+        if exists is None:
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+        insufficient_stock.inc()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Insufficient stock for product {product_id}",
+        )
+
+
+class _Shard:
+    __slots__ = ("lock", "available")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.available = 0
+
+
+class HotSkuReservations:
+    """
+    In-process stock reservations for designated hot SKUs (HOT_SKU_IDS).
+
+    Normal orders contend on one product row: every order runs
+    UPDATE product SET stock = stock - :qty ... and queues on the write lock.
+    For a hot SKU we instead *lease* stock in blocks of HOT_SKU_LEASE_SIZE:
+
+      1) lease   - one committed UPDATE takes a block off product.stock;
+      2) grant   - orders are served from that block in memory, spread over
+                   HOT_SKU_SHARDS independently locked counters so threads
+                   rarely wait on each other;
+      3) refill  - when the shards run dry, lease the next block.
+
+    Stock leaves the product row *before* it is granted, so a crash can never
+    oversell: the worst case is that the unsold remainder of the current
+    blocks (≤ shards x lease size per SKU) stays withheld until fixed up by
+    hand. On a clean shutdown release_all() hands the remainder back. Every
+    worker process leases its own blocks from the same row, so workers can't
+    oversell each other either.
+
+    While a SKU is hot its product.stock reads low by the units currently
+    leased out.
+    """
+
+    def __init__(self, product_ids: Iterable[int], shards: int, lease_size: int) -> None:
+        self.lease_size = max(1, lease_size)
+        self._shards: Dict[int, List[_Shard]] = {
+            pid: [_Shard() for _ in range(max(1, shards))] for pid in product_ids
+        }
+        self._next = itertools.count()
+        self._stats_lock = threading.Lock()
+        self.granted = 0
+        self.refused = 0
+        self.leases = 0
+        self.units_leased = 0
+
+    def is_hot(self, product_id: int) -> bool:
+        return product_id in self._shards
+
+    def _count(self, **deltas: int) -> None:
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def _take_from_shards(self, product_id: int, qty: int) -> bool:
+        shards = self._shards[product_id]
+        start = next(self._next)
+        for i in range(len(shards)):
+            shard = shards[(start + i) % len(shards)]
+            with shard.lock:
+                if shard.available >= qty:
+                    shard.available -= qty
+                    return True
+        return False
+
+    def _drain_shards(self, product_id: int) -> int:
+        total = 0
+        for shard in self._shards[product_id]:
+            with shard.lock:
+                total += shard.available
+                shard.available = 0
+        return total
+
+    def _put_back(self, product_id: int, units: int) -> None:
+        if units <= 0:
+            return
+        shard = self._shards[product_id][next(self._next) % len(self._shards[product_id])]
+        with shard.lock:
+            shard.available += units
+
+    def reserve(self, db: Session, product_id: int, qty: int) -> None:
+        """
+        Grant `qty` units of a hot SKU or raise 404/409 like the regular path.
+        A refill commits on `db`, so call this before starting the order's own writes.
+        """
+        if self._take_from_shards(product_id, qty):
+            self._count(granted=1)
+            return
+
+        # Refill. No lock is held across the DB call (on the async path every
+        # request shares one thread, so blocking here would stall the loop);
+        # concurrent refills are harmless - each lease is its own conditional
+        # UPDATE - they just lease a few extra blocks.
+        have = self._drain_shards(product_id)  # leftovers too small on their own
+        if have < qty:
+            leased = _lease_stock(db, product_id, want=max(qty - have, self.lease_size), need=qty - have)
+            if leased is None:
+                self._put_back(product_id, have)
+                self._count(refused=1)
+                raise HTTPException(status_code=404, detail="Product not found")
+            self._count(leases=1 if leased else 0, units_leased=leased)
+            have += leased
+
+        if have < qty:
+            self._put_back(product_id, have)
+            self._count(refused=1)
+            insufficient_stock.inc()
+            raise HTTPException(status_code=409, detail="Insufficient stock")
+
+        self._put_back(product_id, have - qty)
+        self._count(granted=1)
+
+    def reserve_many(self, db: Session, quantities: Dict[int, int]) -> Dict[int, int]:
+        """
+        reserve() for a multi-product order: grants every hot SKU in `quantities`
+        (others are ignored) in product-id order, or none of them. Errors name the
+        product, like decrement_stock(). Returns what was granted, so the caller
+        can release() it if the rest of its transaction fails.
+        """
+        granted: Dict[int, int] = {}
+        for product_id in sorted(pid for pid in quantities if self.is_hot(pid)):
+            try:
+                self.reserve(db, product_id, quantities[product_id])
+            except HTTPException as exc:
+                for pid, qty in granted.items():
+                    self.release(pid, qty)
+                detail = (
+                    f"Product {product_id} not found" if exc.status_code == 404
+                    else f"Insufficient stock for product {product_id}"
+                )
+                raise HTTPException(status_code=exc.status_code, detail=detail)
+            granted[product_id] = quantities[product_id]
+        return granted
+
+    def release(self, product_id: int, qty: int) -> None:
+        """Hand back units from a grant whose order couldn't be written."""
+        self._put_back(product_id, qty)
+
+    def return_to_stock(self, db: Session, product_id: int) -> int:
+        """Move every unsold leased unit back onto product.stock (commits on `db`)."""
+        units = self._drain_shards(product_id)
+        if units:
+            db.exec(
+                update(Product)
+                .where(Product.id == product_id)
+                .values(stock=Product.stock + units, version=Product.version + 1)
+            )
+            db.commit()
+        return units
+
+    def withdraw(self, product_id: int) -> int:
+        """
+        Take every unsold leased unit out of the shards, for a caller that puts
+        them back on product.stock inside its own write (or release()s them if
+        that write fails).
+        """
+        return self._drain_shards(product_id)
+
+    def discard(self, product_id: int) -> None:
+        """Forget leased units (the product is being deleted)."""
+        self._drain_shards(product_id)
+
+    def release_all(self) -> None:
+        """Clean shutdown: give every leased-but-unsold unit back to the DB."""
+        with MonitoredSession(engine) as db:
+            for product_id in self._shards:
+                self.return_to_stock(db, product_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = {
+                "granted": self.granted,
+                "refused": self.refused,
+                "leases": self.leases,
+                "units_leased": self.units_leased,
+            }
+        stats["available"] = {
+            pid: sum(shard.available for shard in shards) for pid, shards in self._shards.items()
+        }
+        return stats
+
+
+def _lease_stock(db: Session, product_id: int, want: int, need: int) -> Optional[int]:
+    """
+    Take up to `want` (at least `need`) units off product.stock and commit.
+    Returns the units taken, 0 if fewer than `need` are left, None if the product is gone.
+    """
+    for _ in range(5):  # only retried when another writer moved stock under us
+        stock = db.exec(select(Product.stock).where(Product.id == product_id)).first()
+        if stock is None:
+            db.rollback()
+            return None
+        take = min(stock, want)
+        if take < need or take <= 0:
+            db.rollback()
+            return 0
+        stmt = (
+            update(Product)
+            .where(Product.id == product_id)
+            .where(Product.stock >= take)
+            .values(stock=Product.stock - take, version=Product.version + 1)
+        )
+        if db.exec(stmt).rowcount == 1:
+            db.commit()
+            return take
+        db.rollback()
+    return 0
+
+
+reservations = HotSkuReservations(
+    settings.HOT_SKU_IDS, settings.HOT_SKU_SHARDS, settings.HOT_SKU_LEASE_SIZE
+)
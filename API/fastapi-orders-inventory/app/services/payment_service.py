@@ -0,0 +1,215 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import (
+    Column, Float, Integer, MetaData, String, Table, create_engine, delete, event, func, insert, select, update,
+)
+from sqlmodel import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.monitor import MonitoredSession
+from app.db.session import engine
+from app.models.order import Order, OrderStatus
+
+logger = logging.getLogger("app.payments")
+
+
+def mark_paid_many(db: Session, order_ids: Iterable[int]) -> int:
+    """
+    Set-based flavour of the webhook's _mark_paid(): one UPDATE for the whole batch.
+    Only PENDING orders move to PAID (and get a new version), so replays and
+    orders that were already paid/shipped/canceled are no-ops. Commits.
+    Returns how many orders actually changed.
+    """
+    ids = sorted(set(order_ids))
+    if not ids:
+        return 0
+    stmt = (
+        update(Order)
+        .where(Order.id.in_(ids))
+        .where(Order.status == OrderStatus.PENDING)
+        .values(status=OrderStatus.PAID, version=Order.version + 1)
+    )
+    updated = db.exec(stmt).rowcount
+    db.commit()
+    return updated
+
+
+# Ids per IN (...) list: far below SQLite's bound-parameter limit, so a
+# reconciliation batch of tens of thousands of orders is a handful of statements.
+_IN_CHUNK = 5000
+
+
+def pay_orders(db: Session, order_ids: Iterable[int]) -> Tuple[Set[int], Dict[int, OrderStatus]]:
+    """
+    Mark a set of orders PAID inside the caller's transaction (the caller commits).
+
+    Per chunk of ids: one UPDATE ... WHERE status = 'PENDING' RETURNING id, then
+    one SELECT for the ids it didn't touch. Returns
+      - the ids this call moved PENDING → PAID;
+      - the current status of every other order that exists.
+    Ids in neither don't exist.
+    """
+    ids = sorted(set(order_ids))
+    paid: Set[int] = set()
+    others: Dict[int, OrderStatus] = {}
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start:start + _IN_CHUNK]
+        stmt = (
+            update(Order)
+            .where(Order.id.in_(chunk))
+            .where(Order.status == OrderStatus.PENDING)
+            .values(status=OrderStatus.PAID, version=Order.version + 1)
+            .returning(Order.id)
+        )
+        paid.update(db.execute(stmt).scalars())
+        rest = [oid for oid in chunk if oid not in paid]
+        if rest:
+            rows = db.execute(select(Order.id, Order.status).where(Order.id.in_(rest)))
+            others.update({oid: OrderStatus(st) for oid, st in rows})
+    return paid, others
+
+
+# ----- outbox -----
+# Accepted webhook events, in a separate SQLite file. Appending here only
+# contends with other webhook appends, never with order/stock writes on the
+# main database, so the webhook's latency doesn't depend on DB write latency.
+_outbox_metadata = MetaData()
+outbox_table = Table(
+    "payment_outbox",
+    _outbox_metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("event_type", String, nullable=False),
+    Column("order_id", Integer, nullable=False),
+    Column("received_at", Float, nullable=False),
+    # AUTOINCREMENT: ids are never reused, so "DELETE ... WHERE id <= :last" can't
+    # hit an event that arrived after the batch was read (even with several workers).
+    sqlite_autoincrement=True,
+)
+
+outbox_engine = create_engine(
+    settings.WEBHOOK_OUTBOX_URL, connect_args={"check_same_thread": False}
+)
+
+
+@event.listens_for(outbox_engine, "connect")
+def _outbox_pragmas(dbapi_conn, _record) -> None:
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=FULL")  # a 202 promises the event survives a crash
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+
+def enqueue_payments(event_type: str, order_ids: List[int]) -> None:
+    """Durably append events to the outbox (one transaction). Blocking - call off the event loop."""
+    now = time.time()
+    with outbox_engine.begin() as conn:
+        conn.execute(
+            insert(outbox_table),
+            [{"event_type": event_type, "order_id": oid, "received_at": now} for oid in order_ids],
+        )
+
+
+class PaymentWorker:
+    """
+    Background thread that drains the outbox:
+
+      1) read up to WEBHOOK_WORKER_BATCH_SIZE events (oldest first);
+      2) mark_paid_many() on the main DB - one UPDATE + one commit per batch;
+      3) delete those events from the outbox.
+
+    Delivery is at-least-once: a crash between 2) and 3) re-applies the batch on
+    restart, which is harmless because the UPDATE only touches PENDING orders.
+    Events for unknown orders simply match no row.
+    """
+
+    def __init__(self) -> None:
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.events = 0
+        self.orders_paid = 0
+        self.errors = 0
+        self.last_lag_seconds = 0.0
+
+    def start(self) -> None:
+        _outbox_metadata.create_all(outbox_engine)
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="payment-outbox-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop polling, after draining whatever is already queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            try:
+                drained = self.drain_once() == 0
+            except Exception:
+                self.errors += 1
+                logger.exception("payment outbox batch failed; retrying")
+                drained = True
+            if drained:
+                if self._stop.is_set():
+                    return
+                self._stop.wait(settings.WEBHOOK_WORKER_POLL_SECONDS)
+
+    def drain_once(self) -> int:
+        """Apply one batch; returns how many outbox events it consumed."""
+        with outbox_engine.connect() as conn:
+            rows = conn.execute(
+                select(outbox_table.c.id, outbox_table.c.order_id, outbox_table.c.received_at)
+                .order_by(outbox_table.c.id)
+                .limit(settings.WEBHOOK_WORKER_BATCH_SIZE)
+            ).all()
+        if not rows:
+            return 0
+
+        with MonitoredSession(engine) as db:
+            paid = mark_paid_many(db, (row.order_id for row in rows))
+
+        with outbox_engine.begin() as conn:
+            conn.execute(delete(outbox_table).where(outbox_table.c.id <= rows[-1].id))
+
+        self.batches += 1
+        self.events += len(rows)
+        self.orders_paid += paid
+        self.last_lag_seconds = time.time() - rows[0].received_at
+        return len(rows)
+
+    def pending(self) -> int:
+        with outbox_engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(outbox_table)).scalar_one()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": settings.WEBHOOK_INGEST_MODE,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "pending": self.pending() if settings.WEBHOOK_INGEST_MODE == "queue" else 0,
+            "batches": self.batches,
+            "events": self.events,
+            "orders_paid": self.orders_paid,
+            "errors": self.errors,
+            "last_lag_seconds": round(self.last_lag_seconds, 4),
+        }
+
+
+payment_worker = PaymentWorker()
+
+# Webhook replay cache: dedupe key → (status code, JSON body) of the first answer.
+# Entries live as long as a delivery can pass the timestamp check, so anything
+# evicted by age would be rejected as stale anyway; the size cap bounds memory.
+Replay = Tuple[int, bytes]
+replay_cache: TTLCache[Replay] = TTLCache(
+    settings.WEBHOOK_REPLAY_CACHE_MAX_ENTRIES, settings.WEBHOOK_MAX_SKEW_SECONDS
+)
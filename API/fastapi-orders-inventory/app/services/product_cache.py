@@ -0,0 +1,72 @@
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# A cached product: (JSON body, ETag)
+Item = Tuple[bytes, str]
+# A cached listing page: (JSON body, X-Next-Cursor or None)
+Page = Tuple[bytes, Optional[str]]
+
+
+class ProductCache:
+    """
+    In-process cache of serialized product responses.
+
+      items: product id → JSON body + ETag of GET /products/{id}
+      pages: (limit, offset, after_id) → JSON body + next cursor of GET /products
+
+    Writers call invalidate() *after* they commit. Readers take `generation`
+    before going to the DB and pass it to put_*(); if an invalidation happened
+    in between, the (possibly stale) value is simply not stored.
+
+    Per process only: with several workers, another worker's write is picked
+    up here when the entry expires (PRODUCT_CACHE_TTL_SECONDS).
+    """
+
+    def __init__(self) -> None:
+        self.enabled = settings.PRODUCT_CACHE_ENABLED
+        self.items: TTLCache[Item] = TTLCache(
+            settings.PRODUCT_CACHE_MAX_ENTRIES, settings.PRODUCT_CACHE_TTL_SECONDS
+        )
+        self.pages: TTLCache[Page] = TTLCache(
+            settings.PRODUCT_CACHE_MAX_PAGES, settings.PRODUCT_CACHE_TTL_SECONDS
+        )
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def get_item(self, product_id: int) -> Optional[Item]:
+        return self.items.get(product_id) if self.enabled else None
+
+    def put_item(self, product_id: int, item: Item, generation: int) -> None:
+        with self._lock:
+            if self.enabled and generation == self.generation:
+                self.items.set(product_id, item)
+
+    def get_page(self, key: Hashable) -> Optional[Page]:
+        return self.pages.get(key) if self.enabled else None
+
+    def put_page(self, key: Hashable, page: Page, generation: int) -> None:
+        with self._lock:
+            if self.enabled and generation == self.generation:
+                self.pages.set(key, page)
+
+    def invalidate(self, *product_ids: int) -> None:
+        """Drop the given products and every listing page (any change can reshuffle them)."""
+        with self._lock:
+            self.generation += 1
+            for product_id in product_ids:
+                self.items.pop(product_id)
+            self.pages.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "generation": self.generation,
+            "items": self.items.stats(),
+            "pages": self.pages.stats(),
+        }
+
+
+product_cache = ProductCache()
@@ -1,10 +1,14 @@
 import hmac, hashlib, json, time
 from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.responses import Response
 from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.api.deps import get_db
+from app.api.deps import DbSession, commit, get_db, run_db, run_write
 from app.core.config import settings
+from app.core.serialization import FastJSONResponse
 from app.models.order import Order, OrderStatus
+from app.services.payment_service import enqueue_payments, pay_orders, replay_cache
 
 router = APIRouter()
 
@@ -37,19 +41,52 @@ def _verify_signature(timestamp: str | None, signature: str | None, body: bytes)
 def _mark_paid(order: Order, db: Session) -> Order:
     if order.status == OrderStatus.PENDING:
         order.status = OrderStatus.PAID
+        order.version += 1
         db.add(order)
-        db.commit()
+        commit(db)
         db.refresh(order)
     # idempotent: if already PAID/SHIPPED/CANCELED we just return current state
     return order
 
 
+def _apply_payment(db: Session, order_id: int) -> Order:
+    order = db.get(Order, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return _mark_paid(order, db)
+
+
+def _replayed(key: str) -> Response | None:
+    cached = replay_cache.get(key)
+    if cached is None:
+        return None
+    status_code, body = cached
+    return Response(
+        content=body, status_code=status_code, media_type="application/json",
+        headers={"X-Webhook-Replay": "true"},
+    )
+
+
+def _answer(keys: list[str], status_code: int, content: dict) -> Response:
+    """Send `content` and remember it under every dedupe key for the skew window."""
+    response = FastJSONResponse(content=content, status_code=status_code)
+    for key in keys:
+        replay_cache.set(key, (status_code, response.body))
+    return response
+
+
 # ----- route -----
 @router.post(
     "/payment",
-    summary="Payment webhook: verify HMAC, mark order as PAID",
+    summary="Payment webhook: verify HMAC, mark order(s) as PAID",
+    description=(
+        "Body is either a single event `{\"type\": \"payment.succeeded\", \"data\": {\"order_id\": 1}}` "
+        "or a batch envelope `{\"events\": [...]}` of such events, signed once; "
+        "batches answer with a per-event `results` list."
+    ),
     responses={
-        200: {"description": "Processed (idempotent)"},
+        200: {"description": "Processed (idempotent); repeats within the skew window carry X-Webhook-Replay: true"},
+        202: {"description": "Accepted into the outbox (WEBHOOK_INGEST_MODE=queue); applied shortly after"},
         400: {"description": "Bad request / stale webhook / missing headers"},
         401: {"description": "Signature invalid"},
         404: {"description": "Order not found"},
@@ -58,7 +95,7 @@ def _mark_paid(order: Order, db: Session) -> Order:
 )
 async def payment_webhook(
     request: Request,
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_db),
     x_signature: str | None = Header(default=None, alias="X-Signature"),
     x_signature_timestamp: str | None = Header(default=None, alias="X-Signature-Timestamp"),
 ):
@@ -68,27 +105,112 @@ async def payment_webhook(
     # 2) verify signature & timestamp
     _verify_signature(x_signature_timestamp, x_signature, raw)
 
+    # 2b) exact redelivery (same signed bytes) → answer from memory, before parsing
+    keys = [f"sig:{x_signature}"]
+    if (replayed := _replayed(keys[0])) is not None:
+        return replayed
+
     # 3) parse JSON
     try:
         payload = json.loads(raw.decode("utf-8"))
-        event_type = payload.get("type")
-        data = payload.get("data") or {}
-        order_id = int(data["order_id"])
+        if payload.get("id") is not None:
+            keys.append(f"evt:{payload['id']}")  # provider retries are re-signed, same event id
+        events = payload.get("events")
+        if events is None:
+            event_type = payload.get("type")
+            data = payload.get("data") or {}
+            order_id = int(data["order_id"])
+        elif not isinstance(events, list):
+            raise ValueError("events must be a list")
     except Exception:
         raise HTTPException(status_code=400, detail="Malformed payload")
 
+    # 3b) same event delivered again (new timestamp/signature) → answer from memory
+    if len(keys) > 1 and (replayed := _replayed(keys[1])) is not None:
+        return replayed
+
+    if events is not None:
+        return await _handle_batch(db, keys, events)
+
     if event_type != "payment.succeeded":
         # For the assignment, we accept only one event type.
         raise HTTPException(status_code=400, detail="Unsupported event type")
 
-    # 4) find order & update status (idempotent)
-    order = db.get(Order, order_id)
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+    # 4a) queue mode: make the event durable and acknowledge; the payment worker
+    #     applies it in a batch. No main-DB access on this path at all.
+    if settings.WEBHOOK_INGEST_MODE == "queue":
+        await run_in_threadpool(enqueue_payments, event_type, [order_id])
+        return _answer(keys, status.HTTP_202_ACCEPTED, {"detail": "queued", "order": {"id": order_id}})
 
-    order = _mark_paid(order, db)
+    # 4b) inline: find order & update status (idempotent).
+    #    run_write keeps the blocking DB work off the event loop (threadpool, async
+    #    driver or, with DB_WRITE_MODE=group, the group writer).
+    order = await run_write(db, _apply_payment, order_id)
 
-    return {
+    return _answer(keys, status.HTTP_200_OK, {
         "detail": "ok",
         "order": {"id": order.id, "status": order.status},
-    }
+    })
+
+
+# ----- batch envelopes -----
+async def _handle_batch(db: DbSession, keys: list[str], events: list) -> Response:
+    """
+    {"events": [{"id": ..., "type": "payment.succeeded", "data": {"order_id": ...}}, ...]}
+
+    The envelope was verified once by the caller. Every event gets a result, in order:
+      paid      → this delivery moved the order PENDING → PAID
+      unchanged → order was already PAID/SHIPPED/CANCELED (idempotent no-op)
+      not_found → no such order
+      queued    → accepted into the outbox (queue mode)
+      rejected  → malformed or unsupported event (the rest still apply)
+    """
+    if not events or len(events) > settings.WEBHOOK_MAX_BATCH_EVENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"events must hold 1..{settings.WEBHOOK_MAX_BATCH_EVENTS} entries",
+        )
+
+    results = []
+    order_ids = []
+    for event in events:
+        event_id = event.get("id") if isinstance(event, dict) else None
+        try:
+            event_type = event.get("type")
+            order_id = int((event.get("data") or {})["order_id"])
+        except Exception:
+            results.append({"id": event_id, "result": "rejected", "detail": "Malformed event"})
+            continue
+        if event_type != "payment.succeeded":
+            results.append({"id": event_id, "order_id": order_id, "result": "rejected",
+                            "detail": "Unsupported event type"})
+            continue
+        results.append({"id": event_id, "order_id": order_id})
+        order_ids.append(order_id)
+
+    if settings.WEBHOOK_INGEST_MODE == "queue":
+        if order_ids:
+            await run_in_threadpool(enqueue_payments, "payment.succeeded", order_ids)
+        for result in results:
+            result.setdefault("result", "queued")
+        return _answer(keys, status.HTTP_202_ACCEPTED, {"detail": "queued", "results": results})
+
+    paid, others = await run_db(db, _apply_payment_batch, order_ids)
+    for result in results:
+        if "result" in result:
+            continue
+        order_id = result["order_id"]
+        if order_id in paid:
+            result.update(result="paid", status=OrderStatus.PAID.value)
+        elif order_id in others:
+            result.update(result="unchanged", status=others[order_id].value)
+        else:
+            result["result"] = "not_found"
+    return _answer(keys, status.HTTP_200_OK, {"detail": "ok", "results": results})
+
+
+def _apply_payment_batch(db: Session, order_ids: list[int]) -> tuple[set[int], dict[int, OrderStatus]]:
+    """All orders of one envelope: set-based load + update, one commit."""
+    paid, others = pay_orders(db, order_ids)
+    db.commit()
+    return paid, others
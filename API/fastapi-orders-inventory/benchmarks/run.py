@@ -0,0 +1,271 @@
+"""
+In-process benchmark suite: drives app.main:app over ASGI (httpx.ASGITransport,
+no server, no network) against a freshly seeded SQLite file.
+
+    python -m benchmarks.run                          # run, print a table
+    python -m benchmarks.run --save-baseline          # ... and store benchmarks/baseline.json
+    python -m benchmarks.run --check                  # ... and exit 1 if a scenario regressed
+
+A scenario regresses when its p95 grows, or its throughput drops, by more than
+--threshold (default 25%) against the baseline. Baselines are machine-specific:
+record one on the box that runs the check.
+
+Settings come from the environment as usual (e.g. DB_PROFILE=production,
+DB_ASYNC=1, WEBHOOK_INGEST_MODE=queue); only the database files are forced into
+a temporary directory.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_BASELINE = HERE / "baseline.json"
+
+# Must happen before anything imports app.* (settings are read at import time).
+_tmp = tempfile.mkdtemp(prefix="bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/bench.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["WEBHOOK_OUTBOX_URL"] = f"sqlite:///{_tmp}/outbox.db"
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.pagination import encode_cursor  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.order import Order  # noqa: E402
+from app.models.product import Product  # noqa: E402
+from app.services.product_cache import product_cache  # noqa: E402
+
+Call = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+# ----- helpers -----
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def signed(body: bytes) -> Dict[str, str]:
+    ts = str(int(time.time()))
+    sig = hmac.new(
+        settings.PAYMENT_WEBHOOK_SECRET.encode("utf-8"), f"{ts}.".encode("utf-8") + body, hashlib.sha256
+    ).hexdigest()
+    return {"X-Signature-Timestamp": ts, "X-Signature": sig, "Content-Type": "application/json"}
+
+
+def seed_products(total: int, stock: int = 1_000_000) -> None:
+    """Top the catalog up to `total` products with one multi-row INSERT per 5000 rows."""
+    with engine.begin() as conn:
+        have = conn.exec_driver_sql("SELECT COUNT(*) FROM product").scalar_one()
+        rows = [
+            {"sku": f"SEED-{i}", "name": f"Seeded {i}", "price": 9.99, "stock": stock}
+            for i in range(have, total)
+        ]
+        for start in range(0, len(rows), 5000):
+            conn.execute(insert(Product), rows[start:start + 5000])
+
+
+def seed_orders(product_id: int, count: int) -> List[int]:
+    with engine.begin() as conn:
+        first = conn.exec_driver_sql('SELECT COALESCE(MAX(id), 0) FROM "order"').scalar_one()
+        conn.execute(insert(Order), [{"product_id": product_id, "quantity": 1} for _ in range(count)])
+    return list(range(first + 1, first + count + 1))
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, name: str, call: Call, requests: int, concurrency: int, expect: int
+) -> Dict[str, float]:
+    """Fire `requests` calls from `concurrency` concurrent clients; time each one."""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            resp = await call(client, i)
+            latencies.append(time.perf_counter() - started)
+            if resp.status_code != expect:
+                errors += 1
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+# ----- scenarios -----
+async def run_suite(requests: int, concurrency: int, catalog_sizes: List[int]) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    transport = httpx.ASGITransport(app=app)
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def scenario(name: str, call: Call, expect: int = 200, n: Optional[int] = None) -> None:
+                results[name] = await run_scenario(client, name, call, n or requests, concurrency, expect)
+                print(f"  {name:<32} {results[name]['p95_ms']:>9.3f} ms p95", file=sys.stderr)
+
+            # Products CRUD
+            seed_products(max(catalog_sizes[0], 10))
+            created: List[int] = []
+
+            async def create_product(c: httpx.AsyncClient, i: int) -> httpx.Response:
+                r = await c.post("/products/", json={"sku": f"BENCH-{i}", "name": "Bench", "price": 1.5, "stock": 10})
+                if r.status_code == 201:
+                    created.append(r.json()["id"])
+                return r
+
+            await scenario("products.create", create_product, expect=201)
+            await scenario(
+                "products.get",
+                lambda c, i: c.get(f"/products/{created[i % len(created)]}"),
+            )
+            await scenario(
+                "products.update",
+                lambda c, i: c.put(f"/products/{created[i % len(created)]}", json={"price": 2.0 + i % 7}),
+            )
+            await scenario(
+                "products.delete",
+                lambda c, i: c.delete(f"/products/{created[i]}"),
+                expect=204, n=len(created),
+            )
+
+            # Listing at several catalog sizes: first page, a deep offset page, a deep cursor page
+            for size in catalog_sizes:
+                seed_products(size)
+                deep = max(size - 200, 0)
+                cursor = encode_cursor({"id": deep})
+                await scenario(f"products.list.first@{size}", lambda c, i: c.get("/products/?limit=100"))
+                await scenario(
+                    f"products.list.offset@{size}", lambda c, i, d=deep: c.get(f"/products/?limit=100&offset={d}")
+                )
+                await scenario(
+                    f"products.list.cursor@{size}",
+                    lambda c, i, k=cursor: c.get("/products/", params={"limit": 100, "cursor": k}),
+                )
+                # Largest page with the product cache off: query + serialization on every request
+                cache_was, product_cache.enabled = product_cache.enabled, False
+                await scenario(f"products.list.500.uncached@{size}", lambda c, i: c.get("/products/?limit=500"))
+                product_cache.enabled = cache_was
+
+            # Orders: everyone buys the same three SKUs
+            hot = list(range(1, 4))
+            await scenario(
+                "orders.create.contended",
+                lambda c, i: c.post("/orders/", json={"product_id": hot[i % len(hot)], "quantity": 1}),
+                expect=201,
+            )
+
+            # Status transitions on pre-seeded PENDING orders
+            pending = seed_orders(hot[0], requests)
+            await scenario(
+                "orders.transition",
+                lambda c, i: c.put(f"/orders/{pending[i]}", json={"status": "PAID"}),
+            )
+
+            # Signed payment webhooks on pre-seeded PENDING orders
+            unpaid = seed_orders(hot[0], requests)
+
+            async def webhook(c: httpx.AsyncClient, i: int) -> httpx.Response:
+                body = json.dumps(
+                    {"id": f"evt-{unpaid[i]}", "type": "payment.succeeded", "data": {"order_id": unpaid[i]}}
+                ).encode("utf-8")
+                return await c.post("/webhooks/payment", content=body, headers=signed(body))
+
+            await scenario(
+                "webhooks.payment", webhook,
+                expect=202 if settings.WEBHOOK_INGEST_MODE == "queue" else 200,
+            )
+
+    return results
+
+
+# ----- baselines -----
+def regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    problems = []
+    for name, now in results.items():
+        then = baseline.get(name)
+        if not then:
+            continue
+        if then["p95_ms"] and now["p95_ms"] > then["p95_ms"] * (1 + threshold):
+            problems.append(f"{name}: p95 {then['p95_ms']} → {now['p95_ms']} ms")
+        if then["throughput_rps"] and now["throughput_rps"] < then["throughput_rps"] * (1 - threshold):
+            problems.append(f"{name}: throughput {then['throughput_rps']} → {now['throughput_rps']} req/s")
+    return problems
+
+
+def print_table(results: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'scenario':<32} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, r in results.items():
+        print(
+            f"{name:<32} {r['throughput_rps']:>9.1f} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f}"
+            f" {r['p99_ms']:>9.3f} {r['errors']:>7}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent in-process clients")
+    parser.add_argument("--catalog-sizes", default="100,1000,10000", help="comma-separated product counts")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write results to --baseline")
+    parser.add_argument("--check", action="store_true", help="compare with --baseline; exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--output", type=Path, help="also write results JSON here")
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.catalog_sizes.split(",") if s.strip())
+    results = asyncio.run(run_suite(args.requests, args.concurrency, sizes))
+    print_table(results)
+
+    failed = any(r["errors"] for r in results.values())
+    if failed:
+        print("\nSome requests returned an unexpected status (see `errors`).")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+    if args.check:
+        if not args.baseline.exists():
+            print(f"\nNo baseline at {args.baseline}; run with --save-baseline first.")
+            return 1
+        problems = regressions(results, json.loads(args.baseline.read_text()), args.threshold)
+        if problems:
+            print(f"\nRegressions (> {args.threshold:.0%}):")
+            for p in problems:
+                print(f"  - {p}")
+            failed = True
+        else:
+            print(f"\nNo regressions against {args.baseline}.")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+Multi-process oversell stress rig.
+
+Starts N worker processes, each running its own copy of app.main:app (own
+engine, pools and in-memory state - exactly like N uvicorn workers) against ONE
+SQLite file, and has them hammer POST /orders on a few low-stock SKUs until the
+stock is gone or --duration runs out. Then it checks, straight from the DB:
+
+    initial stock == remaining stock + sum(order quantities)      (per SKU)
+
+and reports orders/sec, latency, time spent in each transaction's first write
+statement (≈ waiting for SQLite's write lock) and the 503s, split into
+"database is locked" failures and requests shed by admission control (told
+apart by their detail; both carry Retry-After). Exit code 1 if the invariant
+breaks.
+
+    python scripts/stress.py --workers 8 --concurrency 16 --skus 3 --stock 500
+    DB_PROFILE=production python scripts/stress.py ...     # WAL, busy_timeout, split pools
+    HOT_SKU_IDS='[1,2,3]' python scripts/stress.py ...     # reservation engine path
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# 503 details: app.core.errors (SQLite lock timeout) and app.core.admission (load shedding)
+UNAVAILABLE_REASONS = {
+    "Database busy, retry shortly": "locked",
+    "Server busy, retry shortly": "shed",
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))]
+
+
+# ----- worker process -----
+def _track_lock_waits(engine, waits: List[float]) -> None:
+    """Time the first INSERT/UPDATE/DELETE of every transaction: that's where SQLite takes (or waits for) the write lock."""
+    from sqlalchemy import event
+
+    def before(conn, _cursor, statement, *_):
+        if "stress_wrote" not in conn.info and statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+            conn.info["stress_started"] = time.perf_counter()
+
+    def after(conn, *_):
+        started = conn.info.pop("stress_started", None)
+        if started is not None:
+            waits.append(time.perf_counter() - started)
+            conn.info["stress_wrote"] = True
+
+    def end(conn):
+        conn.info.pop("stress_wrote", None)
+        conn.info.pop("stress_started", None)
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+    event.listen(engine, "commit", end)
+    event.listen(engine, "rollback", end)
+
+
+def worker(index: int, sku_ids: List[int], args: Dict[str, Any], start: Any, results: Any) -> None:
+    import httpx
+    from app.db import session as db_session
+    from app.main import app
+
+    waits: List[float] = []
+    _track_lock_waits(db_session.engine, waits)
+    if db_session.async_engine is not None:
+        _track_lock_waits(db_session.async_engine.sync_engine, waits)
+
+    rng = random.Random(index)
+    statuses: Counter = Counter()
+    unavailable: Counter = Counter()  # 503s by reason: locked / shed / other
+    latencies: List[float] = []
+    low: set = set()       # a multi-unit order was refused: only order single units now
+    sold_out: set = set()  # even a single unit was refused
+    deadline_box: List[float] = []
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        while time.monotonic() < deadline_box[0] and len(sold_out) < len(sku_ids):
+            pid = rng.choice([s for s in sku_ids if s not in sold_out])
+            qty = 1 if pid in low else rng.randint(1, args["max_qty"])
+            started = time.perf_counter()
+            resp = await client.post("/orders/", json={"product_id": pid, "quantity": qty})
+            latencies.append(time.perf_counter() - started)
+            statuses[resp.status_code] += 1
+            if resp.status_code == 409:
+                (sold_out if qty == 1 else low).add(pid)
+            elif resp.status_code == 503:
+                try:
+                    detail = resp.json().get("detail")
+                except ValueError:
+                    detail = None
+                unavailable[UNAVAILABLE_REASONS.get(detail, "other")] += 1
+                await asyncio.sleep(0.01)  # honour Retry-After, loosely
+
+    async def run() -> float:
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://stress") as client:
+                start.wait()
+                began = time.monotonic()
+                deadline_box.append(began + args["duration"])
+                await asyncio.gather(*(client_loop(client) for _ in range(args["concurrency"])))
+                return time.monotonic() - began
+
+    elapsed = asyncio.run(run())  # lifespan shutdown returns leased hot-SKU stock
+    results.put({
+        "worker": index,
+        "elapsed": elapsed,
+        "statuses": dict(statuses),
+        "unavailable": dict(unavailable),
+        "latencies": latencies,
+        "lock_waits": waits,
+    })
+
+
+# ----- driver -----
+def seed(skus: int, stock: int) -> List[int]:
+    from sqlmodel import Session
+
+    from app.db.session import create_db_and_tables, engine
+    from app.models.product import Product
+    import app.models.order  # noqa: F401  (table registration)
+
+    create_db_and_tables()
+    with Session(engine) as db:
+        products = [Product(sku=f"STRESS-{i}", name=f"Stress {i}", price=1.0, stock=stock) for i in range(skus)]
+        db.add_all(products)
+        db.commit()
+        return [p.id for p in products]
+
+
+def check_invariant(sku_ids: List[int], stock: int) -> List[str]:
+    from sqlalchemy import func
+    from sqlmodel import Session, select
+
+    from app.db.session import engine
+    from app.models.order import Order
+    from app.models.product import Product
+
+    problems = []
+    with Session(engine) as db:
+        for pid in sku_ids:
+            remaining = db.get(Product, pid).stock
+            ordered = db.exec(select(func.coalesce(func.sum(Order.quantity), 0)).where(Order.product_id == pid)).one()
+            ok = remaining >= 0 and stock == remaining + ordered
+            print(f"  product {pid}: initial {stock} = remaining {remaining} + ordered {ordered}  {'OK' if ok else 'VIOLATED'}")
+            if not ok:
+                problems.append(f"product {pid}")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="processes (like uvicorn --workers)")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent requests per process")
+    parser.add_argument("--skus", type=int, default=3)
+    parser.add_argument("--stock", type=int, default=300, help="initial stock per SKU")
+    parser.add_argument("--max-qty", type=int, default=3, help="order quantities are 1..max-qty")
+    parser.add_argument("--duration", type=float, default=30.0, help="upper bound in seconds")
+    parser.add_argument("--db", help="SQLite file to use (default: a fresh temp file)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="stress-"), "stress.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.setdefault("WEBHOOK_OUTBOX_URL", f"sqlite:///{db_path}.outbox")
+
+    sku_ids = seed(args.skus, args.stock)
+    print(f"DB {db_path}: {args.skus} SKUs x {args.stock} units, "
+          f"{args.workers} processes x {args.concurrency} concurrent requests")
+
+    ctx = mp.get_context("spawn")  # fresh interpreter per worker, like separate uvicorn workers
+    start = ctx.Event()
+    results = ctx.Queue()
+    opts = {"concurrency": args.concurrency, "max_qty": args.max_qty, "duration": args.duration}
+    procs = [ctx.Process(target=worker, args=(i, sku_ids, opts, start, results)) for i in range(args.workers)]
+    for p in procs:
+        p.start()
+    time.sleep(1.0)  # let every worker import the app and run its startup
+    start.set()
+    reports = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    statuses: Counter = Counter()
+    unavailable: Counter = Counter()
+    latencies: List[float] = []
+    waits: List[float] = []
+    for r in reports:
+        statuses.update(r["statuses"])
+        unavailable.update(r["unavailable"])
+        latencies += r["latencies"]
+        waits += r["lock_waits"]
+    elapsed = max(r["elapsed"] for r in reports)
+
+    print("\nResults")
+    print(f"  statuses:            {dict(sorted(statuses.items()))}")
+    print(f"  orders created:      {statuses[201]}  ({statuses[201] / elapsed:.1f} orders/s over {elapsed:.2f}s)")
+    print(f"  latency ms:          p50 {percentile(latencies, 50) * 1000:.1f}  "
+          f"p95 {percentile(latencies, 95) * 1000:.1f}  p99 {percentile(latencies, 99) * 1000:.1f}")
+    print(f"  first-write (lock) ms: total {sum(waits) * 1000:.0f}  p50 {percentile(waits, 50) * 1000:.2f}  "
+          f"p95 {percentile(waits, 95) * 1000:.2f}  max {max(waits, default=0) * 1000:.2f}")
+    print(f"  503s:                'database is locked' {unavailable['locked']}   "
+          f"shed by admission control {unavailable['shed']}   other {unavailable['other']}")
+    print(f"  other 5xx:           {sum(n for s, n in statuses.items() if s >= 500 and s != 503)}")
+
+    print("\nInvariant")
+    problems = check_invariant(sku_ids, args.stock)
+    if problems:
+        print(f"\nOVERSELL / LOST STOCK on {', '.join(problems)}")
+        return 1
+    print("\nNo oversell.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
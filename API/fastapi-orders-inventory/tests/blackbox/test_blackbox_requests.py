@@ -0,0 +1,225 @@
+"""
+Contract tests over HTTP only: status codes, headers and body shapes a client
+relies on. Point them at a running server with BLACKBOX_BASE_URL=http://host:port
+(and BLACKBOX_WEBHOOK_SECRET to the server's PAYMENT_WEBHOOK_SECRET); otherwise
+they run against the app in-process. They never assume an empty database, and
+the webhook checks accept either ingest mode (200 inline, 202 queued).
+"""
+import hashlib
+import hmac
+import json
+import os
+import time
+import uuid
+
+import httpx
+import pytest
+
+BASE_URL = os.environ.get("BLACKBOX_BASE_URL")
+
+
+@pytest.fixture(scope="module")
+def api(request):
+    if BASE_URL:
+        with httpx.Client(base_url=BASE_URL, timeout=10) as c:
+            yield c
+    else:
+        yield request.getfixturevalue("client")
+
+
+@pytest.fixture(scope="module")
+def secret(request) -> str:
+    return os.environ.get("BLACKBOX_WEBHOOK_SECRET") or request.getfixturevalue("webhook_secret")
+
+
+@pytest.fixture
+def new_product(api):
+    def _new(stock: int = 10, price: float = 4.0) -> dict:
+        body = {"sku": f"BB-{uuid.uuid4().hex[:12]}", "name": "Blackbox", "price": price, "stock": stock}
+        resp = api.post("/products/", json=body)
+        assert resp.status_code == 201, resp.text
+        return resp.json()
+
+    return _new
+
+
+@pytest.fixture
+def new_order(api):
+    def _new(product_id: int, quantity: int = 1) -> dict:
+        resp = api.post("/orders/", json={"product_id": product_id, "quantity": quantity})
+        assert resp.status_code == 201, resp.text
+        return resp.json()
+
+    return _new
+
+
+@pytest.fixture
+def post_signed(api, secret):
+    """POST a payload to the payment webhook, signed the way the provider signs it."""
+
+    def _post(payload: dict) -> httpx.Response:
+        body = json.dumps(payload).encode("utf-8")
+        ts = str(int(time.time()))
+        sig = hmac.new(secret.encode("utf-8"), f"{ts}.".encode("utf-8") + body, hashlib.sha256).hexdigest()
+        headers = {"X-Signature-Timestamp": ts, "X-Signature": sig, "Content-Type": "application/json"}
+        return api.post("/webhooks/payment", content=body, headers=headers)
+
+    return _post
+
+
+def test_errors_are_detail_objects(api):
+    missing = api.get("/products/999999999")
+    assert missing.status_code == 404
+    assert missing.json() == {"detail": "Product not found"}
+    invalid = api.post("/products/", json={"sku": "", "price": -1})
+    assert invalid.status_code == 422
+    assert "detail" in invalid.json()
+
+
+# ---- products: cursor paging and streaming ----
+def test_product_cursor_contract(api, new_product):
+    new_product()
+    new_product()
+    page = api.get("/products/", params={"limit": 1, "offset": 0})
+    assert page.status_code == 200 and len(page.json()) == 1
+    after = page.json()[0]["id"]
+    cursor = page.headers["X-Next-Cursor"]
+
+    nxt = api.get("/products/", params={"limit": 1, "cursor": cursor})
+    assert nxt.json()[0]["id"] > after
+
+    stream = api.get("/products/", params={"stream": True, "cursor": cursor})
+    assert stream.headers["content-type"].startswith("application/x-ndjson")
+    ids = [json.loads(line)["id"] for line in stream.content.splitlines()]
+    assert ids and ids == sorted(ids) and ids[0] > after
+
+    bad = api.get("/products/", params={"cursor": "%%%"})
+    assert bad.status_code == 400 and bad.json() == {"detail": "Invalid cursor"}
+
+
+# ---- batch orders ----
+def test_batch_orders_contract(api, new_product):
+    a, b = new_product(stock=2), new_product(stock=2)
+    ok = api.post("/orders/batch", json={"items": [{"product_id": a["id"], "quantity": 1}, {"product_id": b["id"], "quantity": 2}]})
+    assert ok.status_code == 201
+    assert [(o["product_id"], o["quantity"], o["status"]) for o in ok.json()] == [(a["id"], 1, "PENDING"), (b["id"], 2, "PENDING")]
+
+    short = api.post("/orders/batch", json={"items": [{"product_id": a["id"], "quantity": 1}, {"product_id": b["id"], "quantity": 1}]})
+    assert short.status_code == 409
+    assert short.json() == {"detail": f"Insufficient stock for product {b['id']}"}
+    assert api.get(f"/products/{a['id']}").json()["stock"] == 1  # nothing from the failed batch stuck
+
+
+# ---- conditional requests ----
+def test_etag_contract(api, new_product, new_order):
+    pid = new_product()["id"]
+    got = api.get(f"/products/{pid}")
+    etag = got.headers["ETag"]
+    cached = api.get(f"/products/{pid}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.headers["ETag"] == etag
+
+    updated = api.put(f"/products/{pid}", json={"stock": 3}, headers={"If-Match": etag})
+    assert updated.status_code == 200 and updated.headers["ETag"] != etag
+    stale = api.put(f"/products/{pid}", json={"stock": 4}, headers={"If-Match": etag})
+    assert stale.status_code == 412
+
+    oid = new_order(pid)["id"]
+    order_etag = api.get(f"/orders/{oid}").headers["ETag"]
+    assert api.get(f"/orders/{oid}", headers={"If-None-Match": order_etag}).status_code == 304
+
+
+# ---- bulk status ----
+def test_bulk_status_contract(api, new_product, new_order):
+    pid = new_product()["id"]
+    first, second = new_order(pid)["id"], new_order(pid)["id"]
+    by_ids = api.post("/orders/bulk-status", json={"status": "PAID", "ids": [first, 999999999]})
+    assert by_ids.status_code == 200
+    body = by_ids.json()
+    assert (body["updated"], body["has_more"]) == (1, False)
+    assert [(r["id"], r["result"]) for r in body["results"]] == [(first, "updated"), (999999999, "not_found")]
+
+    by_filter = api.post("/orders/bulk-status", json={"status": "CANCELED", "filter": {"product_id": pid, "status": "PENDING"}, "limit": 1})
+    assert [r["id"] for r in by_filter.json()["results"]] == [second]
+    assert api.post("/orders/bulk-status", json={"status": "CANCELED", "filter": {}}).status_code == 422
+
+
+# ---- payment webhook: replays and batches ----
+def test_webhook_replay_contract(api, post_signed, new_product, new_order):
+    oid = new_order(new_product()["id"])["id"]
+    event = {"id": f"evt_{uuid.uuid4().hex}", "type": "payment.succeeded", "data": {"order_id": oid}}
+    first = post_signed(event)
+    if first.status_code == 202:
+        assert first.json() == {"detail": "queued", "order": {"id": oid}}
+    else:
+        assert first.status_code == 200
+        assert first.json() == {"detail": "ok", "order": {"id": oid, "status": "PAID"}}
+    again = post_signed(event)
+    assert again.headers["X-Webhook-Replay"] == "true" and again.content == first.content
+    assert api.post("/webhooks/payment", content=b"{}").status_code == 400
+
+
+def test_webhook_batch_contract(post_signed, new_product, new_order):
+    oid = new_order(new_product()["id"])["id"]
+    events = [
+        {"id": "b1", "type": "payment.succeeded", "data": {"order_id": oid}},
+        {"id": "b2", "type": "payment.succeeded", "data": {"order_id": 999999999}},
+        {"id": "b3", "type": "payment.refunded", "data": {"order_id": oid}},
+        {"id": "b4", "type": "payment.succeeded", "data": {}},
+    ]
+    resp = post_signed({"id": f"env_{uuid.uuid4().hex}", "events": events})
+    results = [(r["id"], r["result"]) for r in resp.json()["results"]]
+    if resp.status_code == 202:
+        assert results == [("b1", "queued"), ("b2", "queued"), ("b3", "rejected"), ("b4", "rejected")]
+    else:
+        assert resp.status_code == 200
+        assert results == [("b1", "paid"), ("b2", "not_found"), ("b3", "rejected"), ("b4", "rejected")]
+
+
+# ---- sales rollup ----
+def test_sales_rollup_contract(api, new_product, new_order):
+    pid = new_product(price=4.0)["id"]
+    new_order(pid, quantity=3)
+    rows = api.get("/analytics/sales/hourly", params={"product_id": pid}).json()
+    assert [(r["status"], r["orders"], r["units"], r["revenue"]) for r in rows] == [("PENDING", 1, 3, 12.0)]
+    assert set(rows[0]) == {"product_id", "bucket", "status", "orders", "units", "revenue"}
+    totals = api.get("/analytics/sales/by-status", params={"product_id": pid}).json()
+    assert totals == [{"status": "PENDING", "orders": 1, "units": 3, "revenue": 12.0}]
+
+
+# ---- Idempotency-Key ----
+def test_idempotency_key_contract(api):
+    key = f"bb-{uuid.uuid4().hex}"
+    body = {"sku": f"BB-{uuid.uuid4().hex[:12]}", "name": "Once", "price": 1.0, "stock": 1}
+    first = api.post("/products/", json=body, headers={"Idempotency-Key": key})
+    retry = api.post("/products/", json=body, headers={"Idempotency-Key": key})
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true" and retry.json() == first.json()
+    other = api.post("/products/", json={**body, "name": "Twice"}, headers={"Idempotency-Key": key})
+    assert other.status_code == 422
+
+
+# ---- exports ----
+def test_export_contract(api, new_product, new_order):
+    pid = new_product()["id"]
+    oid = new_order(pid)["id"]
+    orders = api.get("/orders/export", params={"product_id": pid, "format": "csv"})
+    assert orders.status_code == 200
+    assert orders.headers["content-type"].startswith("text/csv")
+    assert orders.headers["content-disposition"] == 'attachment; filename="orders.csv"'
+    header, row = orders.text.splitlines()
+    assert header.startswith("id,product_id,quantity,status") and row.startswith(f"{oid},{pid},1,PENDING,")
+
+    products = api.get("/products/export", params={"gzip": True})
+    assert products.headers["content-encoding"] == "gzip"
+    assert pid in {json.loads(line)["id"] for line in products.content.splitlines()}
+
+
+# ---- /metrics and /health/db ----
+def test_metrics_and_pool_stats_contract(api):
+    api.get("/health")
+    metrics = api.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert "# TYPE http_requests_total counter" in metrics.text
+    assert "# TYPE db_pool_checkout_wait_seconds histogram" in metrics.text
+    pools = api.get("/health/db").json()["pools"]
+    assert pools and {"pool", "checkouts", "checked_out", "wait_seconds_total", "max_wait_seconds"} <= set(pools[0])
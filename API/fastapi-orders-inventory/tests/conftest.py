@@ -0,0 +1,85 @@
+import hashlib
+import hmac
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+
+# Settings are read when app.* is first imported: point every database at a
+# throwaway directory before that happens.
+_TMP = tempfile.mkdtemp(prefix="tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/app.db"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["WEBHOOK_OUTBOX_URL"] = f"sqlite:///{_TMP}/outbox.db"
+os.environ["PAYMENT_WEBHOOK_SECRET"] = "test-secret"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.core.idempotency import idempotency_store  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.payment_service import replay_cache  # noqa: E402
+from app.services.product_cache import product_cache  # noqa: E402
+
+WEBHOOK_SECRET = "test-secret"
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(scope="session")
+def webhook_secret():
+    """PAYMENT_WEBHOOK_SECRET of the in-process app."""
+    return WEBHOOK_SECRET
+
+
+@pytest.fixture(autouse=True)
+def _fresh_caches():
+    """In-process caches survive between tests; start each test cold."""
+    product_cache.invalidate()
+    replay_cache.clear()
+    idempotency_store.clear()
+    yield
+
+
+@pytest.fixture
+def make_product(client):
+    """Create a product with a unique SKU; returns its JSON."""
+
+    def _make(stock: int = 10, price: float = 9.99, **extra):
+        body = {"sku": f"T-{uuid.uuid4().hex[:12]}", "name": "Test product", "price": price, "stock": stock}
+        body.update(extra)
+        resp = client.post("/products/", json=body)
+        assert resp.status_code == 201, resp.text
+        return resp.json()
+
+    return _make
+
+
+@pytest.fixture
+def make_order(client):
+    def _make(product_id: int, quantity: int = 1):
+        resp = client.post("/orders/", json={"product_id": product_id, "quantity": quantity})
+        assert resp.status_code == 201, resp.text
+        return resp.json()
+
+    return _make
+
+
+def signed_headers(body: bytes, secret: str = WEBHOOK_SECRET) -> dict:
+    ts = str(int(time.time()))
+    sig = hmac.new(secret.encode("utf-8"), f"{ts}.".encode("utf-8") + body, hashlib.sha256).hexdigest()
+    return {"X-Signature-Timestamp": ts, "X-Signature": sig, "Content-Type": "application/json"}
+
+
+def webhook_body(payload: dict) -> bytes:
+    return json.dumps(payload).encode("utf-8")
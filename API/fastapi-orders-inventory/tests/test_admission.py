@@ -0,0 +1,90 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import admission
+from app.core.admission import AdmissionMiddleware, Limiter
+
+
+# ---- admission control ----
+def test_limiter_hands_slots_over_in_order():
+    async def scenario() -> None:
+        limiter = Limiter("t", limit=1, queue_timeout=1.0, max_queue=1)
+        assert await limiter.acquire() is None
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert (limiter.in_flight, limiter.queued) == (1, 1)
+        assert await limiter.acquire() == "queue_full"
+
+        limiter.release()  # straight to the waiter
+        assert await waiter is None
+        assert (limiter.in_flight, limiter.queued) == (1, 0)
+        limiter.release()
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_limiter_timeout_and_cancel_give_nothing_back():
+    async def scenario() -> None:
+        limiter = Limiter("t", limit=1, queue_timeout=0.01, max_queue=5)
+        await limiter.acquire()
+        assert await limiter.acquire() == "queue_timeout"
+        gone = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        gone.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await gone
+        assert (limiter.in_flight, limiter.queued) == (1, 0)
+        limiter.release()
+        assert limiter.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_limiter_slot_handed_over_at_timeout_is_kept(monkeypatch):
+    limiter = Limiter("t", limit=1, queue_timeout=1.0, max_queue=1)
+
+    async def handed_over_then_timed_out(future, timeout):
+        limiter.release()  # the holder finishes and hands its slot to `future`...
+        raise asyncio.TimeoutError  # ...in the same tick the wait runs out
+
+    async def scenario() -> None:
+        await limiter.acquire()
+        monkeypatch.setattr(admission.asyncio, "wait_for", handed_over_then_timed_out)
+        assert await limiter.acquire() is None  # admitted: the slot is ours
+        assert (limiter.in_flight, limiter.queued) == (1, 0)
+        limiter.release()
+        assert limiter.in_flight == 0  # no leaked slot
+
+    asyncio.run(scenario())
+
+
+def test_admission_sheds_with_retry_after_and_keeps_health_open(monkeypatch):
+    monkeypatch.setitem(admission.limiters, "writes", Limiter("writes", limit=1, queue_timeout=0.01, max_queue=1))
+    release = asyncio.Event()
+
+    async def app(scope, receive, send) -> None:
+        if scope["path"] == "/orders/":
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def scenario() -> tuple:
+        transport = httpx.ASGITransport(app=AdmissionMiddleware(app))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            held = asyncio.ensure_future(c.post("/orders/", json={}))
+            await asyncio.sleep(0.01)
+            shed = await c.post("/orders/", json={})
+            health = await c.get("/health")
+            release.set()
+            return await held, shed, health
+
+    held, shed, health = asyncio.run(scenario())
+    assert held.status_code == 200 and "queue;dur=" in held.headers["Server-Timing"]
+    assert shed.status_code == 503
+    assert shed.json() == {"detail": "Server busy, retry shortly"}
+    assert shed.headers["Retry-After"]
+    assert health.status_code == 200
+    assert admission.limiters["writes"].in_flight == 0
@@ -0,0 +1,118 @@
+import json
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.services import catalog_import
+
+CSV = {"Content-Type": "text/csv"}
+NDJSON = {"Content-Type": "application/x-ndjson"}
+
+
+def skus(n: int) -> list:
+    prefix = f"B-{uuid.uuid4().hex[:8]}"
+    return [f"{prefix}-{i}" for i in range(n)]
+
+
+def csv_body(rows: list, header: str = "sku,name,price,stock") -> bytes:
+    return ("\n".join([header] + [",".join(str(v) for v in row) for row in rows]) + "\n").encode()
+
+
+def ndjson_body(records: list) -> bytes:
+    return b"".join(json.dumps(r).encode() + b"\n" for r in records)
+
+
+def summary(result: dict) -> tuple:
+    return result["rows"], result["inserted"], result["conflicts"], result["invalid"]
+
+
+def test_csv_import_inserts_every_valid_row(client):
+    a, b = skus(2)
+    resp = client.post("/products/bulk", content=csv_body([(a, "Widget", 9.99, 25), (b, "Gadget", 4.5, 10)]), headers=CSV)
+    assert resp.status_code == 200
+    assert summary(resp.json()) == (2, 2, 0, 0)
+    assert resp.json()["issues"] == []
+
+
+def test_csv_with_a_bom_and_crlf_lines(client):
+    (a,) = skus(1)
+    body = b"\xef\xbb\xbf" + csv_body([(a, "Widget", 9.99, 25)]).replace(b"\n", b"\r\n")
+    assert summary(client.post("/products/bulk", content=body, headers=CSV).json()) == (1, 1, 0, 0)
+
+
+def test_ndjson_import_and_blank_lines(client):
+    a, b = skus(2)
+    body = ndjson_body([{"sku": a, "name": "Widget", "price": 1.5, "stock": 1}]) + b"\n  \n" + ndjson_body(
+        [{"sku": b, "name": "Gadget", "price": 2.5, "stock": 2}]
+    )
+    resp = client.post("/products/bulk", content=body, headers={"Content-Type": "application/x-ndjson; charset=utf-8"})
+    assert summary(resp.json()) == (2, 2, 0, 0)
+
+
+def test_rows_split_across_chunks(client):
+    a, b = skus(2)
+    body = csv_body([(a, "Widget", 9.99, 25), (b, "Gadget", 4.5, 10)])
+    chunks = (body[i:i + 7] for i in range(0, len(body), 7))
+    assert summary(client.post("/products/bulk", content=chunks, headers=CSV).json()) == (2, 2, 0, 0)
+
+
+def test_rows_are_inserted_a_batch_at_a_time(client, monkeypatch):
+    batches = []
+    real_insert = catalog_import.insert_products_skip_conflicts
+
+    def counting_insert(db, rows):
+        batches.append(len(rows))
+        return real_insert(db, rows)
+
+    monkeypatch.setattr(settings, "BULK_IMPORT_BATCH_SIZE", 2)
+    monkeypatch.setattr(catalog_import, "insert_products_skip_conflicts", counting_insert)
+    rows = [(sku, "Widget", 1, 1) for sku in skus(5)]
+    assert summary(client.post("/products/bulk", content=csv_body(rows), headers=CSV).json()) == (5, 5, 0, 0)
+    assert batches == [2, 2, 1]
+
+
+def test_existing_and_repeated_skus_are_conflicts(client, make_product):
+    existing = make_product()["sku"]
+    (new,) = skus(1)
+    rows = [(existing, "Old", 1, 1), (new, "New", 1, 1), (new, "Again", 1, 1)]
+    result = client.post("/products/bulk", content=csv_body(rows), headers=CSV).json()
+    assert summary(result) == (3, 1, 2, 0)
+    assert [(i["line"], i["sku"], i["detail"]) for i in result["issues"]] == [
+        (2, existing, "SKU already exists"),
+        (4, new, "SKU already exists"),
+    ]
+
+
+def test_invalid_rows_are_reported_not_fatal(client):
+    good, bad_price = skus(2)
+    body = csv_body([(good, "Widget", 1, 1), (bad_price, "Widget", -1, 1), ("only", "three", "fields")])
+    body += b'{"sku": "not csv"\n'
+    result = client.post("/products/bulk", content=body, headers=CSV).json()
+    assert summary(result) == (4, 1, 0, 3)
+    issues = result["issues"]
+    assert issues[0]["line"] == 3 and issues[0]["sku"] == bad_price and issues[0]["detail"].startswith("price:")
+    assert (issues[1]["line"], issues[1]["sku"], issues[1]["detail"]) == (4, None, "Malformed csv row")
+    assert issues[2]["line"] == 5
+
+
+def test_missing_fields_and_bad_json_in_ndjson(client):
+    body = b'{"name": "no sku", "price": 1, "stock": 1}\n[1, 2]\nnot json\n'
+    result = client.post("/products/bulk", content=body, headers=NDJSON).json()
+    assert summary(result) == (3, 0, 0, 3)
+    assert [i["detail"] for i in result["issues"]] == ["sku: Field required", "Malformed ndjson row", "Malformed ndjson row"]
+
+
+def test_issues_are_capped(client, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_IMPORT_MAX_REPORTED_ISSUES", 2)
+    rows = [(sku, "Widget", -1, 1) for sku in skus(4)]
+    result = client.post("/products/bulk", content=csv_body(rows), headers=CSV).json()
+    assert result["invalid"] == 4
+    assert len(result["issues"]) == 2 and result["issues_truncated"] is True
+
+
+@pytest.mark.parametrize("content_type", [None, "application/json", "text/plain"])
+def test_unsupported_content_type_is_415(client, content_type):
+    headers = {"Content-Type": content_type} if content_type else {}
+    resp = client.post("/products/bulk", content=b"sku,name,price,stock\n", headers=headers)
+    assert resp.status_code == 415
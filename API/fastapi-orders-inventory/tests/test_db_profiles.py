@@ -0,0 +1,88 @@
+"""
+The suite runs under whatever configuration the environment gives it, and
+settings are read once at import. The other database configurations get a
+smoke pass here, each in a child pytest process with its own environment.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.db.session import engine, read_engine
+
+APP_DIR = Path(__file__).resolve().parent.parent
+PROFILES = {
+    "async": {"DB_ASYNC": "1"},
+    "production": {"DB_PROFILE": "production"},
+}
+SMOKE_TESTS = [
+    "tests/test_products_api.py",
+    "tests/test_orders_api.py",
+    "tests/test_payment_webhook.py",
+    "tests/test_idempotency.py",
+    "tests/test_writer.py",
+    "tests/test_rollups.py",
+    "tests/test_metrics.py",
+    "tests/test_db_profiles.py",
+]
+IN_SMOKE_RUN = os.environ.get("SMOKE_PROFILE")
+
+
+@pytest.mark.skipif(bool(IN_SMOKE_RUN), reason="already inside a smoke run")
+@pytest.mark.parametrize("profile", sorted(PROFILES))
+def test_api_suite_under_profile(profile):
+    env = {**os.environ, **PROFILES[profile], "SMOKE_PROFILE": profile}
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", *SMOKE_TESTS],
+        cwd=APP_DIR, env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stdout[-5000:]
+
+
+# ---- checks that only mean something inside the matching smoke run ----
+def pools_used(client) -> dict:
+    return {p["pool"]: p["checkouts"] for p in client.get("/health/db").json()["pools"]}
+
+
+@pytest.mark.skipif(not settings.DB_ASYNC, reason="DB_ASYNC only")
+def test_requests_go_through_the_async_pools(client, make_product):
+    before = pools_used(client)
+    pid = make_product()["id"]
+    client.get(f"/products/{pid}")
+    after = pools_used(client)
+    assert after["async_write"] > before["async_write"]
+    assert "async_read" not in after or after["async_read"] > before["async_read"]
+
+
+def pragmas(eng, *names: str) -> dict:
+    with eng.connect() as conn:
+        return {name: conn.execute(text(f"PRAGMA {name}")).scalar() for name in names}
+
+
+@pytest.mark.skipif(settings.DB_PROFILE != "production", reason="DB_PROFILE=production only")
+def test_production_profile_pragmas_and_split_pools(client, make_product):
+    assert read_engine is not engine
+    assert engine.pool.size() == settings.DB_WRITE_POOL_SIZE
+    assert read_engine.pool.size() == settings.DB_READ_POOL_SIZE
+
+    expected = {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE.lower(),
+        "synchronous": {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3}[settings.SQLITE_SYNCHRONOUS.upper()],
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KIB,
+    }
+    assert pragmas(engine, *expected, "query_only") == {**expected, "query_only": 0}
+    assert pragmas(read_engine, *expected, "query_only") == {**expected, "query_only": 1}
+    with read_engine.connect() as conn, pytest.raises(OperationalError):
+        conn.execute(text("DELETE FROM product"))
+
+    before = pools_used(client)
+    pid = make_product()["id"]
+    client.get(f"/products/{pid}")
+    after = pools_used(client)
+    assert after["write"] > before["write"] and after["read"] > before["read"]
@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+
+from app.core.idempotency import IdempotencyMiddleware
+
+
+def stock_of(client, product_id: int) -> int:
+    return client.get(f"/products/{product_id}").json()["stock"]
+
+
+def orders_for(client, product_id: int) -> list:
+    return client.get("/orders/", params={"product_id": product_id, "limit": 500}).json()
+
+
+# ---- Idempotency-Key ----
+def test_idempotent_retry_is_replayed_not_rerun(client, make_product):
+    pid = make_product(stock=5)["id"]
+    headers = {"Idempotency-Key": f"order-{pid}"}
+    body = {"product_id": pid, "quantity": 2}
+    first = client.post("/orders/", json=body, headers=headers)
+    retry = client.post("/orders/", json=body, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.json() == first.json()
+    assert stock_of(client, pid) == 3
+    assert len(orders_for(client, pid)) == 1
+
+
+def test_idempotency_key_reused_with_another_body_is_422(client, make_product):
+    pid = make_product(stock=5)["id"]
+    headers = {"Idempotency-Key": f"order-{pid}"}
+    client.post("/orders/", json={"product_id": pid, "quantity": 1}, headers=headers)
+    resp = client.post("/orders/", json={"product_id": pid, "quantity": 2}, headers=headers)
+    assert resp.status_code == 422
+    assert resp.json() == {"detail": "Idempotency-Key was already used with a different request body"}
+    assert stock_of(client, pid) == 4
+
+
+def test_idempotency_key_length_is_checked(client, make_product):
+    pid = make_product()["id"]
+    resp = client.post("/orders/", json={"product_id": pid, "quantity": 1}, headers={"Idempotency-Key": "k" * 256})
+    assert resp.status_code == 400
+    assert orders_for(client, pid) == []
+
+
+class _CountingApp:
+    """Stands in for the API behind IdempotencyMiddleware: slow, counts its runs, answers `statuses` in turn."""
+
+    def __init__(self, *statuses: int) -> None:
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send) -> None:
+        self.calls += 1
+        await receive()
+        await asyncio.sleep(0.05)
+        status_code = self.statuses[min(self.calls, len(self.statuses)) - 1]
+        body = f'{{"run":{self.calls}}}'.encode()
+        await send({"type": "http.response.start", "status": status_code, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+
+async def _post_many(app, count: int) -> list:
+    transport = httpx.ASGITransport(app=IdempotencyMiddleware(app))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        return await asyncio.gather(*(
+            c.post("/orders/", json={"product_id": 1}, headers={"Idempotency-Key": "k1"}) for _ in range(count)
+        ))
+
+
+def test_concurrent_duplicates_run_once():
+    app = _CountingApp(201)
+    responses = asyncio.run(_post_many(app, 5))
+    assert app.calls == 1
+    assert {r.content for r in responses} == {b'{"run":1}'}
+    assert sum(r.headers.get("Idempotent-Replayed") == "true" for r in responses) == 4
+
+
+def test_5xx_is_not_stored():
+    app = _CountingApp(503, 201)
+
+    async def twice() -> list:
+        middleware = IdempotencyMiddleware(app)
+        transport = httpx.ASGITransport(app=middleware)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return [await c.post("/orders/", json={}, headers={"Idempotency-Key": "k2"}) for _ in range(2)]
+
+    first, retry = asyncio.run(twice())
+    assert (first.status_code, retry.status_code) == (503, 201)
+    assert app.calls == 2
+    assert "Idempotent-Replayed" not in retry.headers
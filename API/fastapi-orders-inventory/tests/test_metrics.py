@@ -0,0 +1,56 @@
+from app.core.config import settings
+
+
+# ---- /metrics and /health/db ----
+def test_metrics_label_by_route_template(client, make_product):
+    pid = make_product()["id"]
+    client.get(f"/products/{pid}")
+    text = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/products/{product_id}",status="200"}' in text
+    assert f"/products/{pid}\"" not in text
+
+
+def test_pool_stats_count_checkouts_and_waits(client, make_product):
+    make_product()
+    pools = client.get("/health/db").json()["pools"]
+    write = next(p for p in pools if p["pool"] == "write")
+    assert write["checkouts"] > 0
+    assert write["checked_out"] == 0
+    assert write["wait_seconds_total"] >= 0
+    assert 'db_pool_checkout_wait_seconds_count{pool="write"}' in client.get("/metrics").text
+
+
+# ---- X-Profile-SQL / Server-Timing ----
+def _db_timing(resp) -> str | None:
+    timing = resp.headers.get("Server-Timing", "")
+    return timing if "db;dur=" in timing else None
+
+
+def test_profile_header_is_ignored_by_default(client, make_product):
+    pid = make_product()["id"]
+    assert _db_timing(client.get(f"/products/{pid}", headers={"X-Profile-SQL": "1"})) is None
+
+
+def test_profile_header_needs_the_secret(client, make_product, monkeypatch):
+    monkeypatch.setattr(settings, "SQL_PROFILE_HEADER_SECRET", "s3cret")
+    pid = make_product()["id"]
+    assert _db_timing(client.get(f"/products/{pid}", headers={"X-Profile-SQL": "1"})) is None
+    timing = _db_timing(client.put(f"/products/{pid}", json={"name": "x"}, headers={"X-Profile-SQL": "s3cret"}))
+    assert timing is not None
+    assert "statements" in timing and "product" not in timing.lower()  # timings and counts only
+
+
+def test_profile_statement_text_is_opt_in(client, make_product, monkeypatch):
+    monkeypatch.setattr(settings, "SQL_PROFILE_HEADER_ENABLED", True)
+    monkeypatch.setattr(settings, "SQL_PROFILE_STATEMENT_TEXT", True)
+    pid = make_product()["id"]
+    timing = _db_timing(client.put(f"/products/{pid}", json={"name": "x"}, headers={"X-Profile-SQL": "1"}))
+    assert "UPDATE product" in timing
+
+
+def test_component_counters_are_exported(client):
+    text = client.get("/metrics").text
+    for family in ("db_pool_checkouts_total", "cache_hits_total", "cache_entries", "admission_in_flight",
+                   "hot_sku_reservations_total", "db_group_commits_total", "payment_outbox_events_total"):
+        assert f"# TYPE {family} " in text
+    assert 'cache_entries{cache="product_items"}' in text
@@ -0,0 +1,260 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.api.routers import orders as orders_router
+from app.core.pagination import encode_cursor
+from app.schemas.order import ORDER_READ_FIELDS
+from app.services.inventory_service import HotSkuReservations
+
+
+def stock_of(client, product_id: int) -> int:
+    return client.get(f"/products/{product_id}").json()["stock"]
+
+
+def orders_for(client, product_id: int) -> list:
+    return client.get("/orders/", params={"product_id": product_id, "limit": 500}).json()
+
+
+# ---- POST /orders/batch (all-or-nothing) ----
+def test_batch_creates_every_line_and_takes_stock(client, make_product):
+    a, b = make_product(stock=5), make_product(stock=5)
+    resp = client.post("/orders/batch", json={"items": [
+        {"product_id": a["id"], "quantity": 2},
+        {"product_id": b["id"], "quantity": 1},
+        {"product_id": a["id"], "quantity": 1},
+    ]})
+    assert resp.status_code == 201
+    assert [(o["product_id"], o["quantity"]) for o in resp.json()] == [(a["id"], 2), (b["id"], 1), (a["id"], 1)]
+    assert stock_of(client, a["id"]) == 2
+    assert stock_of(client, b["id"]) == 4
+
+
+def test_batch_short_on_one_product_rolls_back_everything(client, make_product):
+    a, b = make_product(stock=5), make_product(stock=1)
+    resp = client.post("/orders/batch", json={"items": [
+        {"product_id": a["id"], "quantity": 2},
+        {"product_id": b["id"], "quantity": 3},
+    ]})
+    assert resp.status_code == 409
+    assert resp.json() == {"detail": f"Insufficient stock for product {b['id']}"}
+    assert stock_of(client, a["id"]) == 5
+    assert orders_for(client, a["id"]) == []
+
+
+def test_batch_repeated_lines_are_checked_together(client, make_product):
+    a = make_product(stock=3)
+    resp = client.post("/orders/batch", json={"items": [
+        {"product_id": a["id"], "quantity": 2},
+        {"product_id": a["id"], "quantity": 2},
+    ]})
+    assert resp.status_code == 409
+    assert stock_of(client, a["id"]) == 3
+
+
+def test_batch_unknown_product_is_404_and_creates_nothing(client, make_product):
+    a = make_product(stock=5)
+    resp = client.post("/orders/batch", json={"items": [
+        {"product_id": a["id"], "quantity": 1},
+        {"product_id": 999_999, "quantity": 1},
+    ]})
+    assert resp.status_code == 404
+    assert resp.json() == {"detail": "Product 999999 not found"}
+    assert stock_of(client, a["id"]) == 5
+    assert orders_for(client, a["id"]) == []
+
+
+@pytest.fixture
+def hot_sku(monkeypatch, make_product):
+    """A product served by its own reservation engine (as if listed in HOT_SKU_IDS)."""
+    product = make_product(stock=20)
+    engine = HotSkuReservations([product["id"]], shards=2, lease_size=5)
+    monkeypatch.setattr(orders_router, "reservations", engine)
+    yield product, engine
+    engine.discard(product["id"])
+
+
+def test_batch_takes_hot_skus_from_the_reservation_engine(client, make_product, hot_sku):
+    hot, engine = hot_sku
+    cold = make_product(stock=5)
+    resp = client.post("/orders/batch", json={"items": [
+        {"product_id": hot["id"], "quantity": 2},
+        {"product_id": cold["id"], "quantity": 1},
+    ]})
+    assert resp.status_code == 201
+    stats = engine.stats()
+    assert stats["granted"] == 1 and stats["leases"] == 1
+    assert stats["available"][hot["id"]] == 3        # leased 5, granted 2
+    assert stock_of(client, hot["id"]) == 15         # the row only lost the lease
+    assert stock_of(client, cold["id"]) == 4
+
+
+def test_failed_batch_hands_hot_sku_grants_back(client, make_product, hot_sku):
+    hot, engine = hot_sku
+    cold = make_product(stock=1)
+    resp = client.post("/orders/batch", json={"items": [
+        {"product_id": hot["id"], "quantity": 2},
+        {"product_id": cold["id"], "quantity": 5},
+    ]})
+    assert resp.status_code == 409
+    assert resp.json() == {"detail": f"Insufficient stock for product {cold['id']}"}
+    assert engine.stats()["available"][hot["id"]] == 5  # granted units returned to the shards
+    assert orders_for(client, hot["id"]) == []
+
+
+def test_batch_hot_sku_short_names_the_product(client, hot_sku):
+    hot, _ = hot_sku
+    resp = client.post("/orders/batch", json={"items": [{"product_id": hot["id"], "quantity": 21}]})
+    assert resp.status_code == 409
+    assert resp.json() == {"detail": f"Insufficient stock for product {hot['id']}"}
+
+
+# ---- GET /orders (keyset on created_at, id) ----
+def test_order_pages_follow_the_cursor(client, make_product, make_order):
+    pid = make_product(stock=10)["id"]
+    created = [make_order(pid)["id"] for _ in range(5)]
+    seen, params = [], {"product_id": pid, "limit": 2}
+    while True:
+        resp = client.get("/orders/", params=params)
+        assert resp.status_code == 200
+        seen += [o["id"] for o in resp.json()]
+        if "X-Next-Cursor" not in resp.headers:
+            break
+        params["cursor"] = resp.headers["X-Next-Cursor"]
+    assert seen == created
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    encode_cursor({"id": 1}),
+    encode_cursor({"c": "yesterday", "id": 1}),
+    encode_cursor({"c": "2025-01-01T00:00:00", "id": "x"}),
+    encode_cursor({"c": "2025-01-01T00:00:00", "id": 2**63}),
+    base64.urlsafe_b64encode(b'{"c":"2025-01-01T00:00:00","id":1e400}').decode().rstrip("="),
+])
+def test_bad_order_cursor_is_400(client, cursor):
+    resp = client.get("/orders/", params={"cursor": cursor})
+    assert resp.status_code == 400
+    assert resp.json() == {"detail": "Invalid cursor"}
+
+
+# ---- GET /orders/export ----
+def test_order_export_filters_and_formats(client, make_product, make_order):
+    pid = make_product(stock=10)["id"]
+    pending, paid = make_order(pid)["id"], make_order(pid, quantity=2)["id"]
+    client.put(f"/orders/{paid}", json={"status": "PAID"})
+
+    ndjson = client.get("/orders/export", params={"product_id": pid})
+    assert ndjson.status_code == 200  # not swallowed by /orders/{order_id}
+    assert [json.loads(line)["id"] for line in ndjson.content.splitlines()] == [pending, paid]
+
+    paid_only = client.get("/orders/export", params={"product_id": pid, "status": "PAID", "format": "csv"})
+    lines = paid_only.text.splitlines()
+    assert lines[0].split(",") == list(ORDER_READ_FIELDS)
+    assert len(lines) == 2 and lines[1].startswith(f"{paid},{pid},2,PAID,")
+
+
+def test_empty_csv_export_is_just_the_header(client):
+    resp = client.get("/orders/export", params={"product_id": 999_999, "format": "csv"})
+    assert resp.text == ",".join(ORDER_READ_FIELDS) + "\n"
+
+
+# ---- ETag / If-Match on orders ----
+def test_order_etag_and_if_match(client, make_product, make_order):
+    order = make_order(make_product()["id"])
+    oid = order["id"]
+    got = client.get(f"/orders/{oid}")
+    etag = got.headers["ETag"]
+    assert client.get(f"/orders/{oid}", headers={"If-None-Match": etag}).status_code == 304
+
+    paid = client.put(f"/orders/{oid}", json={"status": "PAID"}, headers={"If-Match": etag})
+    assert paid.status_code == 200
+    assert paid.headers["ETag"] != etag
+
+    stale = client.put(f"/orders/{oid}", json={"status": "SHIPPED"}, headers={"If-Match": etag})
+    assert stale.status_code == 412
+    assert client.get(f"/orders/{oid}").json()["status"] == "PAID"
+
+
+def test_invalid_transition_is_409(client, make_product, make_order):
+    oid = make_order(make_product()["id"])["id"]
+    assert client.put(f"/orders/{oid}", json={"status": "SHIPPED"}).status_code == 409
+
+
+# ---- POST /orders/bulk-status ----
+def test_bulk_status_ids_mode_reports_every_id(client, make_product, make_order):
+    pid = make_product(stock=10)["id"]
+    pending, paid, shipped = (make_order(pid)["id"] for _ in range(3))
+    client.put(f"/orders/{paid}", json={"status": "PAID"})
+    client.put(f"/orders/{shipped}", json={"status": "PAID"})
+    client.put(f"/orders/{shipped}", json={"status": "SHIPPED"})
+
+    resp = client.post("/orders/bulk-status", json={"status": "PAID", "ids": [pending, paid, shipped, 999_999, pending]})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["updated"] == 1
+    assert body["has_more"] is False
+    assert [(r["id"], r["result"], r["status"]) for r in body["results"]] == [
+        (pending, "updated", "PAID"),
+        (paid, "unchanged", "PAID"),
+        (shipped, "invalid_transition", "SHIPPED"),
+        (999_999, "not_found", None),
+    ]
+    assert client.get(f"/orders/{pending}").json()["status"] == "PAID"
+
+
+def test_bulk_status_filter_mode_is_bounded_and_resumable(client, make_product, make_order):
+    pid = make_product(stock=10)["id"]
+    ids = [make_order(pid)["id"] for _ in range(5)]
+    request = {"status": "CANCELED", "filter": {"product_id": pid}, "limit": 2}
+
+    moved = []
+    for expected_more in (True, True, False):
+        body = client.post("/orders/bulk-status", json=request).json()
+        assert body["has_more"] is expected_more
+        moved += [r["id"] for r in body["results"]]
+    assert moved == ids
+    assert {o["status"] for o in orders_for(client, pid)} == {"CANCELED"}
+
+
+def test_bulk_status_filter_leaves_other_orders_alone(client, make_product, make_order):
+    mine, other = make_product()["id"], make_product()["id"]
+    make_order(mine)
+    untouched = make_order(other)["id"]
+    resp = client.post("/orders/bulk-status", json={"status": "CANCELED", "filter": {"product_id": mine}})
+    assert resp.json()["updated"] == 1
+    assert client.get(f"/orders/{untouched}").json()["status"] == "PENDING"
+
+
+@pytest.mark.parametrize("body", [
+    {"status": "CANCELED", "filter": {}},
+    {"status": "CANCELED", "filter": {"status": None}},
+    {"status": "CANCELED"},
+    {"status": "CANCELED", "ids": [1], "filter": {"product_id": 1}},
+    {"status": "CANCELED", "filter": {"product_id": 1}, "limit": 0},
+])
+def test_bulk_status_rejects_unbounded_or_ambiguous_requests(client, make_product, make_order, body):
+    untouched = make_order(make_product()["id"])["id"]
+    assert client.post("/orders/bulk-status", json=body).status_code == 422
+    assert client.get(f"/orders/{untouched}").json()["status"] == "PENDING"
+
+
+def test_created_bounds_with_an_offset_are_compared_in_utc(client, make_product, make_order):
+    pid = make_product(stock=10)["id"]
+    oid = make_order(pid)["id"]
+    local = datetime.now(timezone(timedelta(hours=5)))
+    around = {"created_from": (local - timedelta(minutes=30)).isoformat(),
+              "created_to": (local + timedelta(minutes=30)).isoformat()}
+    after = {"created_from": (local + timedelta(minutes=30)).isoformat()}
+
+    assert [o["id"] for o in client.get("/orders/", params={"product_id": pid, **around}).json()] == [oid]
+    assert client.get("/orders/", params={"product_id": pid, **after}).json() == []
+    exported = client.get("/orders/export", params={"product_id": pid, **around})
+    assert [json.loads(line)["id"] for line in exported.content.splitlines()] == [oid]
+
+    body = {"status": "CANCELED", "filter": {"product_id": pid, **after}}
+    assert client.post("/orders/bulk-status", json=body).json()["updated"] == 0
+    body["filter"] = {"product_id": pid, **around}
+    assert client.post("/orders/bulk-status", json=body).json()["updated"] == 1
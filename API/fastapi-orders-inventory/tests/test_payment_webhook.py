@@ -0,0 +1,216 @@
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.services.payment_service import outbox_engine, outbox_table, payment_worker
+from conftest import signed_headers, webhook_body
+
+
+def payment_event(order_id: int, event_id: str | None = None) -> dict:
+    return {
+        "id": event_id or f"evt_{uuid.uuid4().hex[:12]}",
+        "type": "payment.succeeded",
+        "data": {"order_id": order_id},
+    }
+
+
+def post_webhook(client, payload: dict, **kwargs):
+    body = webhook_body(payload)
+    return client.post("/webhooks/payment", content=body, headers=signed_headers(body, **kwargs))
+
+
+@pytest.fixture(autouse=True)
+def inline_mode(monkeypatch):
+    """Events are applied in the request unless a test asks for queue_mode."""
+    monkeypatch.setattr(settings, "WEBHOOK_INGEST_MODE", "inline")
+
+
+@pytest.fixture
+def queue_mode(monkeypatch):
+    """WEBHOOK_INGEST_MODE=queue with the outbox drained by the test (drain()), not the worker thread."""
+    was_running = payment_worker.stats()["running"]
+    payment_worker.stop()
+    outbox_table.create(outbox_engine, checkfirst=True)
+    monkeypatch.setattr(settings, "WEBHOOK_INGEST_MODE", "queue")
+    yield
+    drain()
+    if was_running:
+        payment_worker.start()
+
+
+def drain() -> None:
+    while payment_worker.drain_once():
+        pass
+
+
+# ---- single events ----
+def test_payment_marks_order_paid(client, make_product, make_order):
+    oid = make_order(make_product()["id"])["id"]
+    resp = post_webhook(client, payment_event(oid))
+    assert resp.status_code == 200
+    assert resp.json() == {"detail": "ok", "order": {"id": oid, "status": "PAID"}}
+    assert b", " not in resp.content and b": " not in resp.content  # compact, like every other endpoint
+    assert client.get(f"/orders/{oid}").json()["status"] == "PAID"
+
+
+def test_same_signature_is_answered_from_memory(client, make_product, make_order):
+    oid = make_order(make_product()["id"])["id"]
+    body = webhook_body(payment_event(oid))
+    headers = signed_headers(body)
+    first = client.post("/webhooks/payment", content=body, headers=headers)
+    again = client.post("/webhooks/payment", content=body, headers=headers)
+    assert again.status_code == first.status_code == 200
+    assert again.headers["X-Webhook-Replay"] == "true"
+    assert "X-Webhook-Replay" not in first.headers
+    assert again.content == first.content
+
+
+def test_resigned_retry_of_an_event_is_a_replay(client, make_product, make_order):
+    oid = make_order(make_product()["id"])["id"]
+    event = payment_event(oid)
+    first = post_webhook(client, event)
+    retry = post_webhook(client, {**event, "retry": 1})  # new body, new signature, same event id
+    assert retry.headers["X-Webhook-Replay"] == "true"
+    assert retry.content == first.content
+
+
+def test_already_paid_order_is_a_no_op(client, make_product, make_order):
+    oid = make_order(make_product()["id"])["id"]
+    client.put(f"/orders/{oid}", json={"status": "PAID"})
+    client.put(f"/orders/{oid}", json={"status": "SHIPPED"})
+    resp = post_webhook(client, payment_event(oid))
+    assert resp.status_code == 200
+    assert resp.json()["order"]["status"] == "SHIPPED"
+
+
+def test_unknown_order_is_404(client):
+    assert post_webhook(client, payment_event(999_999)).status_code == 404
+
+
+def test_bad_signature_is_401(client, make_product, make_order):
+    oid = make_order(make_product()["id"])["id"]
+    resp = post_webhook(client, payment_event(oid), secret="wrong")
+    assert resp.status_code == 401
+    assert client.get(f"/orders/{oid}").json()["status"] == "PENDING"
+
+
+def test_stale_or_missing_signature_is_400(client):
+    body = webhook_body(payment_event(1))
+    headers = signed_headers(body)
+    headers["X-Signature-Timestamp"] = "1"
+    assert client.post("/webhooks/payment", content=body, headers=headers).json() == {"detail": "Stale webhook"}
+    assert client.post("/webhooks/payment", content=body).status_code == 400
+
+
+def test_malformed_payload_is_400(client):
+    resp = post_webhook(client, {"type": "payment.succeeded", "data": {}})
+    assert resp.status_code == 400
+    assert resp.json() == {"detail": "Malformed payload"}
+
+
+# ---- batch envelopes ----
+def test_batch_reports_every_event_in_order(client, make_product, make_order):
+    pid = make_product()["id"]
+    pending, shipped = make_order(pid)["id"], make_order(pid)["id"]
+    client.put(f"/orders/{shipped}", json={"status": "PAID"})
+    client.put(f"/orders/{shipped}", json={"status": "SHIPPED"})
+
+    resp = post_webhook(client, {"id": f"env_{uuid.uuid4().hex[:12]}", "events": [
+        payment_event(pending, "e1"),
+        payment_event(shipped, "e2"),
+        payment_event(999_999, "e3"),
+        {"id": "e4", "type": "refund.created", "data": {"order_id": pending}},
+        {"id": "e5", "type": "payment.succeeded", "data": {}},
+    ]})
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert [(r["id"], r["result"]) for r in results] == [
+        ("e1", "paid"), ("e2", "unchanged"), ("e3", "not_found"), ("e4", "rejected"), ("e5", "rejected"),
+    ]
+    assert results[0]["status"] == "PAID" and results[1]["status"] == "SHIPPED"
+    assert client.get(f"/orders/{pending}").json()["status"] == "PAID"
+
+
+def test_batch_paying_an_order_twice_in_one_envelope(client, make_product, make_order):
+    oid = make_order(make_product()["id"])["id"]
+    etag = client.get(f"/orders/{oid}").headers["ETag"]
+    resp = post_webhook(client, {"events": [payment_event(oid, "a"), payment_event(oid, "b")]})
+    assert [r["result"] for r in resp.json()["results"]] == ["paid", "paid"]
+    assert client.get(f"/orders/{oid}").headers["ETag"] == etag.replace("-v1", "-v2")  # one transition, one bump
+
+
+def test_batch_envelope_replay(client, make_product, make_order):
+    oid = make_order(make_product()["id"])["id"]
+    envelope = {"id": f"env_{uuid.uuid4().hex[:12]}", "events": [payment_event(oid)]}
+    first = post_webhook(client, envelope)
+    again = post_webhook(client, envelope)
+    assert again.headers["X-Webhook-Replay"] == "true"
+    assert again.content == first.content
+
+
+def test_empty_batch_is_400(client):
+    assert post_webhook(client, {"events": []}).status_code == 400
+    assert post_webhook(client, {"events": {"not": "a list"}}).status_code == 400
+
+
+def test_batch_rejects_events_that_are_not_objects(client):
+    resp = post_webhook(client, {"events": ["nope", {"id": "x1", "data": None}]})
+    assert [(r["id"], r["result"]) for r in resp.json()["results"]] == [(None, "rejected"), ("x1", "rejected")]
+
+
+# ---- queue mode (outbox + payment worker) ----
+def test_queued_event_is_applied_by_the_worker(client, make_product, make_order, queue_mode):
+    oid = make_order(make_product()["id"])["id"]
+    resp = post_webhook(client, payment_event(oid))
+    assert resp.status_code == 202
+    assert resp.json() == {"detail": "queued", "order": {"id": oid}}
+    assert payment_worker.pending() == 1
+    assert client.get(f"/orders/{oid}").json()["status"] == "PENDING"  # not applied in the request
+
+    drain()
+    assert payment_worker.pending() == 0
+    assert client.get(f"/orders/{oid}").json()["status"] == "PAID"
+
+
+def test_queued_duplicates_pay_once(client, make_product, make_order, queue_mode):
+    oid = make_order(make_product()["id"])["id"]
+    etag = client.get(f"/orders/{oid}").headers["ETag"]
+    event = payment_event(oid)
+    post_webhook(client, event)
+    replay = post_webhook(client, {**event, "retry": 1})
+    assert replay.status_code == 202 and replay.headers["X-Webhook-Replay"] == "true"
+    post_webhook(client, payment_event(oid))  # a second event for the same order
+    assert payment_worker.pending() == 2
+
+    paid_before = payment_worker.orders_paid
+    drain()
+    assert payment_worker.orders_paid == paid_before + 1
+    assert client.get(f"/orders/{oid}").headers["ETag"] == etag.replace("-v1", "-v2")
+
+    post_webhook(client, payment_event(oid))  # late redelivery after it was applied
+    drain()
+    assert client.get(f"/orders/{oid}").headers["ETag"] == etag.replace("-v1", "-v2")
+
+
+def test_queued_batch(client, make_product, make_order, queue_mode):
+    pid = make_product()["id"]
+    pending, shipped = make_order(pid)["id"], make_order(pid)["id"]
+    client.put(f"/orders/{shipped}", json={"status": "PAID"})
+    client.put(f"/orders/{shipped}", json={"status": "SHIPPED"})
+
+    resp = post_webhook(client, {"events": [
+        payment_event(pending, "q1"),
+        payment_event(shipped, "q2"),
+        payment_event(999_999, "q3"),
+        {"id": "q4", "type": "payment.succeeded", "data": {}},
+    ]})
+    assert resp.status_code == 202
+    assert [(r["id"], r["result"]) for r in resp.json()["results"]] == [
+        ("q1", "queued"), ("q2", "queued"), ("q3", "queued"), ("q4", "rejected"),
+    ]
+    assert payment_worker.pending() == 3
+
+    drain()
+    assert client.get(f"/orders/{pending}").json()["status"] == "PAID"
+    assert client.get(f"/orders/{shipped}").json()["status"] == "SHIPPED"
@@ -0,0 +1,105 @@
+import pytest
+
+from app.api.routers import products as products_router
+from app.services.product_cache import ProductCache, product_cache
+
+
+@pytest.fixture
+def db_reads(monkeypatch):
+    """Counts the product reads that actually reach the database."""
+    calls = {"item": 0, "page": 0}
+    get_product, list_products = products_router._get_product, products_router._list_products
+
+    def counting_get(db, product_id):
+        calls["item"] += 1
+        return get_product(db, product_id)
+
+    def counting_list(db, *key):
+        calls["page"] += 1
+        return list_products(db, *key)
+
+    monkeypatch.setattr(products_router, "_get_product", counting_get)
+    monkeypatch.setattr(products_router, "_list_products", counting_list)
+    return calls
+
+
+def test_repeat_get_is_served_from_the_cache(client, make_product, db_reads):
+    pid = make_product()["id"]
+    hits = product_cache.items.hits
+    first = client.get(f"/products/{pid}")
+    again = client.get(f"/products/{pid}")
+    assert db_reads["item"] == 1
+    assert product_cache.items.hits == hits + 1
+    assert again.content == first.content and again.headers["ETag"] == first.headers["ETag"]
+    assert client.get(f"/products/{pid}", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    assert db_reads["item"] == 1
+
+
+def test_listing_pages_are_cached_until_a_write(client, make_product, db_reads):
+    make_product()
+    first = client.get("/products/", params={"limit": 5})
+    assert client.get("/products/", params={"limit": 5}).content == first.content
+    assert db_reads["page"] == 1
+    make_product()
+    client.get("/products/", params={"limit": 5})
+    assert db_reads["page"] == 2
+
+
+def test_put_invalidates(client, make_product):
+    pid = make_product(price=1.0)["id"]
+    client.get(f"/products/{pid}")
+    client.put(f"/products/{pid}", json={"price": 2.0})
+    assert client.get(f"/products/{pid}").json()["price"] == 2.0
+
+
+def test_delete_invalidates(client, make_product):
+    pid = make_product()["id"]
+    client.get(f"/products/{pid}")
+    assert client.delete(f"/products/{pid}").status_code == 204
+    assert client.get(f"/products/{pid}").status_code == 404
+
+
+def test_orders_invalidate_the_stock_they_take(client, make_product, make_order):
+    pid = make_product(stock=10)["id"]
+    client.get(f"/products/{pid}")
+    make_order(pid, quantity=3)
+    assert client.get(f"/products/{pid}").json()["stock"] == 7
+    client.post("/orders/batch", json={"items": [{"product_id": pid, "quantity": 2}]})
+    assert client.get(f"/products/{pid}").json()["stock"] == 5
+
+
+def test_a_read_that_races_a_write_is_not_cached(client, make_product, monkeypatch, db_reads):
+    pid = make_product(price=1.0)["id"]
+    get_product = products_router._get_product  # db_reads' counting wrapper
+
+    def read_then_write(db, product_id):
+        row = get_product(db, product_id)
+        product_cache.invalidate(product_id)  # a writer commits while this read is in flight
+        return row
+
+    monkeypatch.setattr(products_router, "_get_product", read_then_write)
+    client.get(f"/products/{pid}")
+    assert product_cache.get_item(pid) is None
+    client.get(f"/products/{pid}")
+    assert db_reads["item"] == 2  # the second read went to the database too
+
+
+def test_generation_guard():
+    cache = ProductCache()
+    generation = cache.generation
+    cache.invalidate(1)
+    cache.put_item(1, (b"{}", '"p-1-v1"'), generation)
+    cache.put_page((10, 0, None), (b"[]", None), generation)
+    assert cache.get_item(1) is None and cache.get_page((10, 0, None)) is None
+
+    cache.put_item(1, (b"{}", '"p-1-v2"'), cache.generation)
+    assert cache.get_item(1) == (b"{}", '"p-1-v2"')
+
+
+def test_disabled_cache_always_reads_the_database(client, make_product, monkeypatch, db_reads):
+    monkeypatch.setattr(product_cache, "enabled", False)
+    pid = make_product()["id"]
+    client.get(f"/products/{pid}")
+    client.get(f"/products/{pid}")
+    assert db_reads["item"] == 2
+    assert product_cache.get_item(pid) is None
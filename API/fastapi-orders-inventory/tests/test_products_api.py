@@ -0,0 +1,216 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.api.routers import orders as orders_router
+from app.api.routers import products as products_router
+from app.core.pagination import encode_cursor
+from app.db.session import read_engine
+from app.repositories.product_repo import iter_product_rows
+from app.schemas.product import PRODUCT_READ_FIELDS
+from app.services.inventory_service import HotSkuReservations
+
+
+# ---- keyset paging ----
+def test_cursor_pages_walk_ids_in_order(client, make_product):
+    created = [make_product()["id"] for _ in range(5)]
+    cursor = encode_cursor({"id": created[0] - 1})
+
+    seen = []
+    while len(seen) < len(created):
+        resp = client.get("/products/", params={"limit": 2, "cursor": cursor})
+        assert resp.status_code == 200
+        page = resp.json()
+        assert page, "ran out of pages before reaching our products"
+        seen += [p["id"] for p in page]
+        cursor = resp.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen[: len(created)] == created
+
+
+def test_last_page_has_no_next_cursor(client, make_product):
+    last = make_product()["id"]
+    resp = client.get("/products/", params={"limit": 500, "cursor": encode_cursor({"id": last - 1})})
+    assert resp.status_code == 200
+    assert [p["id"] for p in resp.json()] == [last]
+    assert "X-Next-Cursor" not in resp.headers
+
+
+def test_offset_page_hands_out_a_cursor(client, make_product):
+    make_product()
+    make_product()
+    resp = client.get("/products/", params={"limit": 1, "offset": 0})
+    assert resp.status_code == 200
+    first_id = resp.json()[0]["id"]
+
+    nxt = client.get("/products/", params={"limit": 1, "cursor": resp.headers["X-Next-Cursor"]})
+    assert nxt.json()[0]["id"] > first_id
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor!",
+        encode_cursor({"id": "x"}),
+        encode_cursor({"id": [1]}),
+        encode_cursor({"id": None}),
+        encode_cursor({}),
+        encode_cursor({"id": 2**63}),  # past SQLite's INTEGER range
+        "WzFd",  # base64 of [1]: valid JSON, not an object
+    ],
+)
+@pytest.mark.parametrize("stream", [False, True])
+def test_bad_cursor_is_400(client, cursor, stream):
+    resp = client.get("/products/", params={"cursor": cursor, "stream": stream})
+    assert resp.status_code == 400
+    assert resp.json() == {"detail": "Invalid cursor"}
+
+
+def test_stream_returns_ndjson_after_cursor(client, make_product):
+    a, b = make_product()["id"], make_product()["id"]
+    resp = client.get("/products/", params={"stream": True, "cursor": encode_cursor({"id": a - 1}), "limit": 1})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    ids = [json.loads(line)["id"] for line in resp.content.splitlines()]
+    assert ids[:2] == [a, b]
+
+
+# ---- GET /products/export ----
+def test_csv_export_has_header_and_every_product(client, make_product):
+    made = [make_product(price=1.5), make_product(price=2.0)]
+    resp = client.get("/products/export", params={"format": "csv"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert resp.headers["content-disposition"] == 'attachment; filename="products.csv"'
+    reader = csv.DictReader(io.StringIO(resp.text))
+    assert tuple(reader.fieldnames) == PRODUCT_READ_FIELDS
+    rows = {int(r["id"]): r for r in reader}
+    for p in made:
+        assert rows[p["id"]]["sku"] == p["sku"]
+        assert float(rows[p["id"]]["price"]) == p["price"]
+
+
+def test_ndjson_export_gzip(client, make_product):
+    pid = make_product()["id"]
+    resp = client.get("/products/export", params={"gzip": True})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.content.splitlines()]  # httpx already gunzipped it
+    ids = [r["id"] for r in rows]
+    assert ids == sorted(ids) and pid in ids
+
+
+def test_product_stream_ends_its_read_transaction_between_batches(make_product):
+    first = make_product()["id"]
+    make_product()
+    rows = iter_product_rows(after_id=first - 1, batch_size=1)
+    assert next(rows)[0] == first
+    assert read_engine.pool.checkedout() == 0  # connection back in the pool while the row is out
+    assert next(rows)[0] > first
+    rows.close()
+
+
+# ---- ETag / If-None-Match / If-Match ----
+def test_get_sets_etag_and_if_none_match_gets_304(client, make_product):
+    pid = make_product()["id"]
+    first = client.get(f"/products/{pid}")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag == f'"p{pid}-v1"'
+
+    again = client.get(f"/products/{pid}", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_update_bumps_etag_and_stale_if_match_gets_412(client, make_product):
+    pid = make_product(price=5.0)["id"]
+    etag = client.get(f"/products/{pid}").headers["ETag"]
+
+    ok = client.put(f"/products/{pid}", json={"price": 6.0}, headers={"If-Match": etag})
+    assert ok.status_code == 200
+    assert ok.json()["price"] == 6.0
+    assert ok.headers["ETag"] == f'"p{pid}-v2"'
+
+    stale = client.put(f"/products/{pid}", json={"price": 7.0}, headers={"If-Match": etag})
+    assert stale.status_code == 412
+    assert stale.json() == {"detail": "Product has been modified"}
+    assert client.get(f"/products/{pid}").json()["price"] == 6.0
+
+
+def test_304_only_until_the_product_changes(client, make_product):
+    pid = make_product()["id"]
+    etag = client.get(f"/products/{pid}").headers["ETag"]
+    client.put(f"/products/{pid}", json={"name": "Renamed"})
+    resp = client.get(f"/products/{pid}", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.json()["name"] == "Renamed"
+
+
+def test_empty_update_keeps_version_and_etag(client, make_product):
+    pid = make_product()["id"]
+    etag = client.get(f"/products/{pid}").headers["ETag"]
+
+    resp = client.put(f"/products/{pid}", json={}, headers={"If-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] == etag
+    assert client.get(f"/products/{pid}", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_empty_update_still_checks_existence_and_if_match(client, make_product):
+    assert client.put("/products/999999", json={}).status_code == 404
+    pid = make_product()["id"]
+    resp = client.put(f"/products/{pid}", json={}, headers={"If-Match": f'"p{pid}-v9"'})
+    assert resp.status_code == 412
+
+
+# ---- hot SKUs (HOT_SKU_IDS) ----
+@pytest.fixture
+def hot_product(monkeypatch, make_product):
+    product = make_product(stock=20)
+    engine = HotSkuReservations([product["id"]], shards=2, lease_size=5)
+    monkeypatch.setattr(orders_router, "reservations", engine)
+    monkeypatch.setattr(products_router, "reservations", engine)
+    yield product["id"], engine
+    engine.discard(product["id"])
+
+
+def test_hot_sku_put_with_fresh_if_match_succeeds(client, make_order, hot_product):
+    pid, engine = hot_product
+    make_order(pid, quantity=2)  # leases 5, grants 2
+    got = client.get(f"/products/{pid}")
+    assert got.json()["stock"] == 15
+
+    resp = client.put(f"/products/{pid}", json={"price": 3.0}, headers={"If-Match": got.headers["ETag"]})
+    assert resp.status_code == 200
+    assert resp.json()["stock"] == 18  # unsold leased units are back on the row
+    assert engine.stats()["available"][pid] == 0
+    fresh = client.get(f"/products/{pid}")
+    assert fresh.headers["ETag"] == resp.headers["ETag"] and fresh.json()["stock"] == 18
+
+
+def test_hot_sku_put_412_keeps_leases_and_drops_the_cached_copy(client, make_order, hot_product):
+    pid, engine = hot_product
+    stale = client.get(f"/products/{pid}").headers["ETag"]
+    make_order(pid)  # leases 5, grants 1
+    resp = client.put(f"/products/{pid}", json={"price": 3.0}, headers={"If-Match": stale})
+    assert resp.status_code == 412
+    assert engine.stats()["available"][pid] == 4  # withdrawn units went back to the shards
+
+    current = client.get(f"/products/{pid}")
+    assert current.headers["ETag"] != stale and current.json()["stock"] == 15
+    retry = client.put(f"/products/{pid}", json={"price": 3.0}, headers={"If-Match": current.headers["ETag"]})
+    assert retry.status_code == 200 and retry.json()["stock"] == 19
+
+
+def test_hot_sku_absolute_stock_replaces_leases(client, make_order, hot_product):
+    pid, engine = hot_product
+    make_order(pid)
+    resp = client.put(f"/products/{pid}", json={"stock": 50})
+    assert resp.json()["stock"] == 50
+    assert engine.stats()["available"][pid] == 0
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta, timezone
+
+
+# ---- sales rollup (GET /analytics/sales/*) ----
+def sales_for(client, product_id: int, **params) -> dict:
+    rows = client.get("/analytics/sales/hourly", params={"product_id": product_id, **params}).json()
+    return {r["status"]: (r["orders"], r["units"], r["revenue"]) for r in rows}
+
+
+def test_rollup_revenue_is_priced_when_the_order_is_written(client, make_product, make_order):
+    pid = make_product(stock=10, price=2.5)["id"]
+    first = make_order(pid, quantity=2)["id"]
+    client.put(f"/products/{pid}", json={"price": 10.0})
+    make_order(pid, quantity=1)
+    assert sales_for(client, pid) == {"PENDING": (2, 3, 15.0)}
+
+    client.put(f"/orders/{first}", json={"status": "PAID"})  # moves out exactly what it brought in
+    assert sales_for(client, pid) == {"PENDING": (1, 1, 10.0), "PAID": (1, 2, 5.0)}
+
+
+def test_rollup_range_bounds_are_converted_to_utc(client, make_product, make_order):
+    pid = make_product()["id"]
+    created = datetime.fromisoformat(make_order(pid)["created_at"]).replace(tzinfo=timezone.utc)
+    hour = created.replace(minute=0, second=0, microsecond=0)
+    local = timezone(timedelta(hours=5))
+    window = {
+        "bucket_from": hour.astimezone(local).isoformat(),
+        "bucket_to": (hour + timedelta(hours=1)).astimezone(local).isoformat(),
+    }
+    assert sales_for(client, pid, **window) == {"PENDING": (1, 1, 9.99)}
@@ -0,0 +1,75 @@
+import pytest
+from fastapi import HTTPException
+
+from app.api.routers import orders as orders_router
+from app.api.routers import products as products_router
+from app.db.writer import GroupCommitWriter, group_writer
+from app.schemas.order import OrderCreate
+from app.schemas.product import ProductCreate
+
+
+def stock_of(client, product_id: int) -> int:
+    return client.get(f"/products/{product_id}").json()["stock"]
+
+
+def orders_for(client, product_id: int) -> list:
+    return client.get("/orders/", params={"product_id": product_id, "limit": 500}).json()
+
+
+# ---- group commit writer (DB_WRITE_MODE=group) ----
+def run_group(jobs) -> tuple:
+    """Queue every job before the writer starts, so they all land in one group."""
+    writer = GroupCommitWriter()
+    futures = [writer.submit(fn, *args) for fn, *args in jobs]
+    writer.start()
+    try:
+        outcomes = [f.exception(timeout=10) or f.result() for f in futures]
+    finally:
+        writer.stop()
+    return outcomes, writer.stats()
+
+
+def test_group_conflicts_only_fail_their_own_job(client, make_product):
+    pid = make_product(stock=3)["id"]
+    outcomes, stats = run_group(
+        [(orders_router._create_order, OrderCreate(product_id=pid, quantity=1))] * 5
+    )
+    failed = [o for o in outcomes if isinstance(o, HTTPException)]
+    assert [o.status_code for o in failed] == [409, 409]
+    assert len({o.id for o in outcomes if not isinstance(o, HTTPException)}) == 3
+    assert (stats["groups"], stats["jobs"], stats["failed_jobs"], stats["failed_groups"]) == (1, 5, 2, 0)
+    assert stock_of(client, pid) == 0
+    assert len(orders_for(client, pid)) == 3
+
+
+def test_group_duplicate_sku_rolls_back_one_savepoint(client, make_product):
+    sku = f"G-{make_product()['id']}"
+    new = ProductCreate(sku=sku, name="Grouped", price=1.0, stock=1)
+    outcomes, stats = run_group([
+        (products_router._create_product, new),
+        (products_router._create_product, new),
+        (products_router._create_product, new.model_copy(update={"sku": sku + "-b"})),
+    ])
+    first, dup, other = outcomes
+    assert isinstance(dup, HTTPException) and dup.status_code == 409
+    assert client.get(f"/products/{first.id}").json()["sku"] == sku
+    assert client.get(f"/products/{other.id}").json()["sku"] == sku + "-b"
+    assert stats["failed_jobs"] == 1
+
+
+@pytest.fixture
+def group_mode():
+    group_writer.start()
+    yield group_writer
+    group_writer.stop()
+
+
+def test_group_mode_serves_requests(client, make_product, group_mode):
+    before = group_mode.stats()["jobs"]
+    pid = make_product(stock=1)["id"]
+    oid = client.post("/orders/", json={"product_id": pid, "quantity": 1}).json()["id"]
+    assert client.post("/orders/", json={"product_id": pid, "quantity": 1}).status_code == 409
+    assert client.put(f"/orders/{oid}", json={"status": "PAID"}).json()["status"] == "PAID"
+    writer = client.get("/health/db").json()["writer"]
+    assert writer["running"] is True
+    assert writer["jobs"] - before == 4  # product, two orders, status change